@@ -0,0 +1,9 @@
+"""
+Benchmarks of xlfilecreator with synthetic templates
+
+python -m benchmarks --rows 20000 --columns 30 --split-values 40
+python -m benchmarks --imports
+"""
+from .imports import import_time, import_times
+from .scenarios import SCENARIOS, run_benchmark, run_scenario
+from .synthetic import synthetic_inputs, synthetic_template
@@ -0,0 +1,61 @@
+import argparse
+import json
+from typing import Any, Dict, List, Optional
+
+from .imports import import_times
+from .scenarios import SCENARIOS, run_benchmark
+
+
+COLUMNS = ['scenario', 'run', 'wall_seconds', 'files', 'files_per_second', 'bytes_written', 'peak_rss_mb', 'workers_peak_rss_mb']
+IMPORT_COLUMNS = ['statement', 'median_ms', 'min_ms', 'heavy_modules', 'output']
+
+
+def print_table(results: List[Dict[str, Any]], columns: Optional[List[str]]=COLUMNS) -> None:
+    rows = [columns] + [['' if result[col] is None else str(result[col]) for col in columns] for result in results]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    for row in rows:
+        print('  '.join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmark of xlfilecreator with synthetic templates')
+    parser.add_argument('--rows', type=int, default=5000, help='number of data rows')
+    parser.add_argument('--columns', type=int, default=20, help='number of columns')
+    parser.add_argument('--split-values', type=int, default=20, help='number of values of the column to split by (files)')
+    parser.add_argument('--dv1-lists', type=int, default=2, help='dropdown lists of the data validation configuration 1')
+    parser.add_argument('--dv2-lists', type=int, default=1, help='dropdown lists of the data validation configuration 2')
+    parser.add_argument('--list-size', type=int, default=10, help='values of each dropdown list')
+    parser.add_argument('--conditional-rules', type=int, default=4, help='rules of the conditional formatting sheet')
+    parser.add_argument('--formulas', type=int, default=1, help='columns with a formula')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=None, help='scenarios to run, all of them by default')
+    parser.add_argument('--max-workers', type=int, default=None, help='worker processes of the split scenarios')
+    parser.add_argument('--repeat', type=int, default=1, help='runs of each scenario')
+    parser.add_argument('--json', default=None, help='path of a JSON file with the results')
+    parser.add_argument('--verbose', action='store_true', help='shows the output of xlfilecreator')
+    parser.add_argument('--imports', action='store_true', help='only measures the import time of xlfilecreator')
+    args = parser.parse_args()
+
+    if args.imports:
+        results = import_times(args.repeat if args.repeat > 1 else 5)
+        print_table([{**result, 'heavy_modules': ','.join(result['heavy_modules']), 'output': repr(result['output'][:40])} for result in results],
+                    IMPORT_COLUMNS)
+        if args.json is not None:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump({'imports': results}, f, indent=1)
+        return
+
+    template_kwargs = {'n_rows': args.rows, 'n_columns': args.columns, 'n_split_values': args.split_values, 'n_dv1_lists': args.dv1_lists,
+                       'n_dv2_lists': args.dv2_lists, 'list_size': args.list_size, 'n_conditional_rules': args.conditional_rules,
+                       'n_formulas': args.formulas, 'seed': args.seed}
+
+    results = run_benchmark(args.scenarios, template_kwargs, args.max_workers, args.repeat, args.verbose)
+    print_table(results)
+
+    if args.json is not None:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'template': template_kwargs, 'max_workers': args.max_workers, 'results': results}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import json
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional
+
+
+### Statements timed in a new interpreter, the cost paid by every short-lived process that uses xlfilecreator
+IMPORT_STATEMENTS = [
+    'import xlfilecreator',
+    'from xlfilecreator import XlFileTemp',
+    'from xlfilecreator import create_xl_file_multiple_temp',
+]
+
+### Modules that should only be loaded when they are used
+HEAVY_MODULES = ['pandas', 'numpy', 'xlsxwriter', 'tqdm', 'openpyxl', 'xlfilecreator.config_file']
+
+_TIMER = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+print(json.dumps({{'seconds': time.perf_counter() - start, 'heavy_modules': [m for m in {heavy_modules!r} if m in sys.modules]}}))
+"""
+
+
+def import_time(statement: str, repeat: Optional[int]=5) -> Dict[str, Any]:
+    """
+    Time of the statement in a new interpreter (median of repeat runs) and the heavy modules (HEAVY_MODULES) it loaded
+    Returns {statement, median_ms, min_ms, heavy_modules, output} output: what the import printed, it should be empty
+    """
+
+    seconds, heavy_modules, output = [], [], ''
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', _TIMER.format(statement=statement, heavy_modules=HEAVY_MODULES)],
+                                capture_output=True, text=True, check=True)
+        *printed, last_line = result.stdout.rstrip('\n').split('\n')
+        timing = json.loads(last_line)
+        seconds.append(timing['seconds'])
+        heavy_modules = timing['heavy_modules']
+        output = '\n'.join(printed).strip()
+
+    return {'statement': statement, 'median_ms': round(statistics.median(seconds) * 1000, 1), 'min_ms': round(min(seconds) * 1000, 1),
+            'heavy_modules': heavy_modules, 'output': output}
+
+
+def import_times(repeat: Optional[int]=5) -> List[Dict[str, Any]]:
+    return [import_time(statement, repeat) for statement in IMPORT_STATEMENTS]
@@ -0,0 +1,145 @@
+import contextlib
+import io
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:             ### Windows
+    resource = None
+
+from xlfilecreator import create_xl_file_multiple_temp
+
+from .synthetic import SPLIT_BY, split_values, synthetic_template
+
+
+PROJECT = 'BENCH'
+
+
+def single(template_kwargs: Dict[str, Any], max_workers: Optional[int]) -> None:
+    synthetic_template(**template_kwargs).to_excel(project_name=f'{PROJECT}.xlsx')
+
+
+def split(template_kwargs: Dict[str, Any], max_workers: Optional[int]) -> None:
+    synthetic_template(**template_kwargs).to_excel(project_name=PROJECT, split_by=SPLIT_BY, max_workers=max_workers)
+
+
+def split_by_range(template_kwargs: Dict[str, Any], max_workers: Optional[int]) -> None:
+    template = synthetic_template(**template_kwargs)
+    template.to_excel(project_name=PROJECT, split_by=SPLIT_BY, split_by_range=split_values(template), max_workers=max_workers)
+
+
+def multi_template(template_kwargs: Dict[str, Any], max_workers: Optional[int]) -> None:
+    template_1 = synthetic_template(**template_kwargs)
+    template_2 = synthetic_template(main_sheet='SECOND_SHEET', **{**template_kwargs, 'seed': template_kwargs.get('seed', 0) + 1})
+    create_xl_file_multiple_temp(project_name=PROJECT, template_list=[template_1, template_2], split_by_value=True, split_by=SPLIT_BY,
+                                 split_by_range=split_values(template_1), max_workers=max_workers)
+
+
+def protected(template_kwargs: Dict[str, Any], max_workers: Optional[int]) -> None:
+    synthetic_template(**template_kwargs).to_excel(project_name=PROJECT, split_by=SPLIT_BY, sheet_password='123', workbook_password='456',
+                                                   max_workers=max_workers)
+
+
+def encrypted(template_kwargs: Dict[str, Any], max_workers: Optional[int]) -> None:
+    synthetic_template(**template_kwargs).to_excel(project_name=PROJECT, split_by=SPLIT_BY, sheet_password='123', workbook_password='456',
+                                                   protect_files=True, encryption_backend='native', max_workers=max_workers)
+
+
+### Scenarios of the benchmark: function(template_kwargs, max_workers) run in an empty folder
+SCENARIOS: Dict[str, Callable[[Dict[str, Any], Optional[int]], None]] = {
+    'single': single,
+    'split': split,
+    'split_by_range': split_by_range,
+    'multi_template': multi_template,
+    'protected': protected,
+    'encrypted': encrypted,
+}
+
+
+def peak_rss_mb(who: int) -> Optional[float]:
+    """Peak resident set size (MB) of the process (RUSAGE_SELF) or of its largest finished child process (RUSAGE_CHILDREN)"""
+    if resource is None:
+        return None
+
+    max_rss = resource.getrusage(who).ru_maxrss
+    ### ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return round(max_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def output_files(folder: str) -> Dict[str, int]:
+    """Number of excel files (also the files in the zips) and bytes written in the folder"""
+
+    excel_files, bytes_written = 0, 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(root, name)
+            bytes_written += os.path.getsize(path)
+            if name.endswith('.xlsx'):
+                excel_files += 1
+            elif name.endswith('.zip'):
+                with zipfile.ZipFile(path) as zf:
+                    excel_files += sum(1 for info in zf.infolist() if info.filename.endswith('.xlsx'))
+
+    return {'files': excel_files, 'bytes_written': bytes_written}
+
+
+def _run(name: str, template_kwargs: Dict[str, Any], max_workers: Optional[int], verbose: bool) -> Dict[str, Any]:
+    """Runs the scenario in a temporary folder (child process of run_scenario)"""
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix=f'xlfilecreator-bench-{name}-') as folder:
+        ### The files are created in the current folder
+        os.chdir(folder)
+        output = None if verbose else io.StringIO()
+        with contextlib.redirect_stdout(output or sys.stdout), contextlib.redirect_stderr(output or sys.stderr):
+            start = time.perf_counter()
+            SCENARIOS[name](template_kwargs, max_workers)
+            wall_seconds = time.perf_counter() - start
+
+        result = {'scenario': name, 'wall_seconds': round(wall_seconds, 3), **output_files(folder)}
+        os.chdir(cwd)
+
+    result['files_per_second'] = round(result['files'] / wall_seconds, 1) if wall_seconds > 0 else 0.0
+    result['peak_rss_mb'] = peak_rss_mb(resource.RUSAGE_SELF) if resource is not None else None
+    result['workers_peak_rss_mb'] = peak_rss_mb(resource.RUSAGE_CHILDREN) if resource is not None and max_workers else None
+
+    return result
+
+
+def run_scenario(name: str, template_kwargs: Dict[str, Any], max_workers: Optional[int]=None, verbose: Optional[bool]=False) -> Dict[str, Any]:
+    """
+    Runs a scenario in a new process, so the peak RSS of each scenario is measured on its own
+    The wall time includes the creation of the synthetic template (apply_data_types) and of all the files
+
+    name: name of the scenario (SCENARIOS)
+    template_kwargs: arguments of synthetic_template (n_rows, n_columns, n_split_values, ...)
+    max_workers: number of worker processes of the split scenarios
+    verbose: shows the output of xlfilecreator (progress bars, summaries)
+    Returns {scenario, wall_seconds, files, bytes_written, files_per_second, peak_rss_mb, workers_peak_rss_mb}
+    """
+    if name not in SCENARIOS:
+        raise ValueError(f"Unknown scenario '{name}', valid scenarios: {', '.join(SCENARIOS)}")
+
+    ### The workers of a ProcessPoolExecutor are not daemonic, the scenario can start its own worker processes (max_workers)
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(_run, name, template_kwargs, max_workers, verbose).result()
+
+
+def run_benchmark(scenarios: Optional[List[str]]=None, template_kwargs: Optional[Dict[str, Any]]=None, max_workers: Optional[int]=None,
+    repeat: Optional[int]=1, verbose: Optional[bool]=False) -> List[Dict[str, Any]]:
+    """
+    Runs the scenarios (all of them if None) repeat times, returns the result of each run (run_scenario)
+    """
+    results = []
+    for name in scenarios or list(SCENARIOS):
+        for run in range(repeat):
+            results.append({**run_scenario(name, template_kwargs or {}, max_workers, verbose), 'run': run + 1})
+
+    return results
@@ -0,0 +1,174 @@
+import pandas as pd
+
+import random
+from typing import Any, Dict, List, Optional
+
+import xlsxwriter
+
+from xlfilecreator import XlFileTemp
+
+
+SPLIT_BY = 'Supplier'
+### Number of header rows of the synthetic main sheet (description_header, HEADER, example_row), the data starts in the next excel row
+HEADER_ROWS = 3
+
+### (lock_sheet_config, header_format, kind of value) of the data columns, the columns cycle through them
+COLUMN_KINDS = [
+    ('unlocked_text', 'format_1', 'text'),
+    ('unlocked_number', 'format_2', 'number'),
+    ('unlocked_pounds', 'format_3', 'money'),
+    ('unlocked_percent', 'format_4', 'percent'),
+    ('unlocked_date_YYYY-MM-DD', 'format_5', 'date'),
+    ('unlocked_general', 'format_6', 'text'),
+    ('locked_hidden_grey', 'rsr_format_4', 'text'),
+]
+
+
+def value(rnd: random.Random, kind: str, row: int) -> str:
+    """Value of a cell as it is read from google sheets (text)"""
+
+    if kind == 'number':
+        return f'{rnd.random() * 1000:.2f}'
+    if kind == 'money':
+        return f'£{rnd.random() * 100:,.2f}'
+    if kind == 'percent':
+        return f'{rnd.random() * 100:.1f}%'
+    if kind == 'date':
+        return f'2024-{1 + row % 12:02d}-{1 + row % 28:02d}'
+
+    return f'value {row} {rnd.randrange(10000)}'
+
+
+def synthetic_inputs(n_rows: Optional[int]=1000, n_columns: Optional[int]=20, n_split_values: Optional[int]=10,
+    n_dv1_lists: Optional[int]=2, n_dv2_lists: Optional[int]=1, list_size: Optional[int]=10, n_conditional_rules: Optional[int]=4,
+    n_formulas: Optional[int]=1, n_mandatory: Optional[int]=3, seed: Optional[int]=0) -> Dict[str, Any]:
+    """
+    Returns the arguments of XlFileTemp (df_main, tab_names, df_dvconfig1, df_dvconfig2, df_picklists, df_condf, ...) of a synthetic template
+    The main sheet has the settings rows and the data rows as they are read from google sheets (text values)
+
+    n_rows: number of data rows
+    n_columns: number of columns, the first two are the ID and the column to split by (SPLIT_BY)
+    n_split_values: number of values of the column to split by (number of split files)
+    n_dv1_lists: number of columns with a dropdown list of the data validation configuration 1
+    n_dv2_lists: number of columns with a dropdown list of the data validation configuration 2
+    list_size: number of values of each dropdown list
+    n_conditional_rules: number of rules of the conditional formatting sheet
+    n_formulas: number of columns with a formula
+    n_mandatory: number of columns flagged as Mandatory
+    seed: seed of the random values
+    """
+
+    if n_columns < 2 + n_dv1_lists + n_dv2_lists + n_formulas:
+        raise ValueError('n_columns is too small for the dropdown lists and the formulas')
+
+    rnd = random.Random(seed)
+    headers = ['ID', SPLIT_BY] + [f'Field {col_num}' for col_num in range(2, n_columns)]
+
+    ### Column layout: ID, SPLIT_BY, dv1 lists, dv2 lists, data columns, formulas
+    dv1_columns = list(range(2, 2 + n_dv1_lists))
+    dv2_columns = list(range(dv1_columns[-1] + 1 if dv1_columns else 2, 2 + n_dv1_lists + n_dv2_lists))
+    formula_columns = list(range(n_columns - n_formulas, n_columns))
+    data_columns = [col_num for col_num in range(2, n_columns) if col_num not in dv1_columns + dv2_columns + formula_columns]
+    kinds = {col_num: COLUMN_KINDS[i % len(COLUMN_KINDS)] for i, col_num in enumerate(data_columns)}
+    number_columns = [col_num for col_num in data_columns if kinds[col_num][2] == 'number']
+
+    lock_sheet_config, header_format, formulas = ['locked_hidden_grey', 'LOCKED'], ['rsr_format_4', 'rsr_format_5'], ['', '']
+    for col_num in range(2, n_columns):
+        if col_num in kinds:
+            lock_sheet_config.append(kinds[col_num][0])
+            header_format.append(kinds[col_num][1])
+        else:
+            lock_sheet_config.append('locked_hidden_number' if col_num in formula_columns else 'unlocked_text')
+            header_format.append('format_7')
+        formulas.append('=ROW()*2' if col_num in formula_columns else '')
+
+    mandatory = (dv1_columns + dv2_columns + data_columns)[:n_mandatory]
+    settings = {
+        'CONFIG_MANAGER': ['x'] + [''] * (n_columns - 1),
+        'column_width': ['8', '20'] + [str(12 + col_num % 10) for col_num in range(2, n_columns)],
+        'conditional_formatting': ['Mandatory' if col_num in mandatory else '' for col_num in range(n_columns)],
+        'header_format': header_format,
+        'lock_sheet_config': lock_sheet_config,
+        'formula': formulas,
+        'description_header': [f'Description of {hd}' for hd in headers],
+        'HEADER': headers,
+        'example_row': [f'Example {hd}' for hd in headers],
+    }
+
+    dv1_lists = {headers[col_num]: [f'Option {col_num}-{i}' for i in range(list_size)] for col_num in dv1_columns}
+    dv2_lists = {headers[col_num]: [f'Pick {col_num}-{i}' for i in range(list_size)] for col_num in dv2_columns}
+
+    rows, index = list(settings.values()), list(settings)
+    for row in range(n_rows):
+        values = [str(row), f'Supp {row % n_split_values}']
+        for col_num in range(2, n_columns):
+            if col_num in dv1_columns:
+                values.append(rnd.choice(dv1_lists[headers[col_num]]))
+            elif col_num in dv2_columns:
+                values.append(rnd.choice(dv2_lists[headers[col_num]]))
+            elif col_num in formula_columns:
+                values.append('')
+            else:
+                values.append(value(rnd, kinds[col_num][2], row))
+        rows.append(values)
+        index.append('')
+    df_main = pd.DataFrame(rows, index=pd.Index(index, name='Index'), columns=range(n_columns))
+
+    ### Data validation configuration 1: settings rows and one column per dropdown list
+    if dv1_lists:
+        dv1_settings = {'error_type': ['stop' if i % 2 == 0 else 'warning' for i in range(len(dv1_lists))],
+                        'input_title': list(dv1_lists), 'HEADER': list(dv1_lists)}
+        dv1_rows = list(dv1_settings.values()) + [list(values) for values in zip(*dv1_lists.values())]
+        df_dvconfig1 = pd.DataFrame(dv1_rows, index=pd.Index(list(dv1_settings) + [''] * list_size, name='Index'))
+        df_dvconfig1.columns = df_dvconfig1.loc['HEADER']
+    else:
+        df_dvconfig1 = None
+
+    ### Data validation configuration 2: one row per column and the picklists in their own sheet
+    if dv2_lists:
+        df_picklists = pd.DataFrame({hd: values for hd, values in dv2_lists.items()})
+        sources = [f'=Dropdown_Lists_2!${xlsxwriter.utility.xl_col_to_name(i)}$2:${xlsxwriter.utility.xl_col_to_name(i)}${list_size + 1}' for i in range(len(dv2_lists))]
+        df_dvconfig2 = pd.DataFrame({'apply_to': list(dv2_lists), 'validate': ['list'] * len(dv2_lists), 'source': sources, 'error_type': ['warning'] * len(dv2_lists),
+                                     'input_title': [''] * len(dv2_lists), 'input_message': ['Pick a value'] * len(dv2_lists), 'error_title': [''] * len(dv2_lists),
+                                     'error_message': [''] * len(dv2_lists)})
+    else:
+        df_picklists, df_dvconfig2 = None, None
+
+    ### Conditional formatting: the number columns compared with a threshold
+    condf_rules = []
+    for i in range(n_conditional_rules):
+        if not number_columns:
+            break
+        col_num = number_columns[i % len(number_columns)]
+        col_letter = xlsxwriter.utility.xl_col_to_name(col_num)
+        condf_rules.append({'apply_to': headers[col_num], 'type': 'formula', 'criteria': f'=${col_letter}{HEADER_ROWS + 1}>{100 * (1 + i)}',
+                            'format': ['format_11', 'format_13', 'format_14'][i % 3]})
+    df_condf = pd.DataFrame(condf_rules, columns=['apply_to', 'type', 'criteria', 'format']) if condf_rules else None
+
+    return {'df_main': df_main, 'tab_names': {'main_sheet': 'MAIN_SHEET', 'data_validation_sheet_config1': 'Dropdown_Lists', 'dropdown_lists_sheet_config2': 'Dropdown_Lists_2'},
+            'df_dvconfig1': df_dvconfig1, 'df_dvconfig2': df_dvconfig2, 'df_picklists': df_picklists, 'df_condf': df_condf,
+            'data_validation_sheet_config1': 'Dropdown_Lists', 'dropdown_lists_sheet_config2': 'Dropdown_Lists_2'}
+
+
+def synthetic_template(main_sheet: Optional[str]='MAIN_SHEET', **kwargs) -> XlFileTemp:
+    """
+    Returns a synthetic XlFileTemp (synthetic_inputs)
+    main_sheet: name of the main sheet, the templates of a multi-template file need different names
+    kwargs: arguments of synthetic_inputs
+    """
+
+    inputs = synthetic_inputs(**kwargs)
+    inputs['tab_names']['main_sheet'] = main_sheet
+    if main_sheet != 'MAIN_SHEET':
+        ### The dropdown sheets of each template of a multi-template file need different names
+        for key in ('data_validation_sheet_config1', 'dropdown_lists_sheet_config2'):
+            inputs[key] = inputs['tab_names'][key] = f'{inputs[key]}_{main_sheet}'
+        if inputs['df_dvconfig2'] is not None:
+            inputs['df_dvconfig2']['source'] = [source.replace('=Dropdown_Lists_2!', f"={inputs['dropdown_lists_sheet_config2']}!") for source in inputs['df_dvconfig2']['source']]
+
+    return XlFileTemp(**inputs, identify_data_types=True)
+
+
+def split_values(template: XlFileTemp) -> List[str]:
+    """Values of the column to split by"""
+    return list(dict.fromkeys(template.df_data_only[1]))
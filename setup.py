@@ -9,4 +9,5 @@ setup(
     author='Giovanni Osorio',
     licence='MIT',
     install_requires=['pandas', 'openpyxl', 'xlsxwriter', 'tqdm'],
+    extras_require={'encryption': ['cryptography']},
 )
\ No newline at end of file
@@ -0,0 +1,57 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from xlfilecreator import XlFileTemp
+from xlfilecreator.build_manifest import BuildManifest
+from xlfilecreator.utils_func import set_project_name
+
+
+def typed_template() -> XlFileTemp:
+    settings = pd.DataFrame({'A': ['format_1', 'unlocked_general', 'Region', 20], 'B': ['format_1', 'unlocked_number', 'Amount', 20]},
+                            index=['header_format', 'lock_sheet_config', 'HEADER', 'column_width'])
+    df = pd.DataFrame({'Region': [1, 2, 2, 3], 'Amount': [1.5, 2.5, 3.5, 4.5]})
+
+    return XlFileTemp.from_dataframe(settings, df)
+
+
+def test_non_str_split_values_after_reload(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = 'manifest.jsonl'
+    project = set_project_name('P')
+    split_values = (np.int64(7), pd.Timestamp('2024-01-02'), 1.5)
+    manifest = BuildManifest(path, incremental=True)
+    today, path_1, _ = manifest.output_folders(project, '20240101')
+    for split_value in split_values:
+        xl_file = manifest.file_details(split_value, project, 1, today, path_1)
+        open(xl_file.path, 'w').close()
+        manifest.record(split_value, xl_file, 'hash')
+
+    ### Reloaded as text, looked up with the values of the data
+    reloaded = BuildManifest(path, incremental=True)
+    for split_value in split_values:
+        assert reloaded.is_current(split_value, reloaded.file_details(split_value, project, 1, today, path_1), 'hash')
+
+
+def test_incremental_build_of_typed_frame(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    template = typed_template()
+    for _ in range(2):
+        template.to_excel(project_name='P', split_by='Region', manifest_path='manifest.jsonl', incremental=True,
+                          protect_files=True, random_password=True)
+
+    assert 'Files up to date: 3, files created: 0' in capsys.readouterr().out
+    passwords = pd.read_csv(next(tmp_path.glob('P-PasswordMaster-*.csv')))['Password'].tolist()
+    with open('manifest.jsonl') as f:
+        entries = [json.loads(line) for line in f][1:]
+    assert sorted(entry['password'] for entry in entries) == sorted(passwords)
+
+
+def test_passwords_not_random_are_not_recorded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    typed_template().to_excel(project_name='P', split_by='Region', manifest_path='manifest.jsonl', protect_files=True)
+
+    with open('manifest.jsonl') as f:
+        entries = [json.loads(line) for line in f][1:]
+    assert len(entries) == 3 and all(entry['password'] is None for entry in entries)
@@ -0,0 +1,31 @@
+import os
+
+import pandas as pd
+
+from xlfilecreator import XlFileTemp
+
+
+def typed_template() -> XlFileTemp:
+    settings = pd.DataFrame({'A': ['format_1', 'unlocked_general', '', 'Region', 20], 'B': ['format_1', 'unlocked_number', '', 'Amount', 20]},
+                            index=['header_format', 'lock_sheet_config', 'formula', 'HEADER', 'column_width'])
+    df = pd.DataFrame({'Region': [1, 2, 2, 3], 'Amount': [1.5, 2.5, 3.5, 4.5]})
+
+    return XlFileTemp.from_dataframe(settings, df)
+
+
+def created_files(folder: str) -> list:
+    return sorted(name.split('-')[1] for _, _, files in os.walk(folder) for name in files if name.endswith('.xlsx'))
+
+
+def test_split_typed_frame_on_int_column(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    typed_template().to_excel(project_name='P', split_by='Region', protect_files=True)
+
+    assert created_files('.') == ['1', '1', '2', '2', '3', '3']
+
+
+def test_split_typed_frame_on_int_column_with_manifest(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    typed_template().to_excel(project_name='P', split_by='Region', manifest_path='manifest.jsonl')
+
+    assert created_files('.') == ['1', '2', '3']
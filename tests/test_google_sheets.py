@@ -0,0 +1,69 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+import pytest
+
+from xlfilecreator import XlFileTemp
+from xlfilecreator.google_sheets import fetch_google_sheet_csv
+
+
+MAIN_CSV = b'header_format,format_1,format_1\nlock_sheet_config,unlocked_text,unlocked_number\nHEADER,Region,Amount\n,North,1\n,South,2\n'
+
+
+class SheetsHandler(BaseHTTPRequestHandler):
+    """Serves the csv of each tab at /{sheet_id}/{sheet_name}.csv with an ETag, 304 if the tab did not change"""
+
+    def do_GET(self) -> None:
+        sheet_name = unquote(self.path.rsplit('/', 1)[-1][:-len('.csv')])
+        data = self.server.tabs[sheet_name]
+        etag = f'"{hash(data)}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.server.responses.append((sheet_name, 304))
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.server.responses.append((sheet_name, 200))
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def sheets_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SheetsHandler)
+    server.tabs = {'MAIN_SHEET': MAIN_CSV}
+    server.responses = []
+    server.url_template = f'http://127.0.0.1:{server.server_address[1]}/{{sheet_id}}/{{sheet_name}}.csv'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_cache_hit_and_not_modified(sheets_server, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    for _ in range(2):
+        assert fetch_google_sheet_csv('abc', 'MAIN_SHEET', cache_dir, sheets_server.url_template) == MAIN_CSV
+    ### The second request is revalidated (304) and read from the cache
+    assert sheets_server.responses == [('MAIN_SHEET', 200), ('MAIN_SHEET', 304)]
+
+    sheets_server.tabs['MAIN_SHEET'] = MAIN_CSV + b',East,3\n'
+    assert fetch_google_sheet_csv('abc', 'MAIN_SHEET', cache_dir, sheets_server.url_template) == MAIN_CSV + b',East,3\n'
+    assert sheets_server.responses[-1] == ('MAIN_SHEET', 200)
+
+
+def test_read_google_sheets_file_from_local_server(sheets_server, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    for _ in range(2):
+        template = XlFileTemp.read_google_sheets_file('abc', 'MAIN_SHEET', cache_dir=cache_dir, url_template=sheets_server.url_template)
+        assert template.df_data_only.iloc[:, 0].tolist() == ['North', 'South']
+
+    assert sheets_server.responses == [('MAIN_SHEET', 200), ('MAIN_SHEET', 304)]
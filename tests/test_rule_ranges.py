@@ -0,0 +1,32 @@
+from xlfilecreator.rule_ranges import merge_rules
+
+
+def test_duplicate_rule_is_not_merged():
+    ### Duplicate in column A and duplicate in column C, not duplicate anywhere in A and C
+    options = {'type': 'duplicate', 'format': 'format_12'}
+    rules = [(0, options), (2, dict(options))]
+
+    assert merge_rules(rules) == [([0], options), ([2], options)]
+
+
+def test_range_aggregate_rules_are_not_merged():
+    for options in ({'type': 'top', 'value': 10, 'format': 'format_12'}, {'type': '3_color_scale'}, {'type': 'data_bar'}):
+        assert len(merge_rules([(0, options), (1, dict(options))])) == 2
+
+
+def test_cell_rule_is_merged():
+    options = {'type': 'cell', 'criteria': '>', 'value': 5, 'format': 'format_12'}
+
+    assert merge_rules([(0, options), (2, dict(options))]) == [([0, 2], options)]
+
+
+def test_relative_formula_is_not_merged():
+    options = {'type': 'formula', 'criteria': '=A4=""', 'format': 'format_12'}
+
+    assert len(merge_rules([(0, options), (2, dict(options))])) == 2
+
+
+def test_data_validation_is_merged():
+    options = {'validate': 'list', 'source': '=dropdown_lists!$A$2:$A$5'}
+
+    assert merge_rules([(0, options), (1, dict(options))]) == [([0, 1], options)]
@@ -0,0 +1,51 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from xlfilecreator import TemplatePlan, XlFileTemp
+
+
+def plan_template(column_width: bool=True) -> XlFileTemp:
+    index = ['header_format', 'lock_sheet_config', 'formula', 'HEADER']
+    values = {'A': ['format_1', 'unlocked_text', '', 'Region'], 'B': ['format_1', 'unlocked_date_YYYY-MM-DD', '', 'Day']}
+    if column_width:
+        index.append('column_width')
+        values = {col: column + [''] for col, column in values.items()}
+    df = pd.DataFrame({'Region': ['North', 'South'], 'Day': pd.to_datetime(['2024-01-01', '2024-01-02'])})
+
+    return XlFileTemp.from_dataframe(pd.DataFrame(values, index=index), df)
+
+
+def test_plan_without_column_width():
+    assert plan_template(column_width=False).compile().column_widths == (25, 25)
+
+
+def test_plan_dates_round_trip(tmp_path):
+    dates = (pd.Timestamp('2024-01-02 03:04:05'), datetime.datetime(2024, 1, 2, 3, 4), datetime.date(2024, 1, 2), pd.NaT)
+    plan = plan_template().compile()._replace(dropdown_sheets=(('Dropdown_Lists', (('Day',) + dates,)),))
+    plan.save(tmp_path / 'plan.json')
+    loaded = TemplatePlan.load(tmp_path / 'plan.json')
+
+    loaded_dates = loaded.dropdown_sheets[0][1][0][1:]
+    assert loaded_dates[:3] == dates[:3]
+    assert [type(value) for value in loaded_dates] == [type(value) for value in dates]
+    assert loaded._replace(dropdown_sheets=()) == plan._replace(dropdown_sheets=())
+
+
+def test_plan_is_read_only():
+    plan = plan_template().compile()
+
+    with pytest.raises(TypeError):
+        plan.tab_names['main_sheet'] = 'Other'
+
+
+def test_template_from_plan_configuration_error():
+    plan = plan_template().compile()
+    df = pd.DataFrame({'Region': ['North'], 'Day': pd.to_datetime(['2024-01-01'])})
+    template = XlFileTemp.from_plan(plan, df)
+
+    with pytest.raises(AttributeError, match='created from a plan'):
+        template.dv_config1.data_validation_dict
+    assert template.compile() is plan
+    assert 'plan=TemplatePlan' in repr(template)
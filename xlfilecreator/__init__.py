@@ -1,9 +1,47 @@
-from .data_validation import *
-from .create_xl_file_multiple_templates import create_xl_file_multiple_temp
-from .encrypt_xl import PackageMsofficeMissing, _check_msoffice_installed, set_password, create_password
-from .formats import format_dict
-from .xlfiletemp import XlFileTemp
+import importlib
+import importlib.util
+from typing import Any, List
 
 
+### The modules are imported on first use of their names (pandas, xlsxwriter and tqdm are only loaded when they are needed)
+### {name: module}
+_LAZY_NAMES = {
+    'DataValidationConfiguration': 'data_validation',
+    'DataValidationConfig1': 'data_validation',
+    'DataValidationConfig2': 'data_validation',
+    'DataValDict': 'data_validation',
+    'get_data_validation_dict': 'data_validation',
+    'clean_df_data_validation': 'data_validation',
+    'create_xl_file_multiple_temp': 'create_xl_file_multiple_templates',
+    'PackageCryptographyMissing': 'agile_encryption',
+    'encrypt_agile': 'agile_encryption',
+    'PackageMsofficeMissing': 'encrypt_xl',
+    'EncryptionFailed': 'encrypt_xl',
+    '_check_msoffice_installed': 'encrypt_xl',
+    'set_password': 'encrypt_xl',
+    'create_password': 'encrypt_xl',
+    'format_dict': 'formats',
+    'TemplatePlan': 'template_plan',
+    'PlanVersionError': 'template_plan',
+    'Tracer': 'tracer',
+    'tracing': 'tracer',
+    'XlFileTemp': 'xlfiletemp',
+}
 
-_check_msoffice_installed(init=True)
\ No newline at end of file
+__all__ = [name for name in _LAZY_NAMES if not name.startswith('_')]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_NAMES:
+        ### Submodules of the package (xlfilecreator.xlfiletemp, xlfilecreator.utils_func, etc), importing them sets the attribute
+        if not name.startswith('_') and importlib.util.find_spec(f'.{name}', __name__) is not None:
+            return importlib.import_module(f'.{name}', __name__)
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+    value = getattr(importlib.import_module(f'.{_LAZY_NAMES[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_NAMES))
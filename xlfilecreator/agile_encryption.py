@@ -0,0 +1,148 @@
+import base64
+import hashlib
+import hmac
+import os
+import struct
+
+from .compound_file import write_compound_file
+
+
+class PackageCryptographyMissing(Exception):
+
+    errormessage = """
+    Install cryptography to encrypt the excel files without msoffice
+        pip install cryptography
+    """
+
+
+### [MS-OFFCRYPTO] Agile Encryption: AES-256 CBC, SHA-512
+SPIN_COUNT = 100000
+SALT_SIZE = 16
+BLOCK_SIZE = 16
+KEY_BITS = 256
+HASH_SIZE = 64
+SEGMENT_LENGTH = 4096
+
+BLOCK_KEY_VERIFIER_HASH_INPUT = bytes.fromhex('fea7d2763b4b9e79')
+BLOCK_KEY_VERIFIER_HASH_VALUE = bytes.fromhex('d7aa0f6d3061344e')
+BLOCK_KEY_ENCRYPTED_KEY_VALUE = bytes.fromhex('146e0be7abacd0d6')
+BLOCK_KEY_HMAC_KEY = bytes.fromhex('5fb2ad010cb9e1f6')
+BLOCK_KEY_HMAC_VALUE = bytes.fromhex('a0677f02b22c8433')
+
+ENCRYPTION_INFO_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\r\n'
+    '<encryption xmlns="http://schemas.microsoft.com/office/2006/encryption" '
+    'xmlns:p="http://schemas.microsoft.com/office/2006/keyEncryptor/password" '
+    'xmlns:c="http://schemas.microsoft.com/office/2006/keyEncryptor/certificate">'
+    '<keyData saltSize="16" blockSize="16" keyBits="256" hashSize="64" cipherAlgorithm="AES" '
+    'cipherChaining="ChainingModeCBC" hashAlgorithm="SHA512" saltValue="{key_data_salt}"/>'
+    '<dataIntegrity encryptedHmacKey="{encrypted_hmac_key}" encryptedHmacValue="{encrypted_hmac_value}"/>'
+    '<keyEncryptors><keyEncryptor uri="http://schemas.microsoft.com/office/2006/keyEncryptor/password">'
+    '<p:encryptedKey spinCount="100000" saltSize="16" blockSize="16" keyBits="256" hashSize="64" '
+    'cipherAlgorithm="AES" cipherChaining="ChainingModeCBC" hashAlgorithm="SHA512" saltValue="{password_salt}" '
+    'encryptedVerifierHashInput="{encrypted_verifier_hash_input}" encryptedVerifierHashValue="{encrypted_verifier_hash_value}" '
+    'encryptedKeyValue="{encrypted_key_value}"/></keyEncryptor></keyEncryptors></encryption>'
+)
+
+
+def _unicode_lp_p4(text: str) -> bytes:
+    """Length prefixed UTF-16 string padded to a multiple of 4 bytes"""
+    data = text.encode('utf-16-le')
+    return struct.pack('<I', len(data)) + data + b'\x00' * (-len(data) % 4)
+
+
+def _data_spaces() -> dict:
+    """\x06DataSpaces storage of an encrypted package [MS-OFFCRYPTO 2.2]"""
+
+    version = _unicode_lp_p4('Microsoft.Container.DataSpaces') + struct.pack('<6H', 1, 0, 1, 0, 1, 0)
+
+    map_entry = struct.pack('<II', 1, 0) + _unicode_lp_p4('EncryptedPackage') + _unicode_lp_p4('StrongEncryptionDataSpace')
+    data_space_map = struct.pack('<III', 8, 1, len(map_entry) + 4) + map_entry
+
+    data_space_definition = struct.pack('<II', 8, 1) + _unicode_lp_p4('StrongEncryptionTransform')
+
+    transform_id = _unicode_lp_p4('{FF9A3F03-56EF-4613-BDD5-5A41C1D07246}')
+    primary = (struct.pack('<II', 8 + len(transform_id), 1) + transform_id
+        + _unicode_lp_p4('Microsoft.Container.EncryptionTransform')
+        + struct.pack('<6H', 1, 0, 1, 0, 1, 0)
+        + struct.pack('<IIII', 0, 0, 0, 4))
+
+    return {'Version': version,
+        'DataSpaceMap': data_space_map,
+        'DataSpaceInfo': {'StrongEncryptionDataSpace': data_space_definition},
+        'TransformInfo': {'StrongEncryptionTransform': {'\x06Primary': primary}}}
+
+
+def _aes_cbc(key: bytes, iv: bytes, data: bytes) -> bytes:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+    data += b'\x00' * (-len(data) % BLOCK_SIZE)
+    encryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).encryptor()
+    return encryptor.update(data) + encryptor.finalize()
+
+
+def _password_hash(password: str, salt: bytes) -> bytes:
+    hash_ = hashlib.sha512(salt + password.encode('utf-16-le')).digest()
+    for i in range(SPIN_COUNT):
+        hash_ = hashlib.sha512(struct.pack('<I', i) + hash_).digest()
+
+    return hash_
+
+
+def _iv(salt: bytes, block_key: bytes) -> bytes:
+    return hashlib.sha512(salt + block_key).digest()[:BLOCK_SIZE]
+
+
+def encrypt_agile(data: bytes, password: str) -> bytes:
+    """
+    Returns the compound file (encrypted excel file) of the bytes of an excel file encrypted with the password
+    Same format as the files encrypted by Excel and msoffice-crypt (ECMA-376 Agile Encryption, AES-256 SHA-512)
+
+    data: bytes of the xlsx file
+    password: password to open the file
+    """
+
+    try:
+        import cryptography  # noqa: F401
+    except ImportError:
+        raise PackageCryptographyMissing(PackageCryptographyMissing.errormessage) from None
+
+    secret_key = os.urandom(KEY_BITS // 8)
+    key_data_salt = os.urandom(SALT_SIZE)
+    password_salt = os.urandom(SALT_SIZE)
+
+    ### Encrypted package: size of the data + segments of 4096 bytes, each one with its own iv
+    segments = [struct.pack('<Q', len(data))]
+    for i, start in enumerate(range(0, len(data), SEGMENT_LENGTH)):
+        segments.append(_aes_cbc(secret_key, _iv(key_data_salt, struct.pack('<I', i)), data[start:start + SEGMENT_LENGTH]))
+    encrypted_package = b''.join(segments)
+
+    ### Data integrity
+    hmac_key = os.urandom(HASH_SIZE)
+    hmac_value = hmac.new(hmac_key, encrypted_package, hashlib.sha512).digest()
+    encrypted_hmac_key = _aes_cbc(secret_key, _iv(key_data_salt, BLOCK_KEY_HMAC_KEY), hmac_key)
+    encrypted_hmac_value = _aes_cbc(secret_key, _iv(key_data_salt, BLOCK_KEY_HMAC_VALUE), hmac_value)
+
+    ### Password key encryptor
+    password_hash = _password_hash(password, password_salt)
+
+    def password_key(block_key: bytes) -> bytes:
+        return hashlib.sha512(password_hash + block_key).digest()[:KEY_BITS // 8]
+
+    verifier_hash_input = os.urandom(SALT_SIZE)
+    verifier_hash_value = hashlib.sha512(verifier_hash_input).digest()
+    encrypted_verifier_hash_input = _aes_cbc(password_key(BLOCK_KEY_VERIFIER_HASH_INPUT), password_salt, verifier_hash_input)
+    encrypted_verifier_hash_value = _aes_cbc(password_key(BLOCK_KEY_VERIFIER_HASH_VALUE), password_salt, verifier_hash_value)
+    encrypted_key_value = _aes_cbc(password_key(BLOCK_KEY_ENCRYPTED_KEY_VALUE), password_salt, secret_key)
+
+    b64 = lambda value: base64.b64encode(value).decode('ascii')
+    encryption_info_xml = ENCRYPTION_INFO_XML.format(key_data_salt=b64(key_data_salt),
+        encrypted_hmac_key=b64(encrypted_hmac_key), encrypted_hmac_value=b64(encrypted_hmac_value),
+        password_salt=b64(password_salt), encrypted_verifier_hash_input=b64(encrypted_verifier_hash_input),
+        encrypted_verifier_hash_value=b64(encrypted_verifier_hash_value), encrypted_key_value=b64(encrypted_key_value))
+    ### Version 4.4, flags 0x40 (agile)
+    encryption_info = struct.pack('<HHI', 4, 4, 0x40) + encryption_info_xml.encode('utf-8')
+
+    return write_compound_file({'\x06DataSpaces': _data_spaces(),
+        'EncryptionInfo': encryption_info,
+        'EncryptedPackage': encrypted_package})
@@ -0,0 +1,175 @@
+import pandas as pd
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+
+from .utils_func import Project, XlFile, create_output_folders, get_XlFile_details
+
+
+class XlFileTemp(Protocol):
+    ...
+
+
+MANIFEST_VERSION = 1
+
+
+def hash_rows(df: pd.DataFrame) -> bytes:
+    """Hash of each row of the dataframe (values only, the index is not included), the hashes of the chunks of a dataframe are the hashes of its rows"""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()
+
+
+def rows_digest(df: pd.DataFrame) -> str:
+    return hashlib.sha256(hash_rows(df)).hexdigest()
+
+
+def template_digest(template: XlFileTemp, protect_sheet: bool) -> str:
+    """Hash of the configuration of the template: every part of the template shared by the split files (skeleton) and the extra rows"""
+
+    skeleton = template.skeleton(protect_sheet)
+    config = [vars(skeleton), template.num_rows_extra, template.tab_names]
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def config_digest(template_list: List[XlFileTemp], sheet_password: Optional[str]=None, **settings) -> str:
+    """
+    Hash of the configuration shared by all the files of a build
+    template_list: templates of the excel files
+    sheet_password: sheet password of the files
+    settings: other arguments that change the files (split_by, split_by_value, workbook_password, protect_files, etc)
+    """
+
+    protect_sheet = sheet_password is not None and sheet_password != ''
+    config = [[template_digest(template, protect_sheet) for template in template_list], sheet_password, settings]
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def file_digest(config_hash: str, split_value: Any, data_digests: List[str]) -> str:
+    """Hash of an excel file: configuration of the build, split_value and data rows of each template"""
+    return hashlib.sha256(json.dumps([config_hash, split_value, data_digests], default=str).encode('utf-8')).hexdigest()
+
+
+class BuildManifest:
+    """
+    Manifest of the files created by to_excel, one entry per split_value with the hash of its rows and of the configuration of the build
+    The manifest is a JSON lines file: the first line describes the build (project, date, output folders) and each following line
+    is appended as soon as a file is finished (created and encrypted), so an interrupted build can be resumed.
+
+    In incremental mode the build of an existing manifest is updated: only the files whose hash changed (or that are missing)
+    are created and encrypted again, in the same folders and with the same names. The other files are skipped.
+
+    The entries keep the random password of each encrypted file (to_excel(random_password=True)), so an interrupted build is resumed and
+    an updated file is encrypted again with the same password. The manifest is as sensitive as the password master file and has to be
+    kept with the same care. The passwords that are not random are not recorded, they are created again from the split_value
+
+    path: path of the manifest file
+    incremental: False/True update the build of the manifest (if it exists) instead of starting a new build
+    header: project, today, path_1, path_2 of the build
+    entries: {str(split_value): entry} of the finished files, entry keys: split_value, number, id, name, path, encrypted_path, password, hash
+    The split_values are looked up by their text, the values that are not strings (numbers, dates) are written as text in the JSON lines
+    """
+
+    def __init__(self, path: str, incremental: Optional[bool]=False) -> None:
+        self.path = path
+        self.incremental = incremental
+        self.header: Optional[Dict[str, Any]] = None
+        self.entries: Dict[Any, Dict[str, Any]] = {}
+        self.numbers: Dict[Any, int] = {}
+        self.last_number = 0
+        self.lock = threading.Lock()
+
+        if incremental and os.path.isfile(path):
+            self.load()
+
+    def load(self) -> None:
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    ### Last line of an interrupted build
+                    continue
+                if 'manifest' in record:
+                    if record['manifest'] != MANIFEST_VERSION:
+                        raise ValueError(f"Manifest version {record['manifest']} not supported ({self.path})")
+                    self.header = record
+                else:
+                    self.entries[str(record['split_value'])] = record
+
+        if self.header is None:
+            raise ValueError(f'{self.path} is not a manifest file')
+        self.last_number = max((entry['number'] for entry in self.entries.values()), default=0)
+
+    def output_folders(self, project: Project, today: str, protect_files: Optional[bool]=False, make_folders: Optional[bool]=True) -> Tuple[str, str, str]:
+        """
+        Returns (today, path_1, path_2) of the build
+        A new build creates its output folders (create_output_folders), an incremental build reuses the folders and the date of the manifest
+        """
+
+        if self.header is None:
+            path_1, path_2 = create_output_folders(project.name, today, protect_files, make_folders)
+            self.header = {'manifest': MANIFEST_VERSION, 'project': project.name, 'today': today, 'path_1': path_1, 'path_2': path_2}
+        else:
+            if self.header['project'] != project.name:
+                raise ValueError(f"The manifest {self.path} belongs to the project '{self.header['project']}', not to '{project.name}'")
+            today, path_1, path_2 = self.header['today'], self.header['path_1'], self.header['path_2']
+            os.makedirs(path_1, exist_ok=True)
+            if protect_files:
+                os.makedirs(path_2, exist_ok=True)
+
+        self.save()
+        return today, path_1, path_2
+
+    def file_details(self, split_value: Any, project: Project, batch: Any, today: str, path_1: str) -> XlFile:
+        """Excel file details (id, name, path) of the split_value, the files keep their number across builds and the new split_values are numbered after them"""
+
+        entry = self.entries.get(str(split_value))
+        if entry is None:
+            self.last_number += 1
+            number = self.last_number
+        else:
+            number = entry['number']
+        self.numbers[str(split_value)] = number
+
+        return get_XlFile_details(split_value, project, batch, number, today, path_1)
+
+    def password(self, split_value: Any) -> Optional[str]:
+        """Random password of the finished file of the split_value"""
+        entry = self.entries.get(str(split_value))
+        return None if entry is None else entry['password']
+
+    def is_current(self, split_value: Any, xl_file: XlFile, file_hash: str) -> bool:
+        """True if the file of the split_value is finished, has the same hash and its files still exist"""
+
+        entry = self.entries.get(str(split_value))
+        if entry is None or entry['hash'] != file_hash or entry['path'] != xl_file.path:
+            return False
+
+        paths = [entry['path']] if entry['encrypted_path'] is None else [entry['path'], entry['encrypted_path']]
+        return all(os.path.isfile(path) for path in paths)
+
+    def record(self, split_value: Any, xl_file: XlFile, file_hash: str, encrypted_path: Optional[str]=None,
+        password: Optional[str]=None) -> None:
+        """
+        Appends the entry of a finished file
+        password: random password of the encrypted file, None if the file is not encrypted or its password is not random
+        """
+
+        entry = {'split_value': split_value, 'number': self.numbers[str(split_value)], 'id': xl_file.id, 'name': xl_file.name, 'path': xl_file.path, 
+                'encrypted_path': encrypted_path, 'password': password, 'hash': file_hash}
+        with self.lock:
+            self.entries[str(split_value)] = entry
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, default=str) + '\n')
+
+    def save(self) -> None:
+        """Writes the header and one line per finished file"""
+
+        path_tmp = f'{self.path}.tmp'
+        with open(path_tmp, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self.header) + '\n')
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, default=str) + '\n')
+        os.replace(path_tmp, self.path)
@@ -0,0 +1,187 @@
+import struct
+from typing import Dict, List, Optional, Union
+
+
+### [MS-CFB] Compound File Binary format, version 3 (512 byte sectors)
+SECTOR_SIZE = 512
+MINI_SECTOR_SIZE = 64
+MINI_STREAM_CUTOFF = 4096
+
+DIFSECT = 0xFFFFFFFC
+FATSECT = 0xFFFFFFFD
+ENDOFCHAIN = 0xFFFFFFFE
+FREESECT = 0xFFFFFFFF
+NOSTREAM = 0xFFFFFFFF
+
+STORAGE = 1
+STREAM = 2
+ROOT_STORAGE = 5
+
+RED = 0
+BLACK = 1
+
+### {name: bytes (stream) or dictionary (storage)}
+Storage = Dict[str, Union[bytes, 'Storage']]
+
+
+class DirEntry:
+
+    def __init__(self, name: str, object_type: int, data: Optional[bytes]=None) -> None:
+        self.name = name
+        self.object_type = object_type
+        self.data = data
+        self.children: List['DirEntry'] = []
+        self.left = NOSTREAM
+        self.right = NOSTREAM
+        self.child = NOSTREAM
+        self.color = BLACK
+        self.start = ENDOFCHAIN
+        self.size = 0
+
+    def sort_key(self):
+        ### Names are compared by length first and then by their upper case characters
+        return (len(self.name), self.name.upper())
+
+    def to_bytes(self) -> bytes:
+        name = self.name.encode('utf-16-le')
+        return struct.pack('<64sHBBIII16sIQQIQ', name, len(name) + 2, self.object_type, self.color,
+            self.left, self.right, self.child, b'\x00' * 16, 0, 0, 0, self.start, self.size)
+
+
+def _empty_entry() -> bytes:
+    return struct.pack('<64sHBBIII16sIQQIQ', b'', 0, 0, 0, NOSTREAM, NOSTREAM, NOSTREAM, b'\x00' * 16, 0, 0, 0, 0, 0)
+
+
+def _build_tree(entries: List[DirEntry], ids: Dict[int, int], depth: int, last_level: int) -> int:
+    """
+    Builds a balanced binary search tree of the sorted siblings and returns the id of its root.
+    All levels but the last one are full, so colouring the nodes of the last level red
+    gives every path the same number of black nodes (valid red-black tree)
+    """
+
+    if not entries:
+        return NOSTREAM
+
+    mid = len(entries) // 2
+    node = entries[mid]
+    node.color = RED if depth == last_level and depth > 1 else BLACK
+    node.left = _build_tree(entries[:mid], ids, depth + 1, last_level)
+    node.right = _build_tree(entries[mid + 1:], ids, depth + 1, last_level)
+
+    return ids[id(node)]
+
+
+def _tree_height(n: int) -> int:
+    return 0 if n == 0 else 1 + _tree_height(n // 2)
+
+
+def _sectors(size: int, sector_size: int) -> int:
+    return (size + sector_size - 1) // sector_size
+
+
+def _pad(data: bytes, sector_size: int) -> bytes:
+    return data + b'\x00' * (-len(data) % sector_size)
+
+
+def write_compound_file(storage: Storage) -> bytes:
+    """
+    Returns the bytes of a compound file containing the streams and storages of storage
+    Streams smaller than 4096 bytes are stored in the mini stream
+
+    storage: {stream name: bytes, storage name: {stream name: bytes, ...}}
+    """
+
+    root = DirEntry('Root Entry', ROOT_STORAGE)
+    entries = [root]
+
+    def add_children(parent: DirEntry, content: Storage) -> None:
+        for name, value in content.items():
+            if isinstance(value, dict):
+                entry = DirEntry(name, STORAGE)
+                entries.append(entry)
+                add_children(entry, value)
+            else:
+                entry = DirEntry(name, STREAM, bytes(value))
+                entries.append(entry)
+            parent.children.append(entry)
+
+    add_children(root, storage)
+    ids = {id(entry): i for i, entry in enumerate(entries)}
+    for entry in entries:
+        siblings = sorted(entry.children, key=DirEntry.sort_key)
+        entry.child = _build_tree(siblings, ids, 1, _tree_height(len(siblings)))
+
+    streams = [entry for entry in entries if entry.object_type == STREAM]
+    mini_streams = [entry for entry in streams if len(entry.data) < MINI_STREAM_CUTOFF]
+    big_streams = [entry for entry in streams if len(entry.data) >= MINI_STREAM_CUTOFF]
+
+    ### Mini stream and mini FAT
+    mini_stream = []
+    mini_fat = []
+    for entry in mini_streams:
+        entry.size = len(entry.data)
+        if entry.size == 0:
+            continue
+        n = _sectors(entry.size, MINI_SECTOR_SIZE)
+        entry.start = len(mini_fat)
+        mini_fat.extend(range(entry.start + 1, entry.start + n))
+        mini_fat.append(ENDOFCHAIN)
+        mini_stream.append(_pad(entry.data, MINI_SECTOR_SIZE))
+    mini_stream = b''.join(mini_stream)
+    root.size = len(mini_stream)
+
+    num_dir = _sectors(len(entries) * 128, SECTOR_SIZE)
+    num_mini_fat = _sectors(len(mini_fat) * 4, SECTOR_SIZE)
+    num_mini_stream = _sectors(len(mini_stream), SECTOR_SIZE)
+    num_big = sum(_sectors(len(entry.data), SECTOR_SIZE) for entry in big_streams)
+    num_data = num_dir + num_mini_fat + num_mini_stream + num_big
+
+    ### The FAT also maps the FAT and DIFAT sectors
+    num_fat, num_difat = 1, 0
+    while num_fat * (SECTOR_SIZE // 4) < num_data + num_fat + num_difat:
+        num_fat += 1
+        num_difat = _sectors(max(0, num_fat - 109) * 4, SECTOR_SIZE - 4)
+
+    fat = [FATSECT] * num_fat + [DIFSECT] * num_difat
+    sector_data = []
+
+    def add_chain(data: bytes, num_sectors: int) -> int:
+        if num_sectors == 0:
+            return ENDOFCHAIN
+        start = len(fat)
+        fat.extend(range(start + 1, start + num_sectors))
+        fat.append(ENDOFCHAIN)
+        sector_data.append(_pad(data, SECTOR_SIZE))
+        return start
+
+    first_dir = len(fat)
+    fat.extend(range(first_dir + 1, first_dir + num_dir))
+    fat.append(ENDOFCHAIN)
+    first_mini_fat = add_chain(struct.pack(f'<{len(mini_fat)}I', *mini_fat), num_mini_fat)
+    root.start = add_chain(mini_stream, num_mini_stream)
+    for entry in big_streams:
+        entry.size = len(entry.data)
+        entry.start = add_chain(entry.data, _sectors(entry.size, SECTOR_SIZE))
+
+    fat.extend([FREESECT] * (num_fat * (SECTOR_SIZE // 4) - len(fat)))
+
+    ### DIFAT: the first 109 FAT sectors are listed in the header, the rest in the DIFAT sectors
+    fat_sectors = list(range(num_fat))
+    header_difat = fat_sectors[:109] + [FREESECT] * (109 - min(num_fat, 109))
+    difat = []
+    per_difat = SECTOR_SIZE // 4 - 1
+    for i in range(num_difat):
+        locations = fat_sectors[109 + i * per_difat: 109 + (i + 1) * per_difat]
+        locations += [FREESECT] * (per_difat - len(locations))
+        next_difat = num_fat + i + 1 if i + 1 < num_difat else ENDOFCHAIN
+        difat.append(struct.pack(f'<{per_difat + 1}I', *locations, next_difat))
+
+    directory = b''.join(entry.to_bytes() for entry in entries)
+    directory += _empty_entry() * (num_dir * SECTOR_SIZE // 128 - len(entries))
+
+    header = struct.pack('<8s16sHHHHH6sIIIIIIIII', bytes.fromhex('D0CF11E0A1B11AE1'), b'\x00' * 16, 0x003E, 0x0003, 0xFFFE, 9, 6,
+        b'\x00' * 6, 0, num_fat, first_dir, 0, MINI_STREAM_CUTOFF, first_mini_fat, num_mini_fat,
+        num_fat if num_difat else ENDOFCHAIN, num_difat)
+    header += struct.pack('<109I', *header_difat)
+
+    return b''.join([header, struct.pack(f'<{len(fat)}I', *fat), *difat, directory, *sector_data])
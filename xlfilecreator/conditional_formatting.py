@@ -1,38 +1,41 @@
 import pandas as pd
 import xlsxwriter
 
-from typing import Dict
+from typing import Dict, List, Tuple
 
-from .formats import format_dict
+from .formats import format_dict, get_format
+from .rule_ranges import rule_range
 from .terminal_colors import yellow
 
 
+def mandatory_columns(df_settings: pd.DataFrame) -> List[int]:
+    """Returns the columns flagged as 'Mandatory' in the conditional_formatting row of the settings"""
+
+    if 'conditional_formatting' not in df_settings.index:
+        return []
+
+    return [col_num for col_num, cond_f in zip(df_settings.columns, df_settings.loc['conditional_formatting']) if cond_f == 'Mandatory']
+
+
 def highlight_mandatory(wb: xlsxwriter.workbook.Workbook, ws: xlsxwriter.worksheet.Worksheet, 
-df: pd.DataFrame, df_settings: pd.DataFrame, data_index: int, allow_input_extra_rows: bool, num_rows_extra: int) -> None:
+columns: List[int], data_index: int, length: int) -> None:
     """
     Highlight mandatory fields in yellow
-    If allow_input_extra_rows is True, the extra rows will not have conditional formatting.
+    The extra rows (allow_input_extra_rows) do not have conditional formatting.
     
     wb: workbook
     ws: worksheet
-    df: data frame used to create the excel file
-    df_settings: data frame containing the format settings, if there is no format specifications it will used format_0 as default (White backgorund and font in Bold)
+    columns: mandatory columns (mandatory_columns)
     data_index: interger index where the data starts in the df
+    length: number of rows of the headers and the data, without the extra rows
     """
-    
-    if 'conditional_formatting' not in df_settings.index:
-        return None
 
-    if allow_input_extra_rows:
-        length = df.shape[0] - num_rows_extra
-    else:
-        length = df.shape[0]
+    if not columns:
+        return None
 
-    cond_formatting = df_settings.loc['conditional_formatting']
-    for col_num, cond_f in zip(df.columns, cond_formatting):
-        if cond_f == 'Mandatory':
-            col_letter = xlsxwriter.utility.xl_col_to_name(col_num)
-            ws.conditional_format(f'{col_letter}{data_index+1}:{col_letter}{length}',{'type': 'formula', 'criteria': f'=${col_letter}{data_index+1}=""', 'format': wb.add_format(format_dict['format_12'])})
+    ### A single rule for all the columns, the criteria is relative to the first cell of the rule (each cell checks itself)
+    first_cell = xlsxwriter.utility.xl_rowcol_to_cell(data_index, min(columns))
+    ws.conditional_format(*rule_range(columns, data_index, length - 1, {'type': 'formula', 'criteria': f'={first_cell}=""', 'format': get_format(wb, 'format_12')}))
 
 
 
@@ -63,35 +66,14 @@ class CondFormatting:
 
         return df_condf
 
-    @staticmethod
-    def create_opts_dict(wb, opts_settings:pd.Series) -> Dict[str,str]:
-        format_opts_dict = format_dict[opts_settings['format']]
-
-        opts_dict={'type': opts_settings['type'],
-            'criteria': opts_settings['criteria'],
-            'format': wb.add_format(format_opts_dict)}
-
-        return opts_dict
-
-    def set_conditional_formatting(self, wb: xlsxwriter.workbook.Workbook, ws: xlsxwriter.worksheet.Worksheet, df: pd.DataFrame) -> None:
-        
+    def rules(self, header_list: List[str]) -> List[Tuple[int, Dict[str,str]]]:
         """
-        Set up conditional formatting
-        Parameters:
-        ws: worksheet
-        df: dataframe used to create the template header=None
-        self.df_condf: dataframe containing the configuration for the data validation
+        Returns the conditional formatting rules in the order of the conditional formatting sheet [(column, {'type', 'criteria', 'format' name})]
+        header_list: HEADER row of the template
         """
 
         if self.df_condf is None:
-            return None
-
-        initial_index = df.index.tolist().index('')  ## df index 0 = excel row 1
-        last_row_index = df.shape[0] - 1
-        header_list = df.loc['HEADER'].tolist()
+            return []
 
-        for row in self.df_condf.index:
-            hd_apply_to = self.df_condf.loc[row, 'apply_to']
-            col_idx = header_list.index(hd_apply_to)
-            opts_dict = CondFormatting.create_opts_dict(wb, self.df_condf.loc[row])
-            ws.conditional_format(initial_index, col_idx, last_row_index, col_idx, opts_dict)
+        return [(header_list.index(hd_apply_to), {'type': type_, 'criteria': criteria, 'format': format_})
+                for hd_apply_to, type_, criteria, format_ in zip(self.df_condf['apply_to'], self.df_condf['type'], self.df_condf['criteria'], self.df_condf['format'])]
@@ -1,12 +1,11 @@
-import pandas as pd
-from tqdm.auto import tqdm 
-
 import datetime
-from typing import Optional, List, Union, Dict
+from typing import Callable, Optional, List, Union, Dict
 
-from .create_xlfile import process_template, protect_workbook
-from .encrypt_xl import set_password, create_password
-from .utils_func import set_project_name, create_output_folders, get_XlFile_details, password_dataframe, to_zip
+from .create_xlfile import create_xl_file_multiple
+from .encrypt_xl import get_encryption_backend
+from .split_files import create_split_files
+from .tracer import Event, Tracer, active_tracer
+from .utils_func import set_project_name
 from .xlfiletemp import XlFileTemp
 
 
@@ -56,7 +55,10 @@ def check_feasibility(split_by_value: Union[bool,Dict[XlFileTemp,bool]], templat
 
 def create_xl_file_multiple_temp(*, project_name: str, template_list: List[XlFileTemp], split_by_value: Union[bool,Dict[XlFileTemp,bool]], split_by: Optional[str]=None, 
     split_by_range: Optional[List[str]]=None, batch: Optional[int]=1, sheet_password: Optional[str]=None, workbook_password: Optional[str]=None,
-    protect_files: Optional[bool]=False, random_password: Optional[bool]=False, in_zip: Optional[bool]=False) -> None:
+    protect_files: Optional[bool]=False, random_password: Optional[bool]=False, in_zip: Optional[bool]=False, max_workers: Optional[int]=None, 
+    encryption_backend: Optional[str]=None, zip_compresslevel: Optional[int]=None, manifest_path: Optional[str]=None, incremental: Optional[bool]=False,
+    constant_memory: Optional[bool]=False, trace_callback: Optional[Callable[[Event], None]]=None, 
+    trace_report: Optional[bool]=False) -> Optional[Dict[str, Dict[str, float]]]:
     """
     Creates the Excel file with multiple tamples in it.
 
@@ -70,14 +72,30 @@ def create_xl_file_multiple_temp(*, project_name: str, template_list: List[XlFil
     workbook_password: workbook password to avoid the users to add more sheets in the excel file, defaul=None
     protect_files: False/True encrypt the files
     random_password: False/True if protect_files is True it determines if the password of the files should be random or based on a logic
-    in_zip: False/True Download folders in zip
+    in_zip: False/True Download folders in zip. Each file is appended to the zip as soon as it is created
+    zip_compresslevel: if in_zip is True, the excel files are stored in the zip (already compressed) unless a compression level 0-9 is provided 
+    max_workers: number of worker processes used to create the files in parallel. If None the files are created one after another in the current process
+    encryption_backend: 'native' encrypts the files in memory (requires cryptography), 'msoffice' encrypts them with msoffice-crypt. If None it uses 'native' when cryptography is installed
+    manifest_path: path of the manifest of the build (BuildManifest, JSON lines). Each finished file is recorded with the hash of its rows and of the configuration
+    With random_password=True the manifest also keeps the password of each file, it is as sensitive as the password master file
+    incremental: False/True requires manifest_path. Updates the build of the manifest: only the files whose hash changed are created (and encrypted) again,
+    in the same folders. An interrupted build is resumed, the files already finished are not created again
+    constant_memory: False/True writes the sheets row by row in xlsxwriter constant_memory mode, the memory used does not grow with the number of rows (very large files)
+    trace_callback: function called with the timing event of each stage of each file (Tracer), e.g. {'name': 'save', 'file': ..., 'start': ..., 'duration': ...}
+    trace_report: False/True writes the timing report of the run ({project_name}-Trace-{date}.json) next to the output folders: stages aggregated,
+    stages of each file and the events (Tracer.report). The events are also recorded in the tracer of an enclosing tracing() block
+
+    Each file goes through the stages generate -> protect -> encrypt -> archive while the next file is created (FilePipeline).
+    Returns the counters of each stage (files, busy_seconds, files_per_second, blocked_seconds, queue_depth, max_queue_depth)
+    and the number of rules of all the templates before and after merging the identical rules ('rules', rule_counters). They are printed when the run is traced
     """
 
     if split_by is None and split_by_range is None:
         return None
 
     if isinstance(split_by_range, list):
-        values_to_split = set(split_by_range)
+        ### Unique values in the order of split_by_range (the file numbers do not change between runs)
+        values_to_split = list(dict.fromkeys(split_by_range))
     else:
         raise TypeError(f'{split_by_range} is not a list')
  
@@ -94,46 +112,24 @@ def create_xl_file_multiple_temp(*, project_name: str, template_list: List[XlFil
     check_tabnames(template_list)
     check_feasibility(split_by_value, template_list, split_by, split_by_range)
 
-    ### Create output folders
     today = datetime.datetime.today().strftime('%Y%m%d')
     project = set_project_name(project_name)
-    path_1, path_2 = create_output_folders(project.name, today, protect_files)
+    tracer = active_tracer()
+    if tracer is None and (trace_callback is not None or trace_report):
+        tracer = Tracer(trace_callback)
+    encryption_backend = get_encryption_backend(encryption_backend) if protect_files is True else None
     
-    ### 
-    password_master = []
-    pbar = tqdm(total=len(values_to_split))
-    for i, split_value in enumerate(values_to_split, 1):
-        
-        ### Get Excelfile details (id, name, path)
-        xl_file = get_XlFile_details(split_value, project, batch, i, today, path_1)
-        
-        ### Create Excel file
-        with pd.ExcelWriter(xl_file.path, engine='xlsxwriter') as writer:
-
-            for j, template in enumerate(template_list, 1):
-                template_name = f'Sheet{j}'
-                if isinstance(split_by_value, dict):
-                    sbv = split_by_value[template]
-                else:
-                    sbv = split_by_value
-
-                process_template(writer, template, sbv, template_name, split_by, split_value, sheet_password)
-                
-        ### Protect Workbook
-        if workbook_password is not None and workbook_password != '':
-            protect_workbook(xl_file.path, password=workbook_password)
-
-        ### Create Password master df
-        if protect_files is True:
-            pw = create_password(project, split_value, random_password)    
-            password_master.append((xl_file.id, xl_file.name, split_value, pw))
-
-    ### Encrypt Excel files
-    if protect_files is True:
-        passwordMaster_name = password_dataframe(password_master, project, split_by, today)
-        set_password(path_1, path_2, passwordMaster_name)
+    ### One flag for each template in template_list
+    if isinstance(split_by_value, dict):
+        sbv_list = [split_by_value[template] for template in template_list]
+    else:
+        sbv_list = [split_by_value for _ in template_list]
 
-    if in_zip:
-        to_zip(path_1, path_2)
+    file_kwargs = dict(template_list=template_list, split_by_value=sbv_list, split_by=split_by, 
+                    sheet_password=sheet_password, workbook_password=workbook_password, constant_memory=constant_memory)
 
-    pbar.close()
+    return create_split_files(create_xl_file_multiple, file_kwargs, template_list, sbv_list, project=project, today=today, values_to_split=values_to_split,
+                              split_by=split_by, batch=batch, sheet_password=sheet_password, workbook_password=workbook_password,
+                              protect_files=protect_files, random_password=random_password, in_zip=in_zip, max_workers=max_workers,
+                              encryption_backend=encryption_backend, zip_compresslevel=zip_compresslevel, manifest_path=manifest_path,
+                              incremental=incremental, constant_memory=constant_memory, tracer=tracer, trace_report=trace_report)
@@ -1,134 +1,214 @@
+import numpy as np
 import pandas as pd
 import xlsxwriter
-from openpyxl import load_workbook
-from openpyxl.workbook.protection import WorkbookProtection
+from pandas.api.types import is_scalar
+
+import datetime
+import io
+import os
+import re
+import zipfile
+from collections import Counter
+from decimal import Decimal
+from typing import Any, Dict, Optional, Union, Protocol, List
+
+from .agile_encryption import encrypt_agile
+from .conditional_formatting import highlight_mandatory
+from .formats import get_format
+from .output_sink import FolderSink, OutputSink
+from .rule_ranges import rule_range
+from .tracer import trace, trace_file
+from .xl_stamp import XlFileStamp
+from .zip_package import replace_zip_members
 
-from typing import Optional, Union, Callable, Protocol
 
-from .conditional_formatting import highlight_mandatory
-from .formats import format_lock_config_dict
-from .header_format import set_headers_format
+def hash_password(password: str) -> str:
+    """
+    Legacy Excel password hash used by <workbookProtection workbookPassword="...">
+    (same algorithm as openpyxl and xlsxwriter worksheet.protect)
+    """
+    hash_ = 0x0000
+    for i, char in enumerate(password, 1):
+        value = ord(char) << i
+        rotated_bits = value >> 15
+        value &= 0x7fff
+        hash_ ^= (value | rotated_bits)
 
+    hash_ ^= len(password)
+    hash_ ^= 0xCE4B
 
-def protect_workbook(path: str, password: str) -> None:
+    return f'{hash_:X}'
+
+
+def protect_workbook_bytes(data: bytes, password: str) -> bytes:
     """
-    Openpyxl -> Manipulate a file that is already created
+    Returns the excel file (bytes) with the structure of the workbook protected
+    Only xl/workbook.xml is rewritten with the <workbookProtection> element, the cells are not parsed 
+    and the other parts of the package are copied as they are, without compressing them again (replace_zip_members)
 
-    PARAMETERS
-    path -> Location where the excel file is stored
-    password -> workbook password
+    data: bytes of the excel file
+    password: workbook password
     """
     
-    ### PROTECT WORKBOOK openpyxl
-    wb = load_workbook(path)
-    wb.security = WorkbookProtection(workbookPassword=password, lockStructure=True)
-    wb.save(path)
+    workbook_protection = f'<workbookProtection workbookPassword="{hash_password(password)}" lockStructure="1"/>'
+
+    with trace('protect_workbook'):
+        with zipfile.ZipFile(io.BytesIO(data)) as zin:
+            workbook_xml = zin.read('xl/workbook.xml').decode('utf-8')
 
+        workbook_xml = re.sub(r'<workbookProtection[^>]*/>', '', workbook_xml)
+        ### CT_Workbook sequence: fileVersion, fileSharing, workbookPr, workbookProtection, bookViews
+        workbook_xml = workbook_xml.replace('<bookViews>', workbook_protection + '<bookViews>', 1)
 
-def set_formula(df: pd.DataFrame, data_index: int, df_settings: pd.DataFrame) -> pd.DataFrame:
+        return replace_zip_members(data, {'xl/workbook.xml': workbook_xml.encode('utf-8')})
+
+
+def protect_workbook(path: str, password: str) -> None:
     """
-    Set up Excel formulas 
+    Protect the structure of an excel file that is already created (protect_workbook_bytes)
 
-    df: dataframe used to create the template header=None (df_header + df_data_only + df_extra_rows)
-    data_index: interger index where the data starts in the df_data
-    df_settings: dataframe contaning all the specifications for the template  
+    PARAMETERS
+    path -> Location where the excel file is stored
+    password -> workbook password
     """
-    if 'formula' not in df_settings.index:
-        return df
-    if all(i == '' for i in df_settings.loc['formula']):
-        return df
 
-    formula_settings_row = df_settings.loc['formula'].tolist()
-    for col, formula_ in zip(df.columns, formula_settings_row):
-        if formula_ != '':
-            df.iloc[data_index: ,col] = formula_
+    with open(path, 'rb') as f:
+        data = protect_workbook_bytes(f.read(), password)
 
-    return df
+    path_tmp = f'{path}.tmp'
+    with open(path_tmp, 'wb') as f:
+        f.write(data)
+    os.replace(path_tmp, path)
 
 
-def column_width(ws: xlsxwriter.worksheet.Worksheet, df: pd.DataFrame, df_settings: pd.DataFrame) -> None:
+def save_xl_file(data: bytes, file_path: str, workbook_password: Optional[str]=None, 
+    encrypted_file_path: Optional[str]=None, file_password: Optional[str]=None, sink: Optional[OutputSink]=None) -> None:
     """
-    Set up the columns width in character units.
-
-    worksheet.set_column(first_col, last_col, width, cell_format, options)
+    Saves the excel file created in memory
+    If file_password is provided, the encrypted copy of the file is saved in encrypted_file_path (native encryption, encrypt_agile)
 
-    Parameters:
-    ws: worksheet
-    df: dataframe used to create the template header=None
-    df_settings: dataframe contaning all the specifications for the template  
+    data: bytes of the excel file
+    file_path: complete filename of the excel file
+    workbook_password: workbook password to avoid the users to add more sheets in the excel file, defaul=None
+    encrypted_file_path: complete filename of the encrypted excel file
+    file_password: password to open the encrypted excel file
+    sink: where the files are saved (FolderSink, ZipSink, MemorySink), default FolderSink
     """
 
-    width_format = df_settings.loc['column_width'].tolist()
-    for col_num, width in zip(df.columns, width_format):
-        if width == '':
-            width = 25
-        ws.set_column(col_num, col_num, width=int(width))
+    if sink is None:
+        sink = FolderSink()
 
+    ### Protect Workbook
+    if workbook_password is not None and workbook_password != '':
+        data = protect_workbook_bytes(data, password=workbook_password)
+
+    sink.write(file_path, data)
+
+    ### Encrypt the file from memory
+    if file_password is not None:
+        with trace('encryption'):
+            encrypted_data = encrypt_agile(data, file_password)
+        sink.write(encrypted_file_path, encrypted_data)
 
-### VERSION 1
-lock_sheet_simple_func = Callable[[xlsxwriter.workbook.Workbook, xlsxwriter.worksheet.Worksheet, pd.DataFrame, str], None]
-def lock_sheet_simple(wb: xlsxwriter.workbook.Workbook, ws: xlsxwriter.worksheet.Worksheet, 
-    data_index: int, df: pd.DataFrame, sheet_password: str) -> None:
+
+def get_date_formats(writer: pd.ExcelWriter) -> Dict[str, xlsxwriter.format.Format]:
     """
-    Sets up the format of each column in the dataframe 
-    initial_index -> data frame index from which the data starts, EXCLUDING THE HEADER (assuming the header willl be locked)
+    Returns the number formats used by DataFrame.to_excel for the dates written without format
     """
+    wb = writer.book
+    return {'datetime': wb.add_format({'num_format': writer.datetime_format or 'YYYY-MM-DD HH:MM:SS'}), 
+        'date': wb.add_format({'num_format': writer.date_format or 'YYYY-MM-DD'}), 
+        'timedelta': wb.add_format({'num_format': '0'})}
 
-    # locked = wb.add_format({'locked': True})
-    unlocked_text = wb.add_format({'locked': False, 'text_wrap':True})
 
-    for col, header in enumerate(df.columns):
-        unlocked_cells = df.iloc[data_index:, col]        
-        ws.write_column(data_index, col, unlocked_cells, cell_format=unlocked_text)
+def write_cell(ws: xlsxwriter.worksheet.Worksheet, row: int, col: int, value: Any, cell_format: Union[xlsxwriter.format.Format,None], 
+    date_formats: Dict[str, xlsxwriter.format.Format]) -> None:
+    """
+    Writes a single value with its final format and the typed write method of its value, used by write_column and write_row.
+    Same conversions applied by DataFrame.to_excel: NaN -> blank, inf -> 'inf', numpy types -> python types, dates with the default date formats (get_date_formats)
+    The strings, floats and ints of the data are checked first, the other types are rare
+    """
+    value_type = value.__class__
+    if value_type is str:
+        if value == '':
+            if cell_format is not None:
+                ws.write_blank(row, col, None, cell_format)
+        elif value[0] == '=':
+            ws.write_formula(row, col, value, cell_format)
+        elif ':' in value or value[0] == '{':
+            ### urls and array formulas
+            ws.write(row, col, value, cell_format)
+        else:
+            ws.write_string(row, col, value, cell_format)
+    elif value_type is float and value - value == 0:
+        ### float values that are not NaN or inf
+        ws.write_number(row, col, value, cell_format)
+    elif value_type is int:
+        ws.write_number(row, col, value, cell_format)
+    elif is_scalar(value) and pd.isna(value):
+        if cell_format is not None:
+            ws.write_blank(row, col, None, cell_format)
+    elif isinstance(value, (bool, np.bool_)):
+        ws.write_boolean(row, col, bool(value), cell_format)
+    elif isinstance(value, (int, np.integer)):
+        ws.write_number(row, col, int(value), cell_format)
+    elif isinstance(value, (float, np.floating)):
+        if np.isinf(value):
+            ws.write_string(row, col, 'inf' if value > 0 else '-inf', cell_format)
+        else:
+            ws.write_number(row, col, float(value), cell_format)
+    elif isinstance(value, Decimal):
+        ws.write_number(row, col, value, cell_format)
+    elif isinstance(value, (datetime.datetime, datetime.date, datetime.timedelta)):
+        if cell_format is None:
+            ### Default formats of DataFrame.to_excel
+            if isinstance(value, datetime.datetime):
+                cell_format = date_formats['datetime']
+            elif isinstance(value, datetime.date):
+                cell_format = date_formats['date']
+            else:
+                cell_format = date_formats['timedelta']
+        if isinstance(value, datetime.timedelta):
+            ws.write_number(row, col, value.total_seconds() / 86400, cell_format)
+        else:
+            ws.write_datetime(row, col, value, cell_format)
+    else:
+        ws.write(row, col, str(value), cell_format)
 
-    ws.protect(sheet_password)
 
+def write_column(ws: xlsxwriter.worksheet.Worksheet, col: int, values: List[Any], 
+    cell_formats: List[Union[xlsxwriter.format.Format,None]], date_formats: Dict[str, xlsxwriter.format.Format]) -> None:
+    """
+    Writes every cell of a column once, with its final format and the typed write method of its value (write_cell).
+    The columns are written one after another (the same order as DataFrame.to_excel) so the shared strings keep the same order.
 
-### VERSION 2
-def lock_sheet(wb: xlsxwriter.workbook.Workbook, ws: xlsxwriter.worksheet.Worksheet, 
-    data_index: int, df: pd.DataFrame, df_settings: pd.DataFrame, allow_input_extra_rows: bool, 
-    sheet_password: str) -> Union[lock_sheet_simple_func, None]:
+    ws: worksheet
+    col: column number
+    values: values of the column from the first row
+    cell_formats: format of each value, None if the cell has no format
+    date_formats: formats of the dates written without format (get_date_formats)
     """
-    If 'lock_sheet_config' is not in the index of the dataframe, all excel columns will be editable 
-    If 'lock_sheet_config' contains only blanks, all excel columns will be editable 
-    if 'lock_sheet_config' contains only unrecognisable formats, all excel columns will be editable
 
-    If the format is unrecognised or left blank (''), the Excel column will be locked 
-    If allow_input_extra_rows=True and the column format is unrecognised or left blank (''), the column 
-    will be locked and ONLY the extra rows in the column will be editable
+    for row, (value, cell_format) in enumerate(zip(values, cell_formats)):
+        write_cell(ws, row, col, value, cell_format, date_formats)
+
 
-    Comms:
-    when concatenating df_data + extra_rows, extra_rows.index starts with 0 to num_extra_rows
-    and is stored in the custom index is created from the begining 
-    That's why df.loc[0] is referring to the frist blank row added 
+def write_row(ws: xlsxwriter.worksheet.Worksheet, row: int, columns: List[int], values: List[Any], 
+    cell_formats: List[Union[xlsxwriter.format.Format,None]], date_formats: Dict[str, xlsxwriter.format.Format]) -> None:
     """
+    Writes every cell of a row once, with its final format and the typed write method of its value (write_cell).
+    The rows are written in order for the workbooks in constant_memory mode, each row is flushed to the file once the next row is started
 
-    if 'lock_sheet_config' not in df_settings.index:
-        return lock_sheet_simple(wb, ws, data_index, df, sheet_password)
-    else:
-        lock_sheet_config = [config_format if config_format in format_lock_config_dict.keys() else '' for config_format in df_settings.loc['lock_sheet_config']]
-        all_blanks = all('' == _format for _format in lock_sheet_config)
-        if all_blanks:
-            return lock_sheet_simple(wb, ws, data_index, df, sheet_password)
-
-    if allow_input_extra_rows:
-        first_blank_row_index = df.index.tolist().index(0)
-
-    for col, lock_config in zip(df.columns, lock_sheet_config):
-        if allow_input_extra_rows:
-            if lock_config not in format_lock_config_dict.keys():
-                ### range from which blank rows start
-                unlocked_cells = df.loc[0:, col]
-                ws.write_column(first_blank_row_index, col, unlocked_cells, cell_format=wb.add_format(format_lock_config_dict['unlocked_text']))
-            else:
-                unlocked_cells = df.iloc[data_index:, col]
-                ws.write_column(data_index, col, unlocked_cells, cell_format=wb.add_format(format_lock_config_dict[lock_config]))
-        else:
-            if lock_config in format_lock_config_dict.keys():
-                unlocked_cells = df.iloc[data_index:, col]        
-                ws.write_column(data_index, col, unlocked_cells, cell_format=wb.add_format(format_lock_config_dict[lock_config]))          
+    ws: worksheet
+    row: row number
+    columns: column number of each value
+    values: values of the row
+    cell_formats: format of each value, None if the cell has no format
+    date_formats: formats of the dates written without format (get_date_formats)
+    """
 
-    ws.protect(sheet_password)
+    for col, value, cell_format in zip(columns, values, cell_formats):
+        write_cell(ws, row, col, value, cell_format, date_formats)
 
 
 class XlFileTemp(Protocol):
@@ -139,6 +219,9 @@ def process_template(writer: pd.ExcelWriter, template: XlFileTemp, split_by_valu
     split_by: str, split_value: str, sheet_password: Optional[str]=None) -> None:
     """
     Transform the template into the excel file 
+    The parts shared by all the files (headers, formats, dropdown lists, data validation, conditional formatting, widths) are compiled
+    once per template (template.skeleton()), only the data rows of the file are read here
+    The cells are written column by column, or row by row if the workbook is in constant_memory mode (create_xl_file(constant_memory=True))
 
     writer: pd.ExcelWriter, Context manager that creates the Excel file
     template: XlFileTemp object
@@ -149,60 +232,139 @@ def process_template(writer: pd.ExcelWriter, template: XlFileTemp, split_by_valu
     sheet_password: sheet password for the excel file to avoid the users to change the format of the main sheet, default=None 
     """
 
-    df = template.template_filtered(split_by=split_by, split_value=split_value, split_by_value=split_by_value)
-    df = set_formula(df, template.data_index, template.df_settings)
-
-    
-    df.to_excel(writer, sheet_name=template_name, index=False, header=False)
-    if template.dv_config1.df_data_validation is not None: 
-        template.dv_config1.df_data_validation.to_excel(writer,sheet_name=template.dv_config1.dropdown_list_sheet, index=False)
-        ws_dv = writer.sheets[template.dv_config1.dropdown_list_sheet]
-        ws_dv.hide()
-
-    if template.dv_config2.data_validation_dict is not None: 
-        template.dv_config2.picklists.to_excel(writer,sheet_name=template.dv_config2.dropdown_list_sheet, index=False)
-        ws_dv2 = writer.sheets[template.dv_config2.dropdown_list_sheet]
-        ws_dv2.hide()
+    protect_sheet = sheet_password is not None and sheet_password != ''
+    skeleton = template.skeleton(protect_sheet)
+    with trace('filter'):
+        df_rows = template.data_filtered(split_by=split_by, split_value=split_value, split_by_value=split_by_value)
 
     wb = writer.book
-    ws = writer.sheets[template_name]
-    
-    ### Insert Header format
-    set_headers_format(wb, ws, df, template.df_settings, template.header_index_list, template.hd_index)
+    ws = wb.add_worksheet(template_name)
+
+    data_index = skeleton.data_index
+    num_rows = df_rows.shape[0]
+    num_rows_extra = template.num_rows_extra if skeleton.extra_rows else 0
+    length = data_index + num_rows + num_rows_extra
+
+    ### Header format, format of the data rows and format of the extra rows of each column (Lock Sheet)
+    with trace('headers'):
+        headers_format = {row: [get_format(wb, format_name) for format_name in format_names] for row, format_names in skeleton.header_formats.items()}
+    with trace('lock'):
+        data_row_formats = [None for _ in skeleton.columns]
+        extra_row_formats = [None for _ in skeleton.columns]
+        if skeleton.data_formats is not None:
+            ### The columns editable only in the extra rows keep their data cells without format (locked)
+            for col_num, (from_row, format_name) in enumerate(skeleton.data_formats):
+                cell_format = None if format_name is None else get_format(wb, format_name)
+                if from_row == 'data':
+                    data_row_formats[col_num] = cell_format
+                if from_row is not None and num_rows_extra > 0:
+                    extra_row_formats[col_num] = cell_format
+    date_formats = get_date_formats(writer)
+
+    ### Every cell of the headers and the data rows is written once with its format
+    if wb.constant_memory:
+        ### Row by row: headers and data rows
+        with trace('headers'):
+            for row in range(data_index):
+                write_row(ws, row, skeleton.columns, [values[row] for values in skeleton.header_values], headers_format[row], date_formats)
+
+        with trace('write_data'):
+            formulas = [(col_num, formula) for col_num, formula in enumerate(skeleton.formulas) if formula != '']
+            for row, values in enumerate(df_rows.itertuples(index=False, name=None), data_index):
+                if formulas:
+                    values = list(values)
+                    for col_num, formula in formulas:
+                        values[col_num] = formula
+                write_row(ws, row, skeleton.columns, values, data_row_formats, date_formats)
+    else:
+        ### The header cells are written with the data of their column (the shared strings keep the order of DataFrame.to_excel)
+        with trace('write_data'):
+            for col_num, col in enumerate(skeleton.columns):
+                formula = skeleton.formulas[col_num]
+                if formula != '':
+                    values = skeleton.header_values[col_num] + [formula] * num_rows
+                else:
+                    values = skeleton.header_values[col_num] + df_rows.iloc[:, col_num].tolist()
+
+                cell_formats = [headers_format[row][col_num] for row in range(data_index)] + [data_row_formats[col_num]] * num_rows
+                write_column(ws, col, values, cell_formats, date_formats)
+
+    ### The extra rows are formatted as rows (set_row): the blank cells of the row take the unlocked format shared by most editable columns
+    ### Only the formulas and the columns with another format have cells, the columns locked in the extra rows are written with the locked format
+    ### The format is set on the rows and not on the columns, the cells below the extra rows stay locked. The columns after the template
+    ### are unlocked in the extra rows too, they are hidden and the protected sheet does not allow to unhide them
+    ### The rows are defined (set_row) so they are not hidden with the unused rows of the protected sheet
+    row_format = None
+    if any(cell_format is not None for cell_format in extra_row_formats):
+        row_format = Counter(cell_format for cell_format in extra_row_formats if cell_format is not None).most_common(1)[0][0]
+    locked_format = None if row_format is None else get_format(wb, 'locked')
+    extra_columns, extra_values, extra_formats = [], [], []
+    for col, cell_format, formula in zip(skeleton.columns, extra_row_formats, skeleton.formulas):
+        if formula != '' or cell_format is not row_format:
+            extra_columns.append(col)
+            extra_values.append(formula)
+            extra_formats.append(locked_format if cell_format is None else cell_format)
+    with trace('extra_rows'):
+        for row in range(data_index + num_rows, length):
+            if protect_sheet:
+                ws.set_row(row, None, row_format)
+            write_row(ws, row, extra_columns, extra_values, extra_formats, date_formats)
+
+    ### Hidden sheets of the dropdown lists
+    with trace('dropdown_sheets'):
+        for sheet_name, columns in skeleton.dropdown_sheets:
+            ws_dv = wb.add_worksheet(sheet_name)
+            if wb.constant_memory:
+                col_nums = list(range(len(columns)))
+                for row, values in enumerate(zip(*columns)):
+                    write_row(ws_dv, row, col_nums, values, [None] * len(values), date_formats)
+            else:
+                for col, values in enumerate(columns):
+                    write_column(ws_dv, col, values, [None] * len(values), date_formats)
+            ws_dv.hide()
 
     ### Insert Dropdown lists
-    template.dv_config1.set_data_validation(ws, df)
-    template.dv_config2.set_data_validation(ws, df)
+    with trace('data_validation'):
+        for columns, opts_dict in skeleton.data_validations:
+            ### ws.data_validation(first_row, first_col, last_row, last_col, options_dict={...})
+            ws.data_validation(*rule_range(columns, data_index, length - 1, opts_dict))
 
     ### Set Conditional Formatting
     ## The order of the conditions matters. A new condition do not overwrite a previous condition.
     ## The conditions in the conditional_formatting sheet are superimposed over the Mandatory fields
     ## The mandtory flag does not overwrite an existing condition in the conditional_formatting sheet
-    template.cond_formatting.set_conditional_formatting(wb, ws, df)
-    highlight_mandatory(wb, ws, df, template.df_settings, template.data_index, template.extra_rows, template.num_rows_extra)
+    with trace('conditional_formatting'):
+        for columns, opts_settings in skeleton.conditional_formats:
+            ws.conditional_format(*rule_range(columns, data_index, length - 1, {**opts_settings, 'format': get_format(wb, opts_settings['format'])}))
+        highlight_mandatory(wb, ws, skeleton.mandatory_columns, data_index, data_index + num_rows)
 
     ### Set column width
-    column_width(ws, df, template.df_settings)
+    for col, width in zip(skeleton.columns, skeleton.column_widths):
+        ws.set_column(col, col, width=width)
 
     ### Protect Sheet
     ### All sheets will have the password
-    if sheet_password is not None and sheet_password != '':
-        ### Hide all rows without data. Even when the empty extra rows are allowed
-        ## it will only show those that can be filled in
-        ws.set_default_row(hide_unused_rows=True)
-        
-        ### Hide unused columns 
-        last_col_num = df.columns[-1]
-        hide_from_col_name = xlsxwriter.utility.xl_col_to_name(last_col_num + 1)
-        ws.set_column(f'{hide_from_col_name}:XFD', None, None, {"hidden": True})
+    if protect_sheet:
+        with trace('lock'):
+            ### Hide all rows without data. Even when the empty extra rows are allowed
+            ## it will only show those that can be filled in
+            ws.set_default_row(hide_unused_rows=True)
+            
+            ### Hide unused columns 
+            last_col_num = skeleton.columns[-1]
+            hide_from_col_name = xlsxwriter.utility.xl_col_to_name(last_col_num + 1)
+            ws.set_column(f'{hide_from_col_name}:XFD', None, None, {"hidden": True})
 
-        lock_sheet(wb, ws, template.data_index, df, template.df_settings, template.extra_rows, sheet_password)
+            ws.protect(sheet_password)
 
 
 def create_xl_file(*, template: XlFileTemp, file_path: str, template_name: str, split_by_value: Optional[bool]=None, split_by: Optional[str]=None,
-    split_value: Optional[str]=None, sheet_password: Optional[str]=None, workbook_password: Optional[str]=None) -> None:
+    split_value: Optional[str]=None, sheet_password: Optional[str]=None, workbook_password: Optional[str]=None, 
+    encrypted_file_path: Optional[str]=None, file_password: Optional[str]=None, sink: Optional[OutputSink]=None, stamp: Optional[XlFileStamp]=None,
+    constant_memory: Optional[bool]=False) -> None:
     """
     Creates the context manager pd.ExcelWriter (writer) to create the excel file of the template (XlFileTemp).
+    The file is created in memory and saved once (save_xl_file)
 
     template: XlFileTemp object
     file_path: complete filename of the excel file
@@ -212,14 +374,69 @@ def create_xl_file(*, template: XlFileTemp, file_path: str, template_name: str,
     split_by_value: A boolean flag (True or False). If True, the method filters by the split_value provided. If False, it uses all values from the split_by column.
     sheet_password: sheet password for the excel file to avoid the users to change the format of the main sheet, default=None 
     workbook_password: workbook password to avoid the users to add more sheets in the excel file, defaul=None
+    encrypted_file_path: complete filename of the encrypted copy of the excel file (native encryption)
+    file_password: password to open the encrypted copy of the excel file, if None the file is not encrypted
+    sink: where the files are saved (FolderSink, ZipSink, MemorySink), default FolderSink
+    stamp: file already rendered for split_by_range (split_by_value=False), the file is stamped with the split_value instead of rendered (XlFileStamp)
+    constant_memory: False/True xlsxwriter constant_memory mode, the main sheet is written row by row and each row is flushed to disk. 
+    The memory used does not grow with the number of rows (the strings are written inline instead of in the shared strings table)
     """
     
-    with pd.ExcelWriter(file_path, engine='xlsxwriter') as writer:
-        process_template(writer, template, split_by_value, template_name, split_by, split_value, sheet_password)
-        
-     
-    ### Protect Workbook
-    if workbook_password is not None and workbook_password != '':
-        protect_workbook(file_path, password=workbook_password)
+    with trace_file(file_path):
+        data = None
+        if stamp is not None:
+            with trace('stamp'):
+                data = stamp.stamp(split_value)
+        if data is None:
+            xl_bytes = io.BytesIO()
+            writer = pd.ExcelWriter(xl_bytes, engine='xlsxwriter', engine_kwargs={'options': {'constant_memory': constant_memory}})
+            try:
+                process_template(writer, template, split_by_value, template_name, split_by, split_value, sheet_password)
+            finally:
+                with trace('save'):
+                    writer.close()
+            data = xl_bytes.getvalue()
+            
+        save_xl_file(data, file_path, workbook_password, encrypted_file_path, file_password, sink)
+
+
+def create_xl_file_multiple(*, template_list: List[XlFileTemp], split_by_value: List[bool], file_path: str, split_by: Optional[str]=None,
+    split_value: Optional[str]=None, sheet_password: Optional[str]=None, workbook_password: Optional[str]=None, 
+    encrypted_file_path: Optional[str]=None, file_password: Optional[str]=None, sink: Optional[OutputSink]=None, stamp: Optional[XlFileStamp]=None,
+    constant_memory: Optional[bool]=False) -> None:
+    """
+    Creates the excel file with multiple templates in it, one tab for each template in template_list.
+    The file is created in memory and saved once (save_xl_file)
 
+    template_list: Python list containing the templates (XlFileTemp objects) to include in the Excel File.
+    split_by_value: list of boolean flags (True or False), one for each template in template_list. If True, the template is filtered by the split_value provided. If False, it uses all values from the split_by column.
+    file_path: complete filename of the excel file
+    split_by: The name of the column to filter by.
+    split_value: The specific value to filter the data by.
+    sheet_password: sheet password for the excel file to avoid the users to change the format of the main sheet, default=None 
+    workbook_password: workbook password to avoid the users to add more sheets in the excel file, defaul=None
+    encrypted_file_path: complete filename of the encrypted copy of the excel file (native encryption)
+    file_password: password to open the encrypted copy of the excel file, if None the file is not encrypted
+    sink: where the files are saved (FolderSink, ZipSink, MemorySink), default FolderSink
+    stamp: file already rendered when all the templates are replicated (split_by_value=False), the file is stamped with the split_value instead of rendered (XlFileStamp)
+    constant_memory: False/True xlsxwriter constant_memory mode, the sheets are written row by row and each row is flushed to disk
+    """
 
+    with trace_file(file_path):
+        data = None
+        if stamp is not None:
+            with trace('stamp'):
+                data = stamp.stamp(split_value)
+        if data is None:
+            xl_bytes = io.BytesIO()
+            writer = pd.ExcelWriter(xl_bytes, engine='xlsxwriter', engine_kwargs={'options': {'constant_memory': constant_memory}})
+            try:
+                for j, (template, sbv) in enumerate(zip(template_list, split_by_value), 1):
+                    template_name = f'Sheet{j}'
+                    process_template(writer, template, sbv, template_name, split_by, split_value, sheet_password)
+            finally:
+                with trace('save'):
+                    writer.close()
+            data = xl_bytes.getvalue()
+
+        save_xl_file(data, file_path, workbook_password, encrypted_file_path, file_password, sink)
@@ -1,14 +1,12 @@
 import pandas as pd
-import xlsxwriter
 
 from abc import ABC, abstractclassmethod
-from typing import Dict, Union
+from typing import Dict, List, Tuple, Union
 
 from .data_validation_config1_func import get_data_validation_dict,clean_df_data_validation
 from .data_validation_typing import DataValDict
 
 
-
 class DataValidationConfiguration(ABC):
 
     @abstractclassmethod
@@ -17,28 +15,15 @@ class DataValidationConfiguration(ABC):
         self.data_val_headers: list 
         self.data_index: int
 
-    def set_data_validation(self, ws: xlsxwriter.worksheet.Worksheet, df: pd.DataFrame) -> None:
-        
+    def validation_columns(self, header_list: List[str]) -> List[Tuple[int, dict]]:
         """
-        Set up data validation, dropdown lists 
-        Parameters:
-        ws: worksheet
-        df: dataframe used to create the template header=None
-        self.data_validation_dict: DataValDict Dictionary containing the opctions_dict for each field in scope for data validation
-        self.data_val_headers: List[Header] List of headers in scope for data validation
+        Returns the columns in scope for data validation and their options [(column, options_dict)]
+        header_list: HEADER row of the template
         """
         if self.data_validation_dict is None:
-            return None
-
-        column_indexes_to_apply_data_validation = [i for i, hd in enumerate(df.loc['HEADER']) if hd in self.data_val_headers]  
-        last_row_index = df.shape[0] - 1  
+            return []
 
-        for col in column_indexes_to_apply_data_validation:
-            hd = df.loc['HEADER', col]
-            opts_dict = self.data_validation_dict[hd]
-            ### ws.data_validation(first_row, first_col, last_row, last_col, options_dict={...})
-            # ws.data_validation(initial_index, col, last_row_index, col, {'validate':'list', 'source':data_source_dict[hd], 'error_type':'stop'})
-            ws.data_validation(self.data_index, col, last_row_index, col, opts_dict)
+        return [(col, self.data_validation_dict[hd]) for col, hd in enumerate(header_list) if hd in self.data_val_headers]
 
 
 class DataValidationConfig1(DataValidationConfiguration):
@@ -79,7 +64,7 @@ class DataValidationConfig2(DataValidationConfiguration):
             self.picklists = df_picklists
             self.dropdown_list_sheet = dropdown_list_sheet
             self.__data_validation_dict = None
-            self.data_val_headers = self.data_validation_dict.keys()
+            self.data_val_headers = list(self.data_validation_dict.keys())
 
     @staticmethod
     def create_opts_dict(opts_settings:pd.Series) -> Dict[str,str]:
@@ -4,7 +4,6 @@ import xlsxwriter
 from typing import List, Tuple, Optional, Union
 
 from .data_validation_typing import SourceDict, SingleOptionsDict, DataValDict
-from .utils_func import export_json
 
 
 
@@ -93,8 +92,6 @@ df_data_validation: pd.DataFrame, dropdown_list_sheet: Optional[str]='Dropdown_L
         opts_dict = get_options_dict_data_validation(hd, source, opts_dv_included, df_data_validation_complete)
         data_validation_opts_dict[hd] = opts_dict
 
-    export_json(data_validation_opts_dict, 'data_validation_settings')
-    
     return data_validation_opts_dict
 
 
@@ -1,11 +1,17 @@
 import pandas as pd
 
 import glob
+import importlib.util
 import os
 import random
 import string
-from typing import Optional
+import subprocess
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Any, Iterable, Optional, Tuple, Union
 
+from .agile_encryption import PackageCryptographyMissing
+from .tracer import active_tracer, run_traced, trace
 from .utils_func import Project
 
 
@@ -35,6 +41,19 @@ class PackageMsofficeMissing(Exception):
     """
 
 
+class EncryptionFailed(Exception):
+
+    def __init__(self, file_name: str, returncode: int, stderr: str) -> None:
+        self.file_name = file_name
+        self.returncode = returncode
+        errormessage = f"msoffice-crypt could not encrypt '{file_name}' (exit code {returncode})\n{stderr}"
+        super().__init__(errormessage)
+
+
+MSOFFICE_CRYPT = 'msoffice/bin/msoffice-crypt.exe'
+ENCRYPTION_BACKENDS = ['native', 'msoffice']
+
+
 def _check_msoffice_installed(init: Optional[bool]=False) -> None:
     folders = glob.glob('*/')
 
@@ -47,33 +66,117 @@ def _check_msoffice_installed(init: Optional[bool]=False) -> None:
             raise PackageMsofficeMissing(PackageMsofficeMissing.errormessage)
 
 
-def set_password(path_1: str, path_2: str, passwordMaster_name: str) -> None:
+def get_encryption_backend(encryption_backend: Optional[str]=None) -> str:
+    """
+    Returns the encryption backend used when protect_files=True
+    'native': the files are encrypted in memory by the process that creates them (encrypt_agile), requires cryptography
+    'msoffice': the files are encrypted by msoffice-crypt once they are saved (EncryptionPool), requires msoffice
+    None: 'native' if cryptography is installed, otherwise 'msoffice'
+    """
+
+    if encryption_backend is None:
+        encryption_backend = 'native' if importlib.util.find_spec('cryptography') is not None else 'msoffice'
+    elif encryption_backend not in ENCRYPTION_BACKENDS:
+        raise ValueError(f"encryption_backend '{encryption_backend}' not accepted. Options: {ENCRYPTION_BACKENDS}")
+
+    if encryption_backend == 'msoffice':
+        _check_msoffice_installed()
+    elif importlib.util.find_spec('cryptography') is None:
+        raise PackageCryptographyMissing(PackageCryptographyMissing.errormessage)
 
-    def encrypt_file(password: str, path_in: str, path_out: str):
-        """msoffice-crypt must be installed in the local folder"""
+    return encryption_backend
 
-        os.system(f'msoffice/bin/msoffice-crypt.exe -e -p {password} {path_in} {path_out}')
 
-    df_pw = pd.read_csv(passwordMaster_name)
-    num_files = df_pw.shape[0]
-    
-    count = 1
-    for file_n, pw in zip(df_pw['Filename'], df_pw['Password']):         
-        path_in = '"{}/{}"'.format(path_1, file_n)
-        path_out = '"{}/{}"'.format(path_2, file_n)
-        encrypt_file(pw, path_in, path_out)
-        # print(file_n, '   Password:', pw, f'---->{count}/{num_files}')
-        count +=1
+def encrypt_file(password: str, path_in: str, path_out: str, retries: Optional[int]=2) -> None:
+    """
+    msoffice-crypt must be installed in the local folder
+    The command is run without a shell, if it fails it is retried up to retries times before raising EncryptionFailed
+    """
+
+    for _ in range(retries + 1):
+        with trace('encryption', file=path_in):
+            result = subprocess.run([MSOFFICE_CRYPT, '-e', '-p', str(password), path_in, path_out], capture_output=True, text=True)
+        if result.returncode == 0:
+            return None
+
+    raise EncryptionFailed(os.path.basename(path_in), result.returncode, result.stderr.strip())
+
+
+class EncryptionPool:
+    """
+    Bounded pool of msoffice-crypt processes
+    Each file can be submitted as soon as it is created, so the encryption overlaps with the creation of the next files
+
+    path_1: folder of the files to encrypt
+    path_2: folder where the encrypted files are saved
+    max_workers: number of msoffice-crypt processes running at the same time, default os.cpu_count()
+    retries: number of times a failed file is encrypted again
+    """
+
+    def __init__(self, path_1: str, path_2: str, max_workers: Optional[int]=None, retries: Optional[int]=2) -> None:
+        self.path_1 = path_1
+        self.path_2 = path_2
+        self.retries = retries
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1)
+        self.futures = []
+        self.start = time.perf_counter()
+
+    def submit(self, file_name: str, password: str) -> Future:
+        path_in = os.path.join(self.path_1, file_name)
+        path_out = os.path.join(self.path_2, file_name)
+        ### The events of the encryption are recorded in the tracer active when the file is submitted
+        future = self.executor.submit(run_traced, active_tracer(), encrypt_file, password, path_in, path_out, self.retries)
+        self.futures.append(future)
+        return future
+
+    def wait(self) -> None:
+        """Waits until all the files are encrypted, the first failure cancels the pending files and is raised"""
+
+        try:
+            for future in as_completed(self.futures):
+                future.result()
+        finally:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+        elapsed = time.perf_counter() - self.start
+        num_files = len(self.futures)
+        print(f'Encrypted files: {num_files} in {elapsed:.1f}s ({num_files / max(elapsed, 1e-9):.1f} files/s)')
+
+    def __enter__(self) -> 'EncryptionPool':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.wait()
+        else:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def set_password(path_1: str, path_2: str, passwordMaster_name: Union[str, Iterable[Tuple[str,str]]], 
+    max_workers: Optional[int]=None, retries: Optional[int]=2) -> None:
+    """
+    Encrypts the files of path_1 into path_2 
+    passwordMaster_name: path of the password master csv file (columns 'Filename' and 'Password') or list of (filename, password)
+    max_workers: number of msoffice-crypt processes running at the same time, default os.cpu_count()
+    retries: number of times a failed file is encrypted again
+    """
+
+    password_master = passwordMaster_name
+    if isinstance(passwordMaster_name, str):
+        df_pw = pd.read_csv(passwordMaster_name, dtype=str, keep_default_na=False)
+        password_master = zip(df_pw['Filename'], df_pw['Password'])
+
+    with EncryptionPool(path_1, path_2, max_workers, retries) as pool:
+        for file_n, pw in password_master:
+            pool.submit(file_n, pw)
     
 
-def create_password(project: Project, split_by_value: str, random_pw: Optional[bool]=False) -> str:
+def create_password(project: Project, split_by_value: Any, random_pw: Optional[bool]=False) -> str:
     """
     If random_pw is False is because there will be multiple batches and the password must remain the same
     password logic = project.name + str(123 * l) + split_by_value[:3][::-1]
     """
 
-    _check_msoffice_installed()
-    
     if random_pw is True:
         letters = string.ascii_uppercase + string.digits
         random_6 =  ''.join(random.choice(letters) for _ in range(6))
@@ -83,7 +186,7 @@ def create_password(project: Project, split_by_value: str, random_pw: Optional[b
             return random_6
         
 
-    split_by_value = ''.join(char for char in split_by_value if char.isalnum())
+    split_by_value = ''.join(char for char in str(split_by_value) if char.isalnum())
     l = len(split_by_value)
     if project.root == 'received':
         pw = project.name + str(123 * l) + split_by_value[:3][::-1]  # split_by_value[:-4:-1]
@@ -1,3 +1,9 @@
+import xlsxwriter
+
+from typing import Dict
+from weakref import WeakKeyDictionary
+
+
 
 format_dict = {
     'format_0': {'text_wrap':True, 'bold':True}, 
@@ -56,4 +62,36 @@ format_lock_config_dict = {
     # 'locked_dollars': {'text_wrap':False, 'num_format': '$#,##0.00'},
     # 'locked_pounds': {'text_wrap':False, 'num_format': '£#,##0.00'},
     # 'locked_euros': {'text_wrap':False, 'num_format': '€#,##0.00'},
-    }
\ No newline at end of file
+    }
+
+
+### Formats written by the package that are not options of the settings
+### locked: cells of the extra rows that stay locked when the row has an unlocked format (process_template)
+format_internal_dict = {
+    'locked': {'locked': True},
+    }
+
+
+### Properties of format_dict, format_lock_config_dict and format_internal_dict resolved once per process, the names do not overlap
+format_properties_dict = {**format_dict, **format_lock_config_dict, **format_internal_dict}
+
+### Formats already created in each workbook {workbook: {format_name: format}}
+_workbook_formats: 'WeakKeyDictionary[xlsxwriter.workbook.Workbook, Dict[str, xlsxwriter.format.Format]]' = WeakKeyDictionary()
+
+
+def get_format(wb: xlsxwriter.workbook.Workbook, format_name: str) -> xlsxwriter.format.Format:
+    """
+    Returns the Format of format_dict, format_lock_config_dict or format_internal_dict for the workbook 
+    Each format is created only once per workbook and reused by every header, column and conditional formatting rule
+
+    wb: workbook
+    format_name: key of format_dict, format_lock_config_dict or format_internal_dict
+    """
+
+    wb_formats = _workbook_formats.setdefault(wb, {})
+    cell_format = wb_formats.get(format_name)
+    if cell_format is None:
+        cell_format = wb.add_format(format_properties_dict[format_name])
+        wb_formats[format_name] = cell_format
+
+    return cell_format
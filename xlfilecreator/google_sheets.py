@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+
+### CSV export of a tab of a google sheets workbook, it can be pointed to a local server that serves the same endpoint
+GVIZ_CSV_URL = 'https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:csv&sheet={sheet_name}'
+
+
+def _cache_paths(cache_dir: str, sheet_id: str, sheet_name: str):
+    key = hashlib.sha1(f'{sheet_id}/{sheet_name}'.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f'{key}.csv'), os.path.join(cache_dir, f'{key}.json')
+
+
+def fetch_google_sheet_csv(sheet_id: str, sheet_name: str, cache_dir: Optional[str]=None, url_template: Optional[str]=None) -> bytes:
+    """
+    Downloads the csv of a tab of a google sheets workbook
+    If cache_dir is provided the responses are saved on disk with their ETag/Last-Modified, the next
+    requests are conditional and an unchanged tab (304 Not Modified) is read from the cache
+
+    sheet_id: google sheets id
+    sheet_name: name of the tab
+    cache_dir: folder of the on-disk cache, if None the tab is always downloaded
+    url_template: url of the csv with the fields {sheet_id} and {sheet_name}, default GVIZ_CSV_URL
+    """
+
+    url = (url_template or GVIZ_CSV_URL).format(sheet_id=quote(sheet_id, safe=''), sheet_name=quote(sheet_name, safe=''))
+    request = Request(url)
+
+    if cache_dir is not None:
+        csv_path, meta_path = _cache_paths(cache_dir, sheet_id, sheet_name)
+        if os.path.isfile(csv_path) and os.path.isfile(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get('etag'):
+                request.add_header('If-None-Match', meta['etag'])
+            if meta.get('last_modified'):
+                request.add_header('If-Modified-Since', meta['last_modified'])
+
+    try:
+        with urlopen(request) as response:
+            data = response.read()
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+    except HTTPError as e:
+        if e.code == 304 and cache_dir is not None:
+            with open(csv_path, 'rb') as f:
+                return f.read()
+        raise
+
+    ### Only the responses that can be revalidated are cached
+    if cache_dir is not None and (etag or last_modified):
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(csv_path, 'wb') as f:
+            f.write(data)
+        with open(meta_path, 'w') as f:
+            json.dump({'etag': etag, 'last_modified': last_modified, 'url': url}, f)
+
+    return data
+
+
+def fetch_google_sheets(sheet_id: str, sheet_names: List[Optional[str]], cache_dir: Optional[str]=None,
+    url_template: Optional[str]=None, max_workers: Optional[int]=None) -> Dict[str, bytes]:
+    """
+    Downloads the tabs of a google sheets workbook concurrently (fetch_google_sheet_csv)
+    Returns {sheet_name: csv bytes}, the tabs None or '' are skipped
+
+    sheet_id: google sheets id
+    sheet_names: names of the tabs
+    cache_dir: folder of the on-disk cache, if None the tabs are always downloaded
+    url_template: url of the csv with the fields {sheet_id} and {sheet_name}, default GVIZ_CSV_URL
+    max_workers: number of concurrent downloads, default one per tab
+    """
+
+    sheet_names = list(dict.fromkeys(name for name in sheet_names if name is not None and name != ''))
+    if not sheet_names:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(sheet_names)) as executor:
+        futures = {name: executor.submit(fetch_google_sheet_csv, sheet_id, name, cache_dir, url_template) for name in sheet_names}
+        return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,74 @@
+import os
+import time
+import zipfile
+from typing import Dict, List, Optional, Protocol, Tuple
+
+
+class OutputSink(Protocol):
+
+    def write(self, file_path: str, data: bytes) -> None:
+        ...
+
+
+class FolderSink:
+    """Saves each file in its folder"""
+
+    def write(self, file_path: str, data: bytes) -> None:
+        with open(file_path, 'wb') as f:
+            f.write(data)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> 'FolderSink':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class ZipSink:
+    """
+    Appends each file to the zip archive of its folder ({folder}.zip) as soon as it is created, the folders are never created.
+    The excel files are already deflated, by default they are stored in the archive without compressing them again
+    Used as a context manager, the archives are closed (and readable) even if the creation of the files fails
+
+    compresslevel: if None the files are stored (ZIP_STORED), otherwise they are compressed (ZIP_DEFLATED) with this level 0-9
+    """
+
+    def __init__(self, compresslevel: Optional[int]=None) -> None:
+        self.compresslevel = compresslevel
+        self.archives: Dict[str, zipfile.ZipFile] = {}
+
+    def write(self, file_path: str, data: bytes) -> None:
+        folder, file_name = os.path.split(file_path)
+        archive = self.archives.get(folder)
+        if archive is None:
+            archive = zipfile.ZipFile(f'{folder}.zip', 'w')
+            self.archives[folder] = archive
+
+        zip_info = zipfile.ZipInfo(file_name, date_time=time.localtime()[:6])
+        if self.compresslevel is None:
+            archive.writestr(zip_info, data, compress_type=zipfile.ZIP_STORED)
+        else:
+            archive.writestr(zip_info, data, compress_type=zipfile.ZIP_DEFLATED, compresslevel=self.compresslevel)
+
+    def close(self) -> None:
+        for archive in self.archives.values():
+            archive.close()
+
+    def __enter__(self) -> 'ZipSink':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class MemorySink:
+    """Keeps the files in memory, the worker processes return them to the sink of the main process"""
+
+    def __init__(self) -> None:
+        self.files: List[Tuple[str, bytes]] = []
+
+    def write(self, file_path: str, data: bytes) -> None:
+        self.files.append((file_path, data))
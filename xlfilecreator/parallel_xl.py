@@ -0,0 +1,121 @@
+import pandas as pd
+
+import copy
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Protocol, Tuple
+
+from .output_sink import MemorySink
+from .pipeline import FilePipeline
+from .tracer import Event, Tracer, active_tracer, tracing
+from .utils_func import get_column_to_split_by
+
+
+class XlFileTemp(Protocol):
+    ...
+
+
+class ProgressBar(Protocol):
+    ### tqdm progress bar of the caller, tqdm is not imported by the worker processes
+
+    def update(self, n: int=1) -> Any:
+        ...
+
+
+### State of each worker process, set once by the initializer
+_shared_kwargs: Dict[str, Any] = {}
+_split_templates: List[XlFileTemp] = []
+_trace = False
+
+
+def template_without_data(template: XlFileTemp) -> XlFileTemp:
+    """
+    Returns a shallow copy of the template without the data rows.
+    The copy keeps all the settings (headers, formats, data validation, conditional formatting)
+    so it can be sent to the workers without pickling the whole dataset.
+    """
+    template_copy = copy.copy(template)
+    template_copy.df_data_only = template.df_data_only.iloc[:0]
+
+    return template_copy
+
+
+def _init_worker(shared_kwargs: Dict[str, Any], split_templates: List[XlFileTemp], trace: bool) -> None:
+    global _shared_kwargs, _split_templates, _trace
+    _shared_kwargs = shared_kwargs
+    _split_templates = split_templates
+    _trace = trace
+
+
+def _create_file(func: Callable[..., None], job_kwargs: Dict[str, Any], 
+    data_slices: List[pd.DataFrame]) -> Tuple[List[Tuple[str, bytes]], float, List[Event]]:
+    for template, df_slice in zip(_split_templates, data_slices):
+        template.df_data_only = df_slice
+
+    ### The files and the events of the tracer are returned to the main process that saves them
+    sink = MemorySink()
+    tracer = Tracer() if _trace else None
+    start = time.perf_counter()
+    with tracing(tracer):
+        func(**_shared_kwargs, **job_kwargs, sink=sink)
+    return sink.files, time.perf_counter() - start, [] if tracer is None else tracer.events
+
+
+def create_xl_files_parallel(func: Callable[..., None], shared_kwargs: Dict[str, Any], split_templates: List[XlFileTemp],
+    data_templates: List[XlFileTemp], split_by: str, jobs: List[Dict[str, Any]], max_workers: int, pbar: ProgressBar, pipeline: FilePipeline) -> None:
+    """
+    Creates the excel files in a pool of max_workers processes (generation stage of the pipeline)
+    Each worker receives the templates once through the initializer, each task only carries the rows of its split_value
+    The workers protect and encrypt the files they create and return them to the pipeline, that saves them
+    The events of the workers are recorded in the active tracer of the main process (tracing)
+
+    func: function that creates one excel file, called as func(**shared_kwargs, **job_kwargs)
+    shared_kwargs: arguments shared by all the files (templates, passwords, etc)
+    split_templates: templates included in shared_kwargs without data (template_without_data) that are filtered by the split_value
+    data_templates: original templates of split_templates, the rows of each split_value are taken from them
+    split_by: The name of the column to filter by.
+    jobs: list of the arguments of each file (file_path, split_value), the files are submitted in this order
+    max_workers: number of worker processes
+    pbar: progress bar updated as the files are created
+    pipeline: FilePipeline that saves the files returned by the workers
+    """
+
+    cols_to_split = [get_column_to_split_by(template.df_settings, split_by) for template in data_templates]
+
+    def data_slices(split_value: str) -> List[pd.DataFrame]:
+        ### The partitioned templates (data spilled to disk) read the rows of the split_value in the worker
+        return [template.df_data_only if template.partitions is not None else template.split_rows(col_to_split, split_value)
+                for template, col_to_split in zip(data_templates, cols_to_split)]
+
+    ### Only a few tasks are kept in flight, so the slices of rows do not pile up in memory
+    max_in_flight = max_workers * 2
+    future_jobs = {}
+
+    tracer = active_tracer()
+
+    def file_created(future) -> None:
+        files, generate_seconds, events = future.result()
+        for event in events:
+            tracer.emit(event)
+        pbar.update(1)
+        pipeline.submit(future_jobs.pop(future), files, generate_seconds)
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(shared_kwargs, split_templates, tracer is not None)) as executor:
+        in_flight = set()
+        try:
+            for job_kwargs in jobs:
+                future = executor.submit(_create_file, func, job_kwargs, data_slices(job_kwargs['split_value']))
+                future_jobs[future] = job_kwargs
+                in_flight.add(future)
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        file_created(future)
+
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_created(future)
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
@@ -0,0 +1,121 @@
+import pandas as pd
+
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import weakref
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .build_manifest import hash_rows
+
+
+def read_csv_chunks(path: str, headers: List[str], chunksize: int, **read_csv_kwargs) -> Iterator[pd.DataFrame]:
+    """
+    Reads the columns of the HEADER row of a csv file in chunks of chunksize rows
+    By default the values are read as text, as they are read from the spreadsheets (dtype=str, na_filter=False)
+    """
+    read_csv_kwargs = {'dtype': str, 'na_filter': False, **read_csv_kwargs}
+    with pd.read_csv(path, usecols=headers, chunksize=chunksize, **read_csv_kwargs) as reader:
+        for chunk in reader:
+            yield chunk[headers]
+
+
+def read_parquet_chunks(path: str, headers: List[str], chunksize: int) -> Iterator[pd.DataFrame]:
+    """Reads the columns of the HEADER row of a parquet file in batches of chunksize rows (requires pyarrow)"""
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=chunksize, columns=headers):
+        yield batch.to_pandas()[headers]
+
+
+class PartitionedData:
+    """
+    Data of a template spilled to disk, one partition file per split_value
+    The chunks are appended to the partition of each of their split_values, only one chunk is kept in memory while spilling
+    and only one partition when the files are created, so the memory is bounded by the largest split_value and not by the whole dataset
+
+    col_to_split: Dataframe integer column of the column to split by
+    partition_dir: folder of the partition files. If None a temporary folder is created and removed with the object (or cleanup())
+    values: split_values in the order they were found
+    counts: number of rows of each split_value
+    hashes: sha256 of the rows of each split_value, updated as the rows are spilled (digest())
+    """
+
+    def __init__(self, col_to_split: int, partition_dir: Optional[str]=None) -> None:
+        self.col_to_split = col_to_split
+        if partition_dir is None:
+            self.partition_dir = tempfile.mkdtemp(prefix='xlfilecreator_')
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self.partition_dir, True)
+        else:
+            os.makedirs(partition_dir, exist_ok=True)
+            self.partition_dir = partition_dir
+            self._finalizer = None
+        self.paths: Dict[Any, str] = {}
+        self.counts: Dict[Any, int] = {}
+        self.hashes: Dict[Any, Any] = {}
+
+    @property
+    def values(self) -> List[Any]:
+        return list(self.paths)
+
+    def spill(self, chunks: Iterable[pd.DataFrame]) -> 'PartitionedData':
+        """Appends the rows of each chunk to the partition files of their split_values"""
+
+        for chunk in chunks:
+            for split_value, df_split_value in chunk.groupby(self.col_to_split, sort=False):
+                path = self.paths.get(split_value)
+                if path is None:
+                    path = os.path.join(self.partition_dir, f'{len(self.paths):06d}.pkl')
+                    self.paths[split_value] = path
+                    self.counts[split_value] = 0
+                    self.hashes[split_value] = hashlib.sha256()
+
+                with open(path, 'ab') as f:
+                    pickle.dump(df_split_value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                self.counts[split_value] += df_split_value.shape[0]
+                self.hashes[split_value].update(hash_rows(df_split_value))
+
+        return self
+
+    def read(self, split_value: Any) -> Optional[pd.DataFrame]:
+        """Returns the rows of the split_value, None if the split_value is not in the data"""
+
+        path = self.paths.get(split_value)
+        if path is None:
+            return None
+
+        chunks = []
+        with open(path, 'rb') as f:
+            while True:
+                try:
+                    chunks.append(pickle.load(f))
+                except EOFError:
+                    break
+
+        return pd.concat(chunks) if len(chunks) > 1 else chunks[0]
+
+    def digest(self, split_value: Any) -> str:
+        """sha256 of the rows of the split_value, the same as the digest of the rows read from its partition (build_manifest.rows_digest)"""
+        split_value_hash = self.hashes.get(split_value)
+        return hashlib.sha256().hexdigest() if split_value_hash is None else split_value_hash.hexdigest()
+
+    def cleanup(self) -> None:
+        """Removes the partition files"""
+        if self._finalizer is not None:
+            self._finalizer()
+        else:
+            for path in self.paths.values():
+                os.remove(path)
+        self.paths = {}
+        self.counts = {}
+        self.hashes = {}
+
+    def __getstate__(self) -> dict:
+        ### The copies sent to the worker processes never remove the partition files (the hashes are only used by the main process)
+        state = self.__dict__.copy()
+        state['_finalizer'] = None
+        state['hashes'] = {}
+        return state
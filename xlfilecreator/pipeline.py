@@ -0,0 +1,210 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from .agile_encryption import encrypt_agile
+from .create_xlfile import protect_workbook_bytes
+from .output_sink import MemorySink, OutputSink
+from .tracer import trace, trace_file
+
+
+### Number of files waiting in each queue, the generation stops while the next stage is full
+PIPELINE_QUEUE_SIZE = 4
+
+_STOP = object()
+
+
+class PipelineFile(NamedTuple):
+    """
+    File moving through the pipeline
+    job_kwargs: arguments of the file (file_path, split_value, encrypted_file_path, file_password)
+    files: [(file_path, bytes)] the excel file and, once encrypted, its encrypted copy
+    """
+    job_kwargs: Dict[str, Any]
+    files: List[Tuple[str, bytes]]
+
+
+class PipelineStage:
+    """
+    Stage of the pipeline, a thread that takes the files from its bounded queue, processes them and puts them in the queue of the next stage
+
+    name: name of the stage
+    func: function applied to each file (PipelineFile)
+    maxsize: size of the queue of the stage
+    """
+
+    def __init__(self, name: str, func: Optional[Callable[[PipelineFile], None]], maxsize: int, pipeline: 'FilePipeline') -> None:
+        self.name = name
+        self.func = func
+        self.pipeline = pipeline
+        self.queue: queue.Queue = queue.Queue(maxsize)
+        self.next_stage: Optional[PipelineStage] = None
+        self.files = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0       ### Time the previous stage waited for a free slot in the queue
+        self.max_queue_depth = 0
+        self.thread = threading.Thread(target=self.run, name=f'xlfilecreator-{name}', daemon=True)
+
+    def put(self, item: Any) -> None:
+        start = time.perf_counter()
+        self.queue.put(item)
+        self.blocked_seconds += time.perf_counter() - start
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+    def run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                if self.next_stage is not None:
+                    self.next_stage.put(_STOP)
+                return
+
+            ### After a failure the files are discarded, the queues are still emptied so the other stages do not block
+            if self.pipeline.error is not None:
+                continue
+            start = time.perf_counter()
+            try:
+                with trace_file(item.job_kwargs['file_path']):
+                    self.func(item)
+            except BaseException as e:
+                self.pipeline.error = e
+                continue
+            finally:
+                self.busy_seconds += time.perf_counter() - start
+            self.files += 1
+
+            if self.next_stage is not None:
+                self.next_stage.put(item)
+
+    def counters(self) -> Dict[str, float]:
+        return {'files': self.files, 'busy_seconds': round(self.busy_seconds, 3),
+                'files_per_second': round(self.files / self.busy_seconds, 1) if self.busy_seconds > 0 else 0.0,
+                'blocked_seconds': round(self.blocked_seconds, 3), 'queue_depth': self.queue.qsize(), 'max_queue_depth': self.max_queue_depth}
+
+
+class FilePipeline:
+    """
+    Pipeline of the split files: generate -> protect -> encrypt -> archive
+    The files are rendered by the caller (generate, create_file or submit) and each of the other stages runs in its own thread,
+    with a bounded queue between the stages, so a file is protected, encrypted and saved while the next one is rendered.
+    The stages that have nothing to do are not created: protect requires a workbook_password and encrypt the native encryption.
+    With max_workers the worker processes protect and encrypt the files they render, the pipeline only archives them.
+
+    Per-stage counters (files, busy time, throughput, time blocked by the next stage, queue depth) are available at any time (counters())
+
+    sink: where the files are saved (FolderSink, ZipSink)
+    workbook_password: workbook password applied by the protect stage
+    encrypt: True if the encrypt stage encrypts the files (native encryption, encrypt_agile) with the file_password of each file
+    on_file_saved: function called with the arguments of each file (job_kwargs) once the file is saved
+    maxsize: size of the queue of each stage
+    """
+
+    def __init__(self, sink: OutputSink, workbook_password: Optional[str]=None, encrypt: Optional[bool]=False,
+        on_file_saved: Optional[Callable[[Dict[str, Any]], None]]=None, maxsize: Optional[int]=PIPELINE_QUEUE_SIZE) -> None:
+        self.sink = sink
+        self.workbook_password = workbook_password
+        self.on_file_saved = on_file_saved
+        self.error: Optional[BaseException] = None
+        self.start = time.perf_counter()
+
+        ### Generation stage: the files rendered by the caller
+        self.generated_files = 0
+        self.generate_seconds = 0.0
+
+        stages = []
+        if workbook_password is not None and workbook_password != '':
+            stages.append(PipelineStage('protect', self.protect, maxsize, self))
+        if encrypt:
+            stages.append(PipelineStage('encrypt', self.encrypt, maxsize, self))
+        stages.append(PipelineStage('archive', self.archive, maxsize, self))
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.next_stage = next_stage
+        self.stages = stages
+
+        for stage in stages:
+            stage.thread.start()
+
+    def protect(self, item: PipelineFile) -> None:
+        file_path, data = item.files[0]
+        item.files[0] = (file_path, protect_workbook_bytes(data, self.workbook_password))
+
+    def encrypt(self, item: PipelineFile) -> None:
+        file_password = item.job_kwargs.get('file_password')
+        if file_password is not None:
+            with trace('encryption'):
+                encrypted_data = encrypt_agile(item.files[0][1], file_password)
+            item.files.append((item.job_kwargs['encrypted_file_path'], encrypted_data))
+
+    def archive(self, item: PipelineFile) -> None:
+        for file_path, data in item.files:
+            with trace('write_file', file=file_path):
+                self.sink.write(file_path, data)
+        if self.on_file_saved is not None:
+            self.on_file_saved(item.job_kwargs)
+
+    def submit(self, job_kwargs: Dict[str, Any], files: List[Tuple[str, bytes]], generate_seconds: Optional[float]=0.0) -> None:
+        """
+        Passes a rendered file to the next stage, waits while its queue is full
+        job_kwargs: arguments of the file
+        files: [(file_path, bytes)] returned by the function that rendered the file (MemorySink)
+        generate_seconds: time spent rendering the file
+        """
+        if self.error is not None:
+            raise self.error
+
+        self.generated_files += 1
+        self.generate_seconds += generate_seconds
+        self.stages[0].put(PipelineFile(job_kwargs, list(files)))
+
+    def create_file(self, func: Callable[..., None], file_kwargs: Dict[str, Any], job_kwargs: Dict[str, Any]) -> None:
+        """
+        Renders the file in the current thread and passes it to the next stage
+        The workbook protection and the encryption are left to the stages of the pipeline
+
+        func: create_xl_file or create_xl_file_multiple, called as func(**file_kwargs, file_path, split_value)
+        file_kwargs: arguments shared by all the files
+        job_kwargs: arguments of the file (file_path, split_value, encrypted_file_path, file_password)
+        """
+        sink = MemorySink()
+        start = time.perf_counter()
+        func(**{**file_kwargs, 'workbook_password': None}, file_path=job_kwargs['file_path'], split_value=job_kwargs['split_value'], sink=sink)
+        self.submit(job_kwargs, sink.files, time.perf_counter() - start)
+
+    def counters(self) -> Dict[str, Dict[str, float]]:
+        """Counters of each stage {stage: {files, busy_seconds, files_per_second, blocked_seconds, queue_depth, max_queue_depth}}"""
+
+        counters = {'generate': {'files': self.generated_files, 'busy_seconds': round(self.generate_seconds, 3),
+                                 'files_per_second': round(self.generated_files / self.generate_seconds, 1) if self.generate_seconds > 0 else 0.0,
+                                 'blocked_seconds': round(self.stages[0].blocked_seconds, 3)}}
+        for stage in self.stages:
+            counters[stage.name] = stage.counters()
+
+        return counters
+
+    def close(self) -> None:
+        """Waits until the files in the queues are saved, the first failure of a stage is raised"""
+
+        self.stages[0].put(_STOP)
+        for stage in self.stages:
+            stage.thread.join()
+
+        if self.error is not None:
+            raise self.error
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.start
+        stages = ', '.join(f"{name} {counters['files']} ({counters['files_per_second']} files/s)" for name, counters in self.counters().items())
+        return f'Pipeline: {stages} in {elapsed:.1f}s'
+
+    def __enter__(self) -> 'FilePipeline':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            ### The files already rendered are saved, the failure of the caller is raised
+            self.stages[0].put(_STOP)
+            for stage in self.stages:
+                stage.thread.join()
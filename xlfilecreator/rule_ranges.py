@@ -0,0 +1,89 @@
+import xlsxwriter
+
+import re
+from typing import Any, Dict, List, Tuple
+
+
+### Cell references with a relative column (A1, A$1) and column ranges (A:A, A:$C), after removing the strings of the formula
+RELATIVE_COLUMN_REF = re.compile(r'(?<![$\w.])[A-Za-z]{1,3}\$?\d+(?![\w(])|(?<![$\w.])\$?[A-Za-z]{1,3}:\$?[A-Za-z]{1,3}(?![\w(])')
+FORMULA_STRING = re.compile(r'"[^"]*"')
+
+### Conditional formatting types evaluated cell by cell. duplicate, unique, top, bottom, average, color scales, data bars and icon sets
+### are evaluated over all the cells of their ranges, merging their columns would change the result (data validations are always per cell)
+PER_CELL_TYPES = {'cell', 'text', 'date', 'time_period', 'blanks', 'no_blanks', 'errors', 'no_errors', 'formula'}
+
+Rule = Tuple[int, Dict[str, Any]]
+MergedRule = Tuple[List[int], Dict[str, Any]]
+
+
+def column_independent(options: Dict[str, Any]) -> bool:
+    """
+    True if the rule gives the same result for each cell once its column is merged with other columns:
+    a data validation or a conditional format evaluated per cell (PER_CELL_TYPES) whose formulas do not change from one column to another
+    A rule with relative column references is evaluated relative to the first cell of its range, it can not be moved to another range
+    """
+    if 'type' in options and options['type'] not in PER_CELL_TYPES:
+        return False
+
+    for value in options.values():
+        if isinstance(value, str) and value.startswith('='):
+            if RELATIVE_COLUMN_REF.search(FORMULA_STRING.sub('', value)):
+                return False
+
+    return True
+
+
+def merge_rules(rules: List[Rule]) -> List[MergedRule]:
+    """
+    Merges the rules with the same options into a single rule applied to several columns [(columns, options)]
+    The rules keep their order: a rule is only merged into an earlier rule if no rule in between is applied to its column,
+    so the priority of the conditional formats of every cell does not change
+
+    rules: [(column, options)] in the order they are applied
+    """
+
+    merged_rules: List[MergedRule] = []
+    for col, options in rules:
+        merged = False
+        if column_independent(options):
+            for columns, merged_options in reversed(merged_rules):
+                if merged_options == options:
+                    if col not in columns:
+                        columns.append(col)
+                    merged = True
+                    break
+                if col in columns:
+                    break
+
+        if not merged:
+            merged_rules.append(([col], options))
+
+    return merged_rules
+
+
+def column_spans(columns: List[int]) -> List[Tuple[int, int]]:
+    """Consecutive columns grouped in (first column, last column) spans"""
+
+    spans = []
+    for col in sorted(columns):
+        if spans and spans[-1][1] == col - 1:
+            spans[-1] = (spans[-1][0], col)
+        else:
+            spans.append((col, col))
+
+    return spans
+
+
+def rule_range(columns: List[int], first_row: int, last_row: int, options: Dict[str, Any]) -> Tuple[int, int, int, int, Dict[str, Any]]:
+    """
+    Returns the arguments of ws.conditional_format / ws.data_validation of a rule applied to the rows of several columns
+    (first_row, first_col, last_row, last_col, options). The columns that are not consecutive are added as a multi_range (space separated sqref)
+    The first range starts in the first column, the relative references of the rule are relative to its first cell
+    """
+
+    spans = column_spans(columns)
+    first_col, last_col = spans[0]
+    if len(spans) > 1:
+        options = {**options, 'multi_range': ' '.join(xlsxwriter.utility.xl_range(first_row, span_first, last_row, span_last) for span_first, span_last in spans)}
+
+    return first_row, first_col, last_row, last_col, options
@@ -0,0 +1,174 @@
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional, Protocol, Union
+
+from tqdm.auto import tqdm
+
+from .build_manifest import BuildManifest, config_digest, file_digest
+from .encrypt_xl import EncryptionPool, create_password
+from .output_sink import FolderSink, ZipSink
+from .parallel_xl import create_xl_files_parallel, template_without_data
+from .pipeline import FilePipeline
+from .template_skeleton import rule_counters
+from .tracer import Tracer, tracing
+from .utils_func import Project, create_output_folders, get_column_to_split_by, get_XlFile_details, password_dataframe, to_zip
+from .xl_stamp import XlFileStamp
+
+
+class XlFileTemp(Protocol):
+    ...
+
+
+def create_split_files(func: Callable[..., None], file_kwargs: Dict[str, Any], template_list: List[XlFileTemp], split_by_value: Union[bool, List[bool]], *,
+    project: Project, today: str, values_to_split: List[str], split_by: str, batch: Union[str,int], sheet_password: Optional[str],
+    workbook_password: Optional[str], protect_files: bool, random_password: bool, in_zip: bool, max_workers: Optional[int],
+    encryption_backend: Optional[str], zip_compresslevel: Optional[int], manifest_path: Optional[str], incremental: bool,
+    constant_memory: bool, tracer: Optional[Tracer], trace_report: bool) -> Dict[str, Dict[str, float]]:
+    """
+    Creates one excel file for each split_value, shared by to_excel and create_xl_file_multiple_temp
+    Output folders (or zip archives), build manifest, password master, encryption (EncryptionPool or the pipeline) and parallel creation of the files
+
+    func: function that creates a file (create_xl_file or create_xl_file_multiple)
+    file_kwargs: arguments of func shared by all the files. Its template ('template') or templates ('template_list') are replaced by templates
+    without data when the files are created by the worker processes
+    template_list: templates of the files
+    split_by_value: flag of each template, a single flag for a single template. Recorded as it is in the configuration hash of the manifest
+    encryption_backend: 'native', 'msoffice' or None if the files are not encrypted (get_encryption_backend)
+    tracer: tracer of the run (None if the run is not traced)
+    The other arguments are the arguments of to_excel
+
+    Returns the counters of each stage and the number of rules of the templates ('rules')
+    """
+
+    if isinstance(split_by_value, list):
+        sbv_list = split_by_value
+    else:
+        sbv_list = [split_by_value for _ in template_list]
+
+    if incremental and (manifest_path is None or in_zip):
+        raise ValueError('incremental=True requires a manifest_path and the files saved in the folders (in_zip=False)')
+    ### Files appended to the zip archives as soon as they are created (msoffice encrypts the files saved in the folders)
+    sink = ZipSink(zip_compresslevel) if in_zip and encryption_backend != 'msoffice' else FolderSink()
+    if manifest_path is None:
+        manifest = None
+        path_1, path_2 = create_output_folders(project.name, today, protect_files, make_folders=isinstance(sink, FolderSink))
+    else:
+        ### An incremental build updates the files of the manifest in its folders
+        manifest = BuildManifest(manifest_path, incremental)
+        today, path_1, path_2 = manifest.output_folders(project, today, protect_files, make_folders=isinstance(sink, FolderSink))
+
+    if manifest is not None:
+        config_hash = config_digest(template_list, sheet_password, split_by=split_by, split_by_value=split_by_value,
+                                    workbook_password=workbook_password, protect_files=protect_files, random_password=random_password)
+        cols_to_split = [get_column_to_split_by(template.df_settings, split_by) for template in template_list]
+        ### The replicated templates have the same rows in every file
+        data_hashes = [None if sbv else template.data_digest(col_to_split) for template, sbv, col_to_split in zip(template_list, sbv_list, cols_to_split)]
+    if not any(sbv_list) and not constant_memory:
+        ### All the templates are replicated, the files only differ in the split_by column: rendered once and stamped with each split_value
+        ### (constant_memory writes the strings inline, the files are rendered one by one)
+        with tracing(tracer):
+            file_kwargs['stamp'] = XlFileStamp.render(func, file_kwargs)
+    parallel = max_workers is not None and max_workers > 1
+
+    password_master = []
+    jobs = []
+    manifest_entries = {}      ### {file_path: arguments of manifest.record}
+    ### msoffice: the files are encrypted as soon as they are created, the pool waits for them at the end of the with block
+    encryption_pool = EncryptionPool(path_1, path_2) if encryption_backend == 'msoffice' else nullcontext()
+    passwords = {}         ### {file_path: (filename, password)}
+
+    def file_created(job_kwargs: Dict[str, str]) -> None:
+        future = None
+        if encryption_backend == 'msoffice':
+            future = encryption_pool.submit(*passwords[job_kwargs['file_path']])
+        if manifest is not None:
+            ### The file is recorded once it is finished (encrypted)
+            manifest_entry = manifest_entries.pop(job_kwargs['file_path'])
+            if future is None:
+                manifest.record(*manifest_entry)
+            else:
+                future.add_done_callback(lambda f: manifest.record(*manifest_entry) if not f.cancelled() and f.exception() is None else None)
+
+    ### generate -> protect -> encrypt -> archive, with max_workers the worker processes protect and encrypt the files they create
+    pipeline = FilePipeline(sink, workbook_password=None if parallel else workbook_password,
+                            encrypt=encryption_backend == 'native' and not parallel, on_file_saved=file_created)
+    pbar = tqdm(total=len(values_to_split))
+    files_up_to_date = 0
+    with encryption_pool:
+        with sink, tracing(tracer), pipeline:
+            for i, split_value in enumerate(values_to_split, 1):
+
+                ### Get Excelfile details (id, name, path)
+                if manifest is None:
+                    xl_file = get_XlFile_details(split_value, project, batch, i, today, path_1)
+                else:
+                    xl_file = manifest.file_details(split_value, project, batch, today, path_1)
+
+                ### Create Password master df
+                pw = None
+                if protect_files is True:
+                    if random_password and manifest is not None and manifest.password(split_value) is not None:
+                        ### The random password of the file does not change when the file is created again
+                        pw = manifest.password(split_value)
+                    else:
+                        pw = create_password(project, split_value, random_password)
+                    password_master.append((xl_file.id, xl_file.name, split_value, pw))
+
+                if manifest is not None:
+                    data_hashes_split_value = [template.data_digest(col_to_split, split_value) if data_hash is None else data_hash
+                                               for template, col_to_split, data_hash in zip(template_list, cols_to_split, data_hashes)]
+                    file_hash = file_digest(config_hash, split_value, data_hashes_split_value)
+                    if manifest.is_current(split_value, xl_file, file_hash):
+                        files_up_to_date += 1
+                        pbar.update(1)
+                        continue
+                    encrypted_path = f'{path_2}/{xl_file.name}' if protect_files is True else None
+                    ### Only the random passwords are recorded, the other passwords are created again from the split_value
+                    manifest_entries[xl_file.path] = (split_value, xl_file, file_hash, encrypted_path, pw if random_password else None)
+
+                ### Create Excel file
+                job_kwargs = {'file_path': xl_file.path, 'split_value': split_value}
+                if protect_files is True:
+                    if encryption_backend == 'native':
+                        ### Encrypted in memory by the encrypt stage of the pipeline (or by the worker process that creates the file)
+                        job_kwargs.update(encrypted_file_path=f'{path_2}/{xl_file.name}', file_password=pw)
+                    else:
+                        passwords[xl_file.path] = (xl_file.name, pw)
+
+                if parallel:
+                    jobs.append(job_kwargs)
+                else:
+                    pipeline.create_file(func, file_kwargs, job_kwargs)
+                    pbar.update(1)
+
+            if parallel:
+                ### The templates filtered by split_value are sent to the workers without data, each file only receives its rows
+                ### The replicated templates are sent to the workers once with their data
+                data_templates = [template for template, sbv in zip(template_list, sbv_list) if sbv]
+                worker_templates = [template_without_data(template) if sbv else template for template, sbv in zip(template_list, sbv_list)]
+                split_templates = [template for template, sbv in zip(worker_templates, sbv_list) if sbv]
+                if 'template_list' in file_kwargs:
+                    file_kwargs['template_list'] = worker_templates
+                else:
+                    file_kwargs['template'] = worker_templates[0]
+                create_xl_files_parallel(func, file_kwargs, split_templates, data_templates, split_by, jobs, max_workers, pbar, pipeline)
+
+        ### The encryption pool waits until all the files are encrypted
+        if protect_files is True:
+            password_dataframe(password_master, project, split_by, today)
+
+    if in_zip and isinstance(sink, FolderSink):
+        to_zip(path_1, path_2)
+
+    if manifest is not None:
+        manifest.save()
+        print(f'Files up to date: {files_up_to_date}, files created: {len(values_to_split) - files_up_to_date}')
+
+    pbar.close()
+    if tracer is not None:
+        print(pipeline.summary())
+    protect_sheet = sheet_password is not None and sheet_password != ''
+    counters = {**pipeline.counters(), 'rules': rule_counters([template.skeleton(protect_sheet) for template in template_list])}
+    if trace_report:
+        tracer.save_report(f'{project.name}-Trace-{today}.json', project=project.name, date=today, pipeline=counters)
+
+    return counters
@@ -0,0 +1,258 @@
+import numpy as np
+import pandas as pd
+
+import datetime
+import json
+import os
+from typing import Any, Callable, Dict, List, NamedTuple, Protocol, Tuple
+
+from .conditional_formatting import mandatory_columns
+from .formats import format_lock_config_dict
+from .header_format import get_headers_format_names
+
+
+class XlFileTemp(Protocol):
+    ...
+
+
+### Version of the plan files, a plan saved by another version has to be compiled again
+PLAN_VERSION = 1
+
+### (column, options) of a data validation or conditional formatting rule
+PlanRule = Tuple[int, Dict[str, Any]]
+
+### Dates and times of the dropdown lists saved as tagged ISO strings {tag: isoformat}: (type, tag, function that reads the ISO string)
+### The subclasses first (pd.Timestamp is a datetime, datetime is a date)
+JSON_DATE_TYPES: Tuple[Tuple[type, str, Callable[[str], Any]], ...] = (
+    (pd.Timestamp, '__timestamp__', pd.Timestamp),
+    (pd.Timedelta, '__timedelta__', pd.Timedelta),
+    (datetime.datetime, '__datetime__', datetime.datetime.fromisoformat),
+    (datetime.date, '__date__', datetime.date.fromisoformat),
+    (datetime.time, '__time__', datetime.time.fromisoformat),
+)
+
+
+class PlanVersionError(Exception):
+
+    def __init__(self, path: str, version: Any) -> None:
+        self.path = path
+        self.version = version
+        errormessage = f"The plan '{path}' was saved with version {version}, expected version {PLAN_VERSION}. Compile the template again (XlFileTemp.compile())"
+        super().__init__(errormessage)
+
+
+class TemplatePlan(NamedTuple):
+    """
+    Compiled configuration of a template (XlFileTemp.compile()): everything that is read and validated from the configuration sheets,
+    resolved once. The plan has no dataframes and no workbook objects, only tuples, dicts and scalars, it can be shared read-only
+    between threads and sent to worker processes. It is saved to and loaded from a compact JSON file (save(), load())
+    and a template is created from the plan and the data without reading the configuration sheets again (XlFileTemp.from_plan())
+
+    tab_names: names of the main sheet and of the dropdown lists sheets
+    columns: columns of the main sheet
+    settings_index: names of the settings rows of the main sheet (CONFIG_MANAGER, header_format, lock_sheet_config, HEADER, ...)
+    settings: values of each settings row
+    header_index_list: header rows in the order they are written ['description_header', 'HEADER', 'example_row']
+    header_values: values of the header rows of each column
+    header_formats: format names of each header row {header row: (format name of each column)}
+    formulas: formula of each column, '' if the column has no formula
+    lock_formats: format of the lock_sheet_config of each column, '' if the column is locked (unrecognised or blank format). Empty if there is no lock_sheet_config
+    column_widths: width of each column
+    dropdown_sheets: (sheet name, values of each column) of the hidden sheets of the dropdown lists
+    data_validations: (column, options) of the dropdown lists, data validation 1 first
+    conditional_formats: (column, {'type', 'criteria', 'format' name}) in the order of the conditional formatting sheet
+    mandatory_columns: columns highlighted when they are blank
+    version: version of the plan (PLAN_VERSION)
+    """
+    tab_names: Dict[str, str]
+    columns: Tuple[int, ...]
+    settings_index: Tuple[str, ...]
+    settings: Tuple[Tuple[Any, ...], ...]
+    header_index_list: Tuple[str, ...]
+    header_values: Tuple[Tuple[Any, ...], ...]
+    header_formats: Dict[int, Tuple[str, ...]]
+    formulas: Tuple[str, ...]
+    lock_formats: Tuple[str, ...]
+    column_widths: Tuple[int, ...]
+    dropdown_sheets: Tuple[Tuple[str, Tuple[Tuple[Any, ...], ...]], ...]
+    data_validations: Tuple[PlanRule, ...]
+    conditional_formats: Tuple[PlanRule, ...]
+    mandatory_columns: Tuple[int, ...]
+    version: int = PLAN_VERSION
+
+    @property
+    def data_index(self) -> int:
+        """data_index: interger index where the data starts"""
+        return len(self.header_index_list)
+
+    def settings_dataframe(self) -> pd.DataFrame:
+        """Settings rows of the main sheet (df_settings)"""
+        return pd.DataFrame([list(row) for row in self.settings], index=pd.Index(list(self.settings_index), name='Index'),
+                            columns=list(self.columns), dtype=object)
+
+    def save(self, path: str) -> None:
+        """
+        Writes the plan in a compact JSON file
+        The dates and times (dates of the dropdown lists, etc) are saved as tagged ISO strings and read back with their type by load()
+        The other values that JSON can not store raise TypeError, the plan is only kept in memory
+        """
+
+        plan_json = json.dumps(self._asdict(), separators=(',', ':'), default=_json_value)
+        path_tmp = f'{path}.tmp'
+        with open(path_tmp, 'w', encoding='utf-8') as f:
+            f.write(plan_json)
+        os.replace(path_tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'TemplatePlan':
+        """Reads a plan saved with save()"""
+
+        with open(path, encoding='utf-8') as f:
+            plan = json.load(f, object_hook=_json_object)
+
+        if plan.get('version') != PLAN_VERSION:
+            raise PlanVersionError(path, plan.get('version'))
+
+        ### JSON objects have string keys and arrays instead of tuples
+        plan['header_formats'] = {int(row): format_names for row, format_names in plan['header_formats'].items()}
+        return cls(**{field: _freeze(value) for field, value in plan.items()})
+
+
+class ConfigurationFromPlan:
+    """
+    dv_config1, dv_config2 and cond_formatting of a template created from a plan (XlFileTemp.from_plan())
+    The configuration sheets are not read, their settings are only in the plan: any attribute raises an AttributeError that says so
+
+    name: name of the attribute of the template (dv_config1, dv_config2, cond_formatting)
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __getattr__(self, attr: str) -> Any:
+        if attr.startswith('__') or 'name' not in self.__dict__:
+            raise AttributeError(attr)
+        raise AttributeError(f"{self.name}.{attr} is not available, the template was created from a plan (from_plan) and its configuration "
+                             f"sheets were not read. The dropdown lists, data validation and conditional formatting are in the plan (compile())")
+
+    def __repr__(self) -> str:
+        return f'ConfigurationFromPlan({self.name!r})'
+
+
+class _FrozenDict(dict):
+    """
+    Read-only dict of the plan (tab_names, header_formats and the options of the rules)
+    A dict subclass, so it is written by json and it can be sent to the worker processes (pickle), unlike MappingProxyType
+    """
+
+    def _read_only(self, *args, **kwargs) -> None:
+        raise TypeError('TemplatePlan is read-only, compile the template again to change it')
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self) -> Tuple[type, Tuple[Dict[Any, Any]]]:
+        return _FrozenDict, (dict(self),)
+
+
+def _freeze(value: Any) -> Any:
+    """Lists as tuples and dicts as read-only dicts, so the plan can not be modified by the files that use it"""
+
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return _FrozenDict((key, _freeze(item)) for key, item in value.items())
+
+    return value
+
+
+def _json_value(value: Any) -> Any:
+    """
+    numpy scalars of the dataframes as python values and dates and times as tagged ISO strings {tag: isoformat} (JSON_DATE_TYPES),
+    the other values that JSON can not store raise TypeError
+    """
+
+    if value is pd.NaT:
+        ### Missing date of a date column, read back by pd.Timestamp('NaT')
+        return {'__timestamp__': 'NaT'}
+    if isinstance(value, (np.datetime64, np.timedelta64)):
+        ### .item() of the nanoseconds is an int
+        value = pd.Timestamp(value) if isinstance(value, np.datetime64) else pd.Timedelta(value)
+    for date_type, tag, _ in JSON_DATE_TYPES:
+        if isinstance(value, date_type):
+            return {tag: value.isoformat()}
+
+    if hasattr(value, 'item'):
+        item = value.item()
+        if item is None or isinstance(item, (bool, int, float, str)):
+            return item
+
+    raise TypeError(f'{type(value).__name__} value {value!r} of the plan can not be saved in JSON')
+
+
+def _json_object(obj: Dict[str, Any]) -> Any:
+    """Dates and times saved by _json_value with their type, the other JSON objects as dicts"""
+
+    if len(obj) == 1:
+        for _, tag, from_isoformat in JSON_DATE_TYPES:
+            if tag in obj:
+                return from_isoformat(obj[tag])
+
+    return obj
+
+
+def lock_formats(df_settings: pd.DataFrame) -> List[str]:
+    """Format of the lock_sheet_config of each column, '' if the format is unrecognised or blank"""
+
+    if 'lock_sheet_config' not in df_settings.index:
+        return []
+
+    return [config_format if config_format in format_lock_config_dict.keys() else '' for config_format in df_settings.loc['lock_sheet_config']]
+
+
+def dropdown_sheet_columns(df: pd.DataFrame) -> List[List[Any]]:
+    """Values of each column of a dropdown lists sheet, the header first, as they are written by DataFrame.to_excel(index=False)"""
+    return [[header] + df.iloc[:, col_num].tolist() for col_num, header in enumerate(df.columns)]
+
+
+def compile_plan(template: XlFileTemp) -> TemplatePlan:
+    """Compiles the configuration of the template (XlFileTemp.compile())"""
+
+    df_settings = template.df_settings
+    header_list = df_settings.loc['HEADER'].tolist()
+    columns = list(df_settings.columns)
+
+    if 'formula' in df_settings.index:
+        formulas = df_settings.loc['formula'].tolist()
+    else:
+        formulas = ['' for _ in columns]
+
+    if 'column_width' in df_settings.index:
+        column_widths = [25 if width == '' else int(width) for width in df_settings.loc['column_width']]
+    else:
+        column_widths = [25 for _ in columns]
+
+    dropdown_sheets = []
+    if template.dv_config1.df_data_validation is not None:
+        dropdown_sheets.append((template.dv_config1.dropdown_list_sheet, dropdown_sheet_columns(template.dv_config1.df_data_validation)))
+    if template.dv_config2.data_validation_dict is not None:
+        dropdown_sheets.append((template.dv_config2.dropdown_list_sheet, dropdown_sheet_columns(template.dv_config2.picklists)))
+
+    plan = TemplatePlan(
+        tab_names=dict(template.tab_names),
+        columns=columns,
+        settings_index=df_settings.index.tolist(),
+        settings=df_settings.to_numpy().tolist(),
+        header_index_list=template.header_index_list,
+        header_values=[template.df_hd.iloc[:, col_num].tolist() for col_num in range(len(columns))],
+        header_formats=get_headers_format_names(df_settings, template.header_index_list),
+        formulas=formulas,
+        lock_formats=lock_formats(df_settings),
+        column_widths=column_widths,
+        dropdown_sheets=dropdown_sheets,
+        data_validations=template.dv_config1.validation_columns(header_list) + template.dv_config2.validation_columns(header_list),
+        conditional_formats=template.cond_formatting.rules(header_list),
+        mandatory_columns=mandatory_columns(df_settings),
+    )
+
+    return TemplatePlan(**{field: _freeze(value) for field, value in plan._asdict().items()})
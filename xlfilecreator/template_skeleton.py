@@ -0,0 +1,97 @@
+from typing import Dict, List, Optional, Tuple
+
+from .rule_ranges import merge_rules
+from .template_plan import TemplatePlan
+
+
+### (row from which the format is applied: 'data', 'extra' (first extra row) or None (no format), format name)
+DataFormatName = Tuple[Optional[str], Optional[str]]
+
+
+def lock_sheet_format_names(lock_formats: Tuple[str, ...], columns: Tuple[int, ...], allow_input_extra_rows: bool) -> List[DataFormatName]:
+    """
+    Returns the format of the data of each column and the row from which the format is applied
+    lock_formats: format of the lock_sheet_config of each column (TemplatePlan.lock_formats)
+
+    If 'lock_sheet_config' is not in the index of the dataframe, all excel columns will be editable
+    If 'lock_sheet_config' contains only blanks, all excel columns will be editable
+    if 'lock_sheet_config' contains only unrecognisable formats, all excel columns will be editable
+
+    If the format is unrecognised or left blank (''), the Excel column will be locked
+    If allow_input_extra_rows=True and the column format is unrecognised or left blank (''), the column
+    will be locked and ONLY the extra rows in the column will be editable
+    """
+
+    if all('' == _format for _format in lock_formats):
+        return [('data', 'unlocked_general') for _ in columns]
+
+    data_formats = []
+    for lock_config in lock_formats:
+        if lock_config != '':
+            data_formats.append(('data', lock_config))
+        elif allow_input_extra_rows:
+            data_formats.append(('extra', 'unlocked_text'))
+        else:
+            data_formats.append((None, None))
+
+    return data_formats
+
+
+class TemplateSkeleton:
+    """
+    Parts of the main sheet of a template that are the same in every split file, built once per template from its plan (XlFileTemp.skeleton())
+    Only the data rows change from one file to another, the skeleton is written with each file's rows (process_template)
+    The formats are kept by name, the Format objects belong to each workbook (get_format)
+
+    header_values: values of the header rows of each column
+    header_formats: format names of each header row {header row: [format name of each column]}
+    formulas: formula of each column, '' if the column has no formula
+    data_formats: (row from which the format is applied, format name) of each column, None if the sheet is not protected
+    column_widths: width of each column
+    dropdown_sheets: (sheet name, values of each column) of the hidden sheets of the dropdown lists
+    data_validations: (columns, options) of the dropdown lists, data validation 1 first, the columns with the same options share a rule
+    conditional_formats: (columns, {'type', 'criteria', 'format' name}) of the conditional formatting sheet, the columns with the same rule share it (merge_rules)
+    mandatory_columns: columns highlighted when they are blank (a single rule)
+    rule_counts: {'data_validation'/'conditional_formatting': (number of rules of the settings, number of rules written)}
+    """
+
+    def __init__(self, plan: TemplatePlan, protect_sheet: bool, extra_rows: bool) -> None:
+        self.data_index = plan.data_index
+        self.extra_rows = extra_rows
+        self.protect_sheet = protect_sheet
+        self.columns = list(plan.columns)
+
+        ### Lists of the plan's tuples, the values of the data rows are appended to the header values of each column
+        self.header_values = [list(values) for values in plan.header_values]
+        self.header_formats = {row: list(format_names) for row, format_names in plan.header_formats.items()}
+        self.formulas = list(plan.formulas)
+
+        if protect_sheet:
+            self.data_formats = lock_sheet_format_names(plan.lock_formats, plan.columns, extra_rows)
+        else:
+            self.data_formats = None
+
+        self.column_widths = list(plan.column_widths)
+        self.dropdown_sheets = [(sheet_name, [list(values) for values in columns]) for sheet_name, columns in plan.dropdown_sheets]
+
+        self.data_validations = merge_rules(plan.data_validations)
+        self.conditional_formats = merge_rules(plan.conditional_formats)
+        self.mandatory_columns = list(plan.mandatory_columns)
+
+        self.rule_counts = {'data_validation': (len(plan.data_validations), len(self.data_validations)),
+                            'conditional_formatting': (len(plan.conditional_formats) + len(self.mandatory_columns), 
+                                                       len(self.conditional_formats) + (1 if self.mandatory_columns else 0))}
+
+
+def rule_counters(skeletons: List[TemplateSkeleton]) -> Dict[str, int]:
+    """
+    Number of data validation and conditional formatting rules of the settings (before) and number of rules written
+    once the identical rules are merged (after), added up for all the templates of the file
+    {data_validation_before, data_validation_after, conditional_formatting_before, conditional_formatting_after}
+    """
+    counters = {}
+    for rule in ('data_validation', 'conditional_formatting'):
+        counters[f'{rule}_before'] = sum(skeleton.rule_counts[rule][0] for skeleton in skeletons)
+        counters[f'{rule}_after'] = sum(skeleton.rule_counts[rule][1] for skeleton in skeletons)
+
+    return counters
@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+Event = Dict[str, Any]
+
+
+class Tracer:
+    """
+    Collects the timing events of a run, one event per stage of each file:
+    read_config, apply_data_types, filter, headers, lock, write_data, extra_rows, dropdown_sheets, data_validation,
+    conditional_formatting, save, stamp, protect_workbook, encryption, write_file
+
+    Event: {'name', 'file' (file_path or None), 'start' (epoch seconds), 'duration' (seconds), 'pid', 'thread'}
+    The events of the worker processes (max_workers) are sent to the tracer of the main process with their files
+
+    callback: function called with each event as soon as it is recorded (it can be called from the threads of the pipeline)
+    """
+
+    def __init__(self, callback: Optional[Callable[[Event], None]]=None) -> None:
+        self.callback = callback
+        self.events: List[Event] = []
+        self.start = time.time()
+        self.lock = threading.Lock()
+
+    def emit(self, event: Event) -> None:
+        with self.lock:
+            self.events.append(event)
+        if self.callback is not None:
+            self.callback(event)
+
+    def stages(self) -> Dict[str, Dict[str, float]]:
+        """Events aggregated by stage {name: {count, total_seconds, mean_seconds, max_seconds}}"""
+
+        stages = {}
+        for event in self.events:
+            stage = stages.setdefault(event['name'], {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            stage['count'] += 1
+            stage['total_seconds'] += event['duration']
+            stage['max_seconds'] = max(stage['max_seconds'], event['duration'])
+
+        return {name: {'count': stage['count'], 'total_seconds': round(stage['total_seconds'], 6),
+                       'mean_seconds': round(stage['total_seconds'] / stage['count'], 6), 'max_seconds': round(stage['max_seconds'], 6)}
+                for name, stage in stages.items()}
+
+    def files(self) -> Dict[str, Dict[str, float]]:
+        """Duration of the stages of each file {file_path: {name: seconds}}"""
+
+        files = {}
+        for event in self.events:
+            if event['file'] is not None:
+                file_stages = files.setdefault(event['file'], {})
+                file_stages[event['name']] = round(file_stages.get(event['name'], 0.0) + event['duration'], 6)
+
+        return files
+
+    def report(self, **info) -> Dict[str, Any]:
+        """
+        Report of the run: info, wall time, stages aggregated, stages of each file and the events
+        info: other values included in the report (project, date, pipeline counters, etc)
+        """
+        return {**info, 'wall_seconds': round(time.time() - self.start, 3), 'stages': self.stages(), 'files': self.files(), 'events': self.events}
+
+    def save_report(self, path: str, **info) -> None:
+        """Writes the report (report()) in a JSON file"""
+
+        path_tmp = f'{path}.tmp'
+        with open(path_tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.report(**info), f, indent=1, default=str)
+        os.replace(path_tmp, path)
+
+
+### Tracer of the process, set by tracing(). The threads of the pipeline record their events in it
+_tracer: Optional[Tracer] = None
+_current = threading.local()
+
+
+def active_tracer() -> Optional[Tracer]:
+    """Tracer of the current thread (run_traced) or of the process (tracing)"""
+    return getattr(_current, 'tracer', None) or _tracer
+
+
+def run_traced(tracer: Optional[Tracer], func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Runs func in the current thread with the events recorded in the tracer, for the threads that outlive the tracing() block (EncryptionPool)"""
+
+    previous = getattr(_current, 'tracer', None)
+    _current.tracer = tracer
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _current.tracer = previous
+
+
+@contextmanager
+def tracing(tracer: Optional[Tracer]=None) -> Iterator[Optional[Tracer]]:
+    """
+    Records the events of the code run in the block in the tracer (None disables the tracing in the block)
+
+    with tracing(Tracer(callback=print)) as tracer:
+        template = XlFileTemp.read_excel(...)
+        template.to_excel(...)
+    """
+    global _tracer
+
+    previous = _tracer
+    _tracer = tracer
+    try:
+        yield tracer
+    finally:
+        _tracer = previous
+
+
+@contextmanager
+def trace_file(file_path: str) -> Iterator[None]:
+    """The events recorded in the block (current thread) belong to the file"""
+
+    previous = getattr(_current, 'file', None)
+    _current.file = file_path
+    try:
+        yield None
+    finally:
+        _current.file = previous
+
+
+class Span:
+    """Duration of a stage, recorded in the active tracer when the block ends"""
+
+    __slots__ = ('name', 'file', 'tracer', 'start_time', 'start')
+
+    def __init__(self, name: str, file: Optional[str], tracer: Tracer) -> None:
+        self.name = name
+        self.file = file
+        self.tracer = tracer
+
+    def __enter__(self) -> 'Span':
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        duration = time.perf_counter() - self.start
+        self.tracer.emit({'name': self.name, 'file': self.file if self.file is not None else getattr(_current, 'file', None),
+                          'start': self.start_time, 'duration': duration, 'pid': os.getpid(), 'thread': threading.current_thread().name})
+
+
+class _NoSpan:
+
+    def __enter__(self) -> '_NoSpan':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def trace(name: str, file: Optional[str]=None) -> Any:
+    """
+    Span of a stage: with trace('save'): ...
+    Nothing is recorded (and nothing is timed) if there is no active tracer
+    name: name of the stage
+    file: file_path of the file, if None the file of the current thread (trace_file)
+    """
+    tracer = active_tracer()
+    if tracer is None:
+        return _NO_SPAN
+
+    return Span(name, file, tracer)
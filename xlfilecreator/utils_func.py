@@ -2,25 +2,87 @@ import pandas as pd
 
 import collections
 import datetime
-import json
+import io
 import os
 import shutil
-from typing import List, Tuple, Optional, Union
+from typing import Any, Dict, List, Tuple, Optional, Union
 from urllib.error import HTTPError
 
-from .data_validation_typing import DataValDict
+from .google_sheets import fetch_google_sheet_csv, fetch_google_sheets
 from .terminal_colors import yellow
 from .xlfilecreator_errors import HeaderIndexNotIdentified
 
 
 
-def to_number(x):
-	try:      
-		x = float(x)
-	except ValueError:
-		pass
-	
-	return x
+def to_number_column(column: pd.Series, symbol: Optional[str]='') -> pd.Series:
+    """
+    Converts the numbers read as text in a column into float values, the values that are not numbers are kept as they are.
+    Numbers with thousands separators (1,234.50) and with the symbol of the format of the column are also converted.
+
+    column: Series of a column of the data
+    symbol: '$', '£' or '€' currency symbol in front of the number, '%' percent sign after the number (the value is divided by 100) 
+    """
+
+    ### Fast path: all the values are numbers
+    try:
+        return pd.Series(column.to_numpy(dtype=float), index=column.index, name=column.name)
+    except (ValueError, TypeError):
+        pass
+
+    ### The data rows share the same index label (''), the values are matched by position
+    index = column.index
+    column = column.reset_index(drop=True)
+    numbers = pd.to_numeric(column, errors='coerce').astype(float)
+
+    ### Only the text values with the symbol or with commas can still be numbers
+    text = column[numbers.isna() & column.notna()].astype(object)
+    candidates = text.str.contains(',', regex=False) == True
+    if symbol != '':
+        candidates |= text.str.contains(symbol, regex=False) == True
+    text = text[candidates].str.strip()
+
+    if text.shape[0] > 0:
+        if symbol == '%':
+            percent = text.str.endswith('%')
+            text = text.where(~percent, text.str[:-1].str.rstrip())
+        elif symbol != '':
+            ### $1,234.50, -$1,234.50 or $-1,234.50
+            leading_symbol = text.str.startswith(symbol)
+            text = text.where(~leading_symbol, text.str[len(symbol):].str.lstrip())
+            signed_symbol = text.str.startswith(f'-{symbol}') | text.str.startswith(f'+{symbol}')
+            text = text.where(~signed_symbol, text.str[:1] + text.str[len(symbol)+1:].str.lstrip())
+
+        ### Only commas in the position of thousands separators are removed, '1,2' is not a number
+        thousands = text.str.fullmatch(r'[+-]?\d{1,3}(,\d{3})+(\.\d*)?')
+        text = text.where(~thousands, text.str.replace(',', '', regex=False))
+
+        text_numbers = pd.to_numeric(text, errors='coerce').astype(float)
+        if symbol == '%':
+            text_numbers[percent] = text_numbers[percent] / 100
+        numbers[text.index] = text_numbers
+
+    if numbers.notna().all():
+        return numbers.set_axis(index)
+
+    return column.where(numbers.isna(), numbers).set_axis(index)
+
+
+def identify_number_columns(df_data_only: pd.DataFrame, lock_sheet_config: pd.Series) -> pd.DataFrame:
+    """
+    Converts the numbers read as text into float values (to_number_column) in the columns with a currency, percent or number format in the lock_sheet_config
+    The dataframe is modified in place and returned
+
+    df_data_only: data rows
+    lock_sheet_config: lock_sheet_config row of the settings, same columns as df_data_only
+    """
+
+    ### Symbol accepted in the text values of each format
+    float_formats = {'unlocked_dollars': '$', 'unlocked_pounds': '£', 'unlocked_euros': '€', 'unlocked_percent': '%', 'unlocked_number': ''}
+    for f, col in zip(lock_sheet_config, df_data_only.columns):
+        if f in float_formats:
+            df_data_only[col] = to_number_column(df_data_only[col], float_formats[f])
+
+    return df_data_only
 
 
 def validate_integer_input(x, source: str) -> int:
@@ -72,25 +134,6 @@ def get_headers(df_settings: pd.DataFrame) -> Tuple[List[str], pd.DataFrame]:
     return header_index_list, df_hd
 
 
-def rows_extra(df_data_only: pd.DataFrame, num_rows_extra: Optional[int]=100) -> pd.DataFrame:
-    blank_rows = ['' for _ in range(num_rows_extra)]
-    rows_extra = {col:blank_rows for col in df_data_only.columns}
-    df_rows_extra = pd.DataFrame(rows_extra)
-
-    return df_rows_extra
-
-
-def get_df_data(df_hd: pd.DataFrame, df_data_only: pd.DataFrame, allow_input_extra_rows: Optional[bool]=False, num_rows_extra: Optional[int]=100) -> pd.DataFrame:
-    """dataframe containing headers + data + extrarows"""
-
-    if allow_input_extra_rows:
-        df_rows_extra = rows_extra(df_data_only, num_rows_extra)
-    else:
-        df_rows_extra = None
-
-    return pd.concat([df_hd, df_data_only, df_rows_extra])
-
-
 def clean_df_main(df_main: pd.DataFrame) -> pd.DataFrame:
     """Remove blank columns"""
 
@@ -102,8 +145,11 @@ def clean_df_main(df_main: pd.DataFrame) -> pd.DataFrame:
     return df_main[columns_scope]
 
 
-def get_excel_df(xl_file:str, sheet_name: str, header: Optional[str]=None) -> pd.DataFrame:
-    """This function is only used to create the df_main or the df_dvconfig1"""
+def get_excel_df(xl_file: Union[str, pd.ExcelFile], sheet_name: str, header: Optional[str]=None) -> pd.DataFrame:
+    """
+    This function is only used to create the df_main or the df_dvconfig1
+    xl_file: path or pd.ExcelFile already opened (the file is not parsed again for each sheet)
+    """
     df = pd.read_excel(xl_file, sheet_name=sheet_name, header=None, na_filter=False, index_col=0)
     df.index.name = 'Index'
 
@@ -118,23 +164,48 @@ def get_excel_df(xl_file:str, sheet_name: str, header: Optional[str]=None) -> pd
     return df
 
 
-def check_google_sh_reader(sheet_id: str, sheet_name: str, na_filter: bool, header: Union[int,None], index_col:Union[int,None]):
-    """Check if the google sheet workbook is readeble"""
+def google_sheets_restricted(error: Exception) -> pd.errors.ParserError:
+    print(error)
+    return pd.errors.ParserError('The Google sheet workbook is restricted. It must be accessible to Anyone with the link')
+
+
+def read_google_sheets_csv(sheet_id: str, sheet_names: List[Optional[str]], cache_dir: Optional[str]=None,
+    url_template: Optional[str]=None) -> Dict[str, bytes]:
+    """
+    Downloads all the tabs concurrently {sheet_name: csv bytes}
+    cache_dir: folder of the on-disk cache of the tabs, unchanged tabs are not downloaded again
+    url_template: url of the csv with the fields {sheet_id} and {sheet_name}, default GVIZ_CSV_URL (google_sheets)
+    """
+    try:
+        return fetch_google_sheets(sheet_id, sheet_names, cache_dir=cache_dir, url_template=url_template)
+    except HTTPError as e:
+        raise google_sheets_restricted(e) from None
+
+
+def check_google_sh_reader(sheet_id: str, sheet_name: str, na_filter: bool, header: Union[int,None], index_col:Union[int,None], 
+    sheets_csv: Optional[Dict[str, bytes]]=None):
+    """
+    Check if the google sheet workbook is readeble
+    sheets_csv: tabs already downloaded {sheet_name: csv bytes} (read_google_sheets_csv), if the tab is not included it is downloaded
+    """
     if sheet_name is None or sheet_name == '':
         return None
 
     try:
-        df = pd.read_csv(f'https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:csv&sheet={sheet_name}', na_filter=na_filter, header=header, index_col=index_col)
+        if sheets_csv is not None and sheet_name in sheets_csv:
+            csv_data = sheets_csv[sheet_name]
+        else:
+            csv_data = fetch_google_sheet_csv(sheet_id, sheet_name)
+        df = pd.read_csv(io.BytesIO(csv_data), na_filter=na_filter, header=header, index_col=index_col)
     except (pd.errors.ParserError, HTTPError) as pe:
-        print(pe)
-        raise pd.errors.ParserError('The Google sheet workbook is restricted. It must be accessible to Anyone with the link')
+        raise google_sheets_restricted(pe) from None
     else:
         return df
 
 
-def get_google_sheet_df(sheet_id: str, sheet_name: str) -> pd.DataFrame:
+def get_google_sheet_df(sheet_id: str, sheet_name: str, sheets_csv: Optional[Dict[str, bytes]]=None) -> pd.DataFrame:
     """Read google sheets main sheet"""
-    df = check_google_sh_reader(sheet_id, sheet_name, na_filter=False, header=None, index_col=0)
+    df = check_google_sh_reader(sheet_id, sheet_name, na_filter=False, header=None, index_col=0, sheets_csv=sheets_csv)
     df.index.name = 'Index'
     
     df.columns = range(df.shape[1])
@@ -142,12 +213,12 @@ def get_google_sheet_df(sheet_id: str, sheet_name: str) -> pd.DataFrame:
 
 
 ## data_validation_config1
-def get_google_sheet_validation(sheet_id: str, dropdown_list_sheet: str) -> pd.DataFrame:
+def get_google_sheet_validation(sheet_id: str, dropdown_list_sheet: str, sheets_csv: Optional[Dict[str, bytes]]=None) -> pd.DataFrame:
     """Read google sheets data_validation_config1"""
     if dropdown_list_sheet is None or dropdown_list_sheet == '':
         return None
 
-    df = check_google_sh_reader(sheet_id, dropdown_list_sheet, na_filter=False, header=None, index_col=0)
+    df = check_google_sh_reader(sheet_id, dropdown_list_sheet, na_filter=False, header=None, index_col=0, sheets_csv=sheets_csv)
     ## header: index 'HEADER' from the dropdows list sheet
     try:
         df.columns = df.loc['HEADER']
@@ -160,7 +231,8 @@ def get_google_sheet_validation(sheet_id: str, dropdown_list_sheet: str) -> pd.D
 
 
 ## data_validation_config2
-def get_google_sheet_validation2(sheet_id: str, data_validation_sheet_config2: str, dropdown_list_sheet: str) -> Tuple[pd.DataFrame,pd.DataFrame]:
+def get_google_sheet_validation2(sheet_id: str, data_validation_sheet_config2: str, dropdown_list_sheet: str, 
+    sheets_csv: Optional[Dict[str, bytes]]=None) -> Tuple[pd.DataFrame,pd.DataFrame]:
     """
     Read google sheets data_validation_config2
     data_validation_sheet_config2: name of the sheet where the data_validation_config2 is located
@@ -172,14 +244,15 @@ def get_google_sheet_validation2(sheet_id: str, data_validation_sheet_config2: s
     if dropdown_list_sheet is None or dropdown_list_sheet == '':
         return None, None
         
-    df_dvconfig2 = check_google_sh_reader(sheet_id, data_validation_sheet_config2, na_filter=False, header=0, index_col=None)
-    df_picklists = check_google_sh_reader(sheet_id, dropdown_list_sheet, na_filter=False, header=0, index_col=None)
+    df_dvconfig2 = check_google_sh_reader(sheet_id, data_validation_sheet_config2, na_filter=False, header=0, index_col=None, sheets_csv=sheets_csv)
+    df_picklists = check_google_sh_reader(sheet_id, dropdown_list_sheet, na_filter=False, header=0, index_col=None, sheets_csv=sheets_csv)
     return df_dvconfig2, df_picklists
 
 
-def get_excel_dvalidation2(xl_file:str, data_validation_sheet_config2: str, dropdown_list_sheet: str) -> Tuple[pd.DataFrame,pd.DataFrame]:
+def get_excel_dvalidation2(xl_file: Union[str, pd.ExcelFile], data_validation_sheet_config2: str, dropdown_list_sheet: str) -> Tuple[pd.DataFrame,pd.DataFrame]:
     """
     Read excel file data_validation_config2
+    xl_file: path or pd.ExcelFile already opened (the file is not parsed again for each sheet)
     data_validation_sheet_config2: name of the sheet where the data_validation_config2 is located
     dropdown_list_sheet: name of the sheet where the dropdown lists are located
     """
@@ -194,13 +267,6 @@ def get_excel_dvalidation2(xl_file:str, data_validation_sheet_config2: str, drop
     return df_dvconfig2, df_picklists
 
 
-def export_json(dict_: DataValDict, filename: str) -> None:
-    json_str_format = json.dumps(dict_, indent=2)   ## string
-    filename = f'{filename}.json'
-    with open(filename, 'w') as outfile:
-        outfile.write(json_str_format)
-
-
 Project = Tuple[str, str]
 def set_project_name(project_name: Optional[str]=None) -> Project:
     ProName = collections.namedtuple('ProName', ['name', 'root'])
@@ -215,10 +281,18 @@ def set_project_name(project_name: Optional[str]=None) -> Project:
     return project
 
 
-def create_output_folders(project_name: str, today: str, protect_files: Optional[bool]=False) -> Tuple[str, str]:
+def create_output_folders(project_name: str, today: str, protect_files: Optional[bool]=False, 
+    make_folders: Optional[bool]=True) -> Tuple[str, str]:
+    """
+    Returns the names of the output folders
+    make_folders: False when the files are written straight into the zip archives of the folders (ZipSink)
+    """
 
     path_1 = f'{project_name}_XL_files_{today}'
     path_2 = f'{project_name}_XL_files_password_{today}'
+    if not make_folders:
+        return path_1, path_2
+
     os.mkdir(path_1)
 
     if protect_files:
@@ -228,11 +302,11 @@ def create_output_folders(project_name: str, today: str, protect_files: Optional
 
 
 XlFile = Tuple[str,str,str]
-def get_XlFile_details(split_value: str, project: Project, batch: Union[str,int], i: int, today: str, path_1: str) -> XlFile:
+def get_XlFile_details(split_value: Any, project: Project, batch: Union[str,int], i: int, today: str, path_1: str) -> XlFile:
     XlFile = collections.namedtuple('XlFile', ['id', 'name', 'path']) 
     
-    ### Remove special characters from the supplier name
-    name = ''.join(char for char in split_value if char == ' ' or char.isalnum())
+    ### Remove special characters from the supplier name (the typed data of from_dataframe can split by numbers or dates)
+    name = ''.join(char for char in str(split_value) if char == ' ' or char.isalnum())
     id_file = f'{project.name}ID{batch}{i:03d}'
     file_name = f'{id_file}-{name}-{today}.xlsx'
     file_path = f'{path_1}/{file_name}'
@@ -251,7 +325,7 @@ def password_dataframe(password_master: List[Tuple[str,str,str,str]], project: P
 
 def to_zip(path_1: str, path_2: str) -> None:
     
-    shutil.make_archive(path_1, 'zip', path_1)
-    shutil.make_archive(path_2, 'zip', path_2)
-    os.system(f'rm -r {path_1}')
-    os.system(f'rm -r {path_2}')
\ No newline at end of file
+    for path in (path_1, path_2):
+        if os.path.isdir(path):
+            shutil.make_archive(path, 'zip', path)
+            shutil.rmtree(path)
@@ -0,0 +1,84 @@
+import io
+import re
+import uuid
+import zipfile
+from typing import Any, Callable, Dict, Optional
+
+from .output_sink import MemorySink
+from .zip_package import replace_zip_members
+
+
+SHARED_STRINGS = 'xl/sharedStrings.xml'
+### split_value of the rendered file, each file replaces it with its own split_value
+STAMP_PLACEHOLDER = f'xlfilecreator-split-value-{uuid.uuid4().hex}'
+
+### Values that xlsxwriter does not write as a plain shared string (control characters, _xHHHH_ escapes, whitespace to preserve, rich strings)
+NOT_PLAIN_STRING = re.compile(r'[\x00-\x08\x0B-\x1F￾￿]|_x[0-9a-fA-F]{4}_|^\s|\s$|^<r>.*</r>$', re.S)
+
+
+def escape_xml(text: str) -> str:
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+class XlFileStamp:
+    """
+    Excel file rendered once with STAMP_PLACEHOLDER as the split_value of the replicated templates (split_by_value=False)
+    The files of split_by_range only differ in the split_by column, each file is produced by replacing the shared string
+    of the placeholder with its split_value (stamp()), the worksheets are not written again.
+    The files are the same as the files rendered one by one, the values that would change the rest of the file
+    (numbers, formulas, strings already in the workbook, etc) are not stamped and the file has to be rendered
+
+    data: bytes of the rendered excel file
+    """
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.placeholder_si = f'<si><t>{STAMP_PLACEHOLDER}</t></si>'
+
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            names = zf.namelist()
+            shared_strings = zf.read(SHARED_STRINGS).decode('utf-8') if SHARED_STRINGS in names else ''
+
+            if self.placeholder_si in shared_strings:
+                self.shared_strings = shared_strings
+                self.strings = set(re.findall(r'<t[^>]*>(.*?)</t>', shared_strings, re.S))
+                self.enabled = True
+            else:
+                ### No data rows (all the files are the same) or the placeholder was written in line (constant_memory)
+                self.shared_strings = None
+                self.strings = set()
+                self.enabled = not any(STAMP_PLACEHOLDER.encode('utf-8') in zf.read(name) for name in names)
+
+    @classmethod
+    def render(cls, func: Callable[..., None], file_kwargs: Dict[str, Any]) -> 'XlFileStamp':
+        """
+        Renders the file with the placeholder as split_value
+        func: create_xl_file or create_xl_file_multiple, called as func(**file_kwargs)
+        file_kwargs: arguments of the files, the workbook is protected when each file is saved
+        """
+        sink = MemorySink()
+        func(**{**file_kwargs, 'workbook_password': None}, file_path=STAMP_PLACEHOLDER, split_value=STAMP_PLACEHOLDER, sink=sink)
+
+        return cls(sink.files[0][1])
+
+    def stamp(self, split_value: Any) -> Optional[bytes]:
+        """Returns the bytes of the excel file of the split_value, None if the file has to be rendered"""
+
+        if not self.enabled:
+            return None
+        if self.shared_strings is None:
+            return self.data
+
+        ### Only the values written as a plain shared string (write_column)
+        if split_value.__class__ is not str or split_value == '' or split_value[0] in '={' or ':' in split_value or len(split_value) > 32767:
+            return None
+        if NOT_PLAIN_STRING.search(split_value):
+            return None
+
+        value = escape_xml(split_value)
+        if value in self.strings:
+            ### The cells of the split_value would share the entry of the existing string
+            return None
+
+        shared_strings = self.shared_strings.replace(self.placeholder_si, f'<si><t>{value}</t></si>', 1)
+        return replace_zip_members(self.data, {SHARED_STRINGS: shared_strings.encode('utf-8')})
@@ -1,19 +1,23 @@
 import pandas as pd
-from tqdm.auto import tqdm 
 
 import datetime
-from typing import Optional, List, Dict, Union
+from typing import Any, Callable, Optional, List, Dict, Union, Sequence
 
+from .build_manifest import rows_digest
 from .create_xlfile import create_xl_file
 from .conditional_formatting import CondFormatting
-from .config_file import config_file
 from .data_validation import DataValidationConfig1, DataValidationConfig2
-from .encrypt_xl import set_password, create_password
+from .encrypt_xl import get_encryption_backend
+from .partitioned_data import PartitionedData, read_csv_chunks, read_parquet_chunks
+from .split_files import create_split_files
+from .template_plan import ConfigurationFromPlan, TemplatePlan, compile_plan
+from .template_skeleton import TemplateSkeleton
 from .terminal_colors import blue, yellow
-from .utils_func import (to_number, get_google_sheet_df, get_headers, get_df_data, check_google_sh_reader,rows_extra,
+from .tracer import Event, Tracer, active_tracer, trace, tracing
+from .utils_func import (identify_number_columns, get_google_sheet_df, get_headers, check_google_sh_reader,
                         set_project_name, get_google_sheet_validation2, get_excel_dvalidation2,
-                        create_output_folders, clean_df_main, get_google_sheet_validation, to_zip,
-                        get_column_to_split_by, get_excel_df, validate_integer_input, get_XlFile_details, password_dataframe)
+                        clean_df_main, get_google_sheet_validation,
+                        get_column_to_split_by, get_excel_df, validate_integer_input, read_google_sheets_csv)
 
 
 class XlFileTemp:
@@ -21,26 +25,39 @@ class XlFileTemp:
     Properties:
 
     df_hd: dataframe contaning the headers (description_header, example_header, header)
-    df_data: dataframe containing the headers + data + extra_rows(optional)
     extra_rows: bool coming from allow_input_extra_rows
     num_rows_extra: int number of extra empty rows
     df_settings: dataframe containing configuration of the excel file (format, width, lock columns, etc)
+    df_data_only: dataframe containing only the data rows
     header_index_list: list of header indexes in scope i.e ['Description_header','HEADER','example_row'] 
-    hd_index: interger index where the header is located in the df_data
-    data_index: interger index where the data starts in the df_data
+    hd_index: interger index where the header is located in the sheet
+    data_index: interger index where the data starts in the sheet
     lenght: number of rows of the data
     data_validation_sheet_config1 (optional): name of the sheet containing the data validation configuration 1
     dv_config1 (optional): DataValidationConfig1 object containing the configuration for Data Validation 1
     dv_config2 (optional): DataValidationConfig2 object containing the configuration for Data Validation 2
     dropdown_lists_sheet_config2 (optional): name of the sheet where the dropdown lists used in data validation 2 are located
     cond_formatting (optional): CondFormatting object containing the settings for conditional formatting
+    The template created from a plan (from_plan) has no dv_config1, dv_config2 and cond_formatting (ConfigurationFromPlan), their settings are in the plan
     identify_data_types (optional): Converts string number values into float. Passing identify_data_types=False can improve the performance of reading a large file.
+    partitions (optional): PartitionedData object, data spilled to disk by the column to split by (from_partitioned_file). df_data_only is empty
     Methods:
 
     read_google_sheets_file(cls): Creates a XlFileTemp object from a google sheeets workbook
     read_excel(cls): Creates a XlFileTemp object from an excel file
+    from_dataframe(cls): Creates a XlFileTemp object from the settings rows and a typed dataframe with the data
+    from_parquet(cls): Creates a XlFileTemp object from the settings rows and a parquet file with the data
     export_config_file(): Creates an excel file that can be imported google sheets to test or as a template for a new project
     to_excel(self): Method to create an excel template or split into multiple templates based on a field part of the header of the main sheet
+    from_partitioned_file(cls): Creates a XlFileTemp object from the settings rows and a csv or parquet file read in chunks and spilled to disk by the column to split by
+    from_plan(cls): Creates a XlFileTemp object from a compiled plan (compile()) and a dataframe with the data, the configuration sheets are not read again
+    split_index(self): Partition index of the data by the column to split by, built once and reused for every split file
+    split_values(self): Values of the column to split by
+    split_rows(self): Data rows of a split_value
+    data_digest(self): Hash of the data rows of a split_value, recorded in the build manifest
+    compile(self): Compiled configuration of the template (TemplatePlan), it can be saved and reused by other runs (from_plan)
+    skeleton(self): Parts of the template shared by all the split files, built once from the plan
+    data_filtered(self): Data rows of a file
     """
 
     def __init__(self, df_main: pd.DataFrame, tab_names: Dict[str,str], df_dvconfig1: Optional[pd.DataFrame]=None, df_dvconfig2: Optional[pd.DataFrame]=None,
@@ -48,14 +65,12 @@ class XlFileTemp:
     dropdown_lists_sheet_config2: Optional[str]='Dropdown_Lists_2', df_picklists: Optional[pd.DataFrame]=None,
     df_condf: Optional[pd.DataFrame]=None, identify_data_types: Optional[bool]=True) -> None:
 
-        self.__df_data = None
+        self.__init_caches()
         self.df_data_only = XlFileTemp.apply_data_types(df_main,identify_data_types)
         self.df_settings = df_main[df_main.index!='']
         self.__extra_rows = allow_input_extra_rows
         self.__num_rows_extra = num_rows_extra
         self.header_index_list, self.df_hd = get_headers(self.df_settings)
-        self.hd_index = self.df_data.index.tolist().index('HEADER')
-        self.data_index = self.df_data.index.tolist().index('')
         
         self.data_validation_sheet_config1 = data_validation_sheet_config1
         self.dv_config1 = DataValidationConfig1(self.data_index, df_dvconfig1, data_validation_sheet_config1, self.df_settings)
@@ -63,20 +78,40 @@ class XlFileTemp:
         self.dropdown_lists_sheet_config2 = dropdown_lists_sheet_config2
         self.dv_config2 = DataValidationConfig2(self.data_index ,df_picklists, dropdown_lists_sheet_config2, df_dvconfig2)
 
-        self.cond_formatting = CondFormatting(df_condf, self.df_data)
+        self.cond_formatting = CondFormatting(df_condf, self.df_hd)
         self.tab_names = tab_names
 
+    def __init_caches(self) -> None:
+        self.__split_index = {}
+        self.partitions = None
+        self.__skeletons = {}
+        self.__plan = None
+
     @property
-    def df_data(self) -> pd.DataFrame:
-        self.__df_data = get_df_data(self.df_hd, self.df_data_only, allow_input_extra_rows=self.extra_rows, num_rows_extra=self.num_rows_extra)
+    def df_data_only(self) -> pd.DataFrame:
+        return self.__df_data_only
+
+    @df_data_only.setter
+    def df_data_only(self, df_data_only: pd.DataFrame):
+        self.__df_data_only = df_data_only
+        ### The partition index is only valid for the data it was built from
+        self.__split_index = {}
 
-        return self.__df_data
+    @property
+    def hd_index(self) -> int:
+        """hd_index: interger index where the header is located in the sheet"""
+        return self.header_index_list.index('HEADER')
+
+    @property
+    def data_index(self) -> int:
+        """data_index: interger index where the data starts in the sheet"""
+        return len(self.header_index_list)
 
     @property
     def length(self) -> int:
         """length: number of rows of the data """
         
-        return self.df_data.shape[0]
+        return self.data_index + self.df_data_only.shape[0] + self.num_rows_extra
     
     @property
     def extra_rows(self):
@@ -110,29 +145,26 @@ class XlFileTemp:
     @staticmethod
     def apply_data_types(df_main: pd.DataFrame, identify_data_types: bool) -> pd.DataFrame:
         """Convert the numbers read as text into float values
-        identify_data_types: passing identify_data_types=False can improve the performance of reading a large file.
+        Only the columns with a currency, percent or number format in the lock_sheet_config are converted, the values that are not numbers are kept as text.
+        The conversion is vectorized for each column, thousands separators and the symbol of the format ($, £, €, %) are accepted.
+        identify_data_types: passing identify_data_types=False keeps all numbers in text format.
         """
-        df_data_only = df_main[df_main.index==''].copy(deep=True)
-        header = df_main.loc['HEADER']
-        
-        if identify_data_types:
-            float_formats = ['unlocked_dollars','unlocked_pounds','unlocked_euros','unlocked_percent','unlocked_number']
-            format_cols = df_main.loc['lock_sheet_config']
+        with trace('apply_data_types'):
+            df_data_only = df_main[df_main.index==''].copy(deep=True)
             
-            for f, col, hd in zip(format_cols, df_main.columns, header):
-                if f in float_formats:
-                    tqdm.pandas(desc=f'{hd} - TextValues >>> Float')
-                    df_data_only[col] = df_data_only[col].progress_apply(to_number)
+            if identify_data_types and 'lock_sheet_config' in df_main.index:
+                identify_number_columns(df_data_only, df_main.loc['lock_sheet_config'])
 
         return df_data_only
     
     @classmethod
     def read_excel(cls, xl_file: str, main_sheet: str, data_validation_sheet_config1: Optional[str]=None,
         data_validation_sheet_config2: Optional[str]=None, dropdown_lists_sheet_config2: Optional[str]=None,
-        conditional_formatting_sheet: Optional[str]=None, identify_data_types: Optional[bool]=False):
+        conditional_formatting_sheet: Optional[str]=None, identify_data_types: Optional[bool]=False, engine: Optional[str]=None):
         """
         Constructor of XlFileTemp
         Creates an XlFileTemp object from an excel file
+        The excel file is opened once and all the sheets are read from it
 
         Parameters
         xl_file: Excel file path
@@ -142,21 +174,23 @@ class XlFileTemp:
         dropdown_lists_sheet_config2: name of the sheet where the dropdown lists for the data validation confuration 2 are located
         conditional_formatting_sheet: name of the sheet where the conditional formatting settings are located
         identify_data_types (optional): default FALSE for read_excel(). Converts string number values into float. Passing identify_data_types=False can improve the performance of reading a large file.
+        engine (optional): engine of pd.ExcelFile used to read the file, default 'openpyxl'. engine='calamine' (pip install python-calamine) reads a large MAIN_SHEET faster
         """
         
-        df_main = get_excel_df(xl_file, main_sheet)
-        df_main = clean_df_main(df_main)
-        if conditional_formatting_sheet is None or conditional_formatting_sheet == '':
-            df_condf = None
-        else:
-            df_condf = pd.read_excel(xl_file, sheet_name=conditional_formatting_sheet, na_filter=False)
+        with trace('read_config'), pd.ExcelFile(xl_file, engine=engine) as xl:
+            df_main = get_excel_df(xl, main_sheet)
+            df_main = clean_df_main(df_main)
+            if conditional_formatting_sheet is None or conditional_formatting_sheet == '':
+                df_condf = None
+            else:
+                df_condf = pd.read_excel(xl, sheet_name=conditional_formatting_sheet, na_filter=False)
 
-        if data_validation_sheet_config1 is None or data_validation_sheet_config1 == '':
-            df_dvconfig1 = None
-        else:
-            df_dvconfig1 = get_excel_df(xl_file, sheet_name=data_validation_sheet_config1, header='HEADER')
-        
-        df_dvconfig2, df_picklists = get_excel_dvalidation2(xl_file, data_validation_sheet_config2, dropdown_lists_sheet_config2)
+            if data_validation_sheet_config1 is None or data_validation_sheet_config1 == '':
+                df_dvconfig1 = None
+            else:
+                df_dvconfig1 = get_excel_df(xl, sheet_name=data_validation_sheet_config1, header='HEADER')
+            
+            df_dvconfig2, df_picklists = get_excel_dvalidation2(xl, data_validation_sheet_config2, dropdown_lists_sheet_config2)
         
         tab_names = {
             'main_sheet': main_sheet,
@@ -171,9 +205,11 @@ class XlFileTemp:
     @classmethod
     def read_google_sheets_file(cls, sheet_id: str, main_sheet: str, data_validation_sheet_config1: Optional[str]=None,
         data_validation_sheet_config2: Optional[str]=None, dropdown_lists_sheet_config2: Optional[str]=None,
-        conditional_formatting_sheet: Optional[str]=None, identify_data_types: Optional[bool]=True):
+        conditional_formatting_sheet: Optional[str]=None, identify_data_types: Optional[bool]=True, cache_dir: Optional[str]=None,
+        url_template: Optional[str]=None):
         """
         Returns a XlFileTemp object
+        All the tabs are downloaded concurrently
 
         Parameters
         sheet_id: google sheets id 
@@ -183,16 +219,24 @@ class XlFileTemp:
         dropdown_lists_sheet_config2: name of the sheet where the dropdown lists for the data validation confuration 2 are located
         conditional_formatting_sheet: name of the sheet where the conditional formatting settings are located
         identify_data_types (optional): default TRUE for read_google_sheets_file(). Converts string number values into float. Passing identify_data_types=False can improve the performance of reading a large file.
+        cache_dir (optional): folder where the tabs are cached, the tabs are revalidated with conditional requests (ETag/Last-Modified) and only downloaded again if they changed
+        url_template (optional): url of the csv of each tab with the fields {sheet_id} and {sheet_name}, by default the csv export of google sheets.
+        It can point to another server that serves the same csv (a local copy of the workbook, a test server)
         """
         if identify_data_types:
             print(blue('identify_data_types: Convert the numbers read as text into float values\nPassing identify_data_types=False can improve the performance of reading a large file and numbers will remain in text format'))
 
         ### Read google sheets file
-        df_main = get_google_sheet_df(sheet_id, main_sheet)
-        df_main = clean_df_main(df_main)
-        df_dvconfig1 = get_google_sheet_validation(sheet_id, data_validation_sheet_config1)
-        df_dvconfig2, df_picklists = get_google_sheet_validation2(sheet_id, data_validation_sheet_config2, dropdown_lists_sheet_config2)
-        df_condf = check_google_sh_reader(sheet_id, conditional_formatting_sheet, na_filter=False, header=0, index_col=None)
+        with trace('read_config'):
+            sheet_names = [main_sheet, data_validation_sheet_config1, conditional_formatting_sheet]
+            if data_validation_sheet_config2 and dropdown_lists_sheet_config2:
+                sheet_names += [data_validation_sheet_config2, dropdown_lists_sheet_config2]
+            sheets_csv = read_google_sheets_csv(sheet_id, sheet_names, cache_dir=cache_dir, url_template=url_template)
+            df_main = get_google_sheet_df(sheet_id, main_sheet, sheets_csv)
+            df_main = clean_df_main(df_main)
+            df_dvconfig1 = get_google_sheet_validation(sheet_id, data_validation_sheet_config1, sheets_csv)
+            df_dvconfig2, df_picklists = get_google_sheet_validation2(sheet_id, data_validation_sheet_config2, dropdown_lists_sheet_config2, sheets_csv)
+            df_condf = check_google_sh_reader(sheet_id, conditional_formatting_sheet, na_filter=False, header=0, index_col=None, sheets_csv=sheets_csv)
 
         tab_names = {
             'main_sheet': main_sheet,
@@ -204,6 +248,192 @@ class XlFileTemp:
                 dropdown_lists_sheet_config2=dropdown_lists_sheet_config2, df_picklists=df_picklists, df_condf=df_condf,
                 identify_data_types=identify_data_types)
 
+    @classmethod
+    def from_dataframe(cls, df_settings: pd.DataFrame, df_data, main_sheet: Optional[str]='MAIN_SHEET', df_dvconfig1: Optional[pd.DataFrame]=None,
+        df_dvconfig2: Optional[pd.DataFrame]=None, df_picklists: Optional[pd.DataFrame]=None, df_condf: Optional[pd.DataFrame]=None,
+        data_validation_sheet_config1: Optional[str]='Dropdown_Lists', dropdown_lists_sheet_config2: Optional[str]='Dropdown_Lists_2'):
+        """
+        Constructor of XlFileTemp
+        Creates an XlFileTemp object from the settings rows of the MAIN_SHEET and a typed dataframe with the data
+        The data is used as it is (dtypes are kept), it does not go through a spreadsheet and identify_data_types is not needed
+
+        Parameters
+        df_settings: dataframe with the settings rows of the MAIN_SHEET (CONFIG_MANAGER, header_format, lock_sheet_config, formula, HEADER, ...)
+        in the index and one column per column of the template
+        df_data: dataframe (or pyarrow Table) with the data, its columns are matched by name with the HEADER row. The columns not in the HEADER row are ignored
+        main_sheet: name of the main sheet
+        df_dvconfig1: same dataframe as the sheet data validation configuration 1 (columns = HEADER row)
+        df_dvconfig2: same dataframe as the sheet data validation configuration 2
+        df_picklists: dropdown lists for the data validation configuration 2
+        df_condf: conditional formatting settings
+        data_validation_sheet_config1: name of the sheet where the dropdown lists of the data validation configuration 1 are created
+        dropdown_lists_sheet_config2: name of the sheet where the dropdown lists of the data validation configuration 2 are created
+        """
+
+        if hasattr(df_data, 'to_pandas'):
+            df_data = df_data.to_pandas()
+
+        df_settings = df_settings.fillna('').astype(object)
+        df_settings.index.name = 'Index'
+        df_settings = clean_df_main(df_settings)
+        headers = list(df_settings.loc['HEADER'])
+        df_settings.columns = range(df_settings.shape[1])
+
+        missing_headers = [hd for hd in headers if hd not in df_data.columns]
+        if missing_headers:
+            raise KeyError(f'{missing_headers} not found in the columns of df_data')
+
+        ### Columns in the order of the HEADER row, named by position as the columns of df_main
+        df_data_only = df_data[headers].copy()
+        df_data_only.columns = df_settings.columns
+        df_data_only.index = pd.Index([''] * df_data_only.shape[0], name='Index')
+
+        tab_names = {
+            'main_sheet': main_sheet,
+            'data_validation_sheet_config1': data_validation_sheet_config1,
+            'dropdown_lists_sheet_config2': dropdown_lists_sheet_config2,
+        }
+
+        template = cls(df_settings, tab_names, df_dvconfig1, df_dvconfig2, data_validation_sheet_config1=data_validation_sheet_config1,
+                dropdown_lists_sheet_config2=dropdown_lists_sheet_config2, df_picklists=df_picklists, df_condf=df_condf,
+                identify_data_types=False)
+        template.df_data_only = df_data_only
+
+        return template
+
+    @classmethod
+    def from_parquet(cls, df_settings: pd.DataFrame, path: str, main_sheet: Optional[str]='MAIN_SHEET', df_dvconfig1: Optional[pd.DataFrame]=None,
+        df_dvconfig2: Optional[pd.DataFrame]=None, df_picklists: Optional[pd.DataFrame]=None, df_condf: Optional[pd.DataFrame]=None,
+        data_validation_sheet_config1: Optional[str]='Dropdown_Lists', dropdown_lists_sheet_config2: Optional[str]='Dropdown_Lists_2'):
+        """
+        Constructor of XlFileTemp
+        Same as from_dataframe() with the data read from a parquet file (requires pyarrow or fastparquet)
+        Only the columns of the HEADER row are read
+
+        Parameters
+        df_settings: dataframe with the settings rows of the MAIN_SHEET, see from_dataframe()
+        path: path of the parquet file
+        """
+
+        headers = [hd for hd in df_settings.loc['HEADER'] if isinstance(hd, str) and hd != '']
+        df_data = pd.read_parquet(path, columns=headers)
+
+        return cls.from_dataframe(df_settings, df_data, main_sheet=main_sheet, df_dvconfig1=df_dvconfig1, df_dvconfig2=df_dvconfig2,
+                df_picklists=df_picklists, df_condf=df_condf, data_validation_sheet_config1=data_validation_sheet_config1,
+                dropdown_lists_sheet_config2=dropdown_lists_sheet_config2)
+
+    @classmethod
+    def from_partitioned_file(cls, df_settings: pd.DataFrame, path: str, split_by: str, partition_dir: Optional[str]=None, chunksize: Optional[int]=100000,
+        identify_data_types: Optional[bool]=True, main_sheet: Optional[str]='MAIN_SHEET', df_dvconfig1: Optional[pd.DataFrame]=None,
+        df_dvconfig2: Optional[pd.DataFrame]=None, df_picklists: Optional[pd.DataFrame]=None, df_condf: Optional[pd.DataFrame]=None,
+        data_validation_sheet_config1: Optional[str]='Dropdown_Lists', dropdown_lists_sheet_config2: Optional[str]='Dropdown_Lists_2'):
+        """
+        Constructor of XlFileTemp for datasets larger than the memory
+        The csv or parquet file is read in chunks and the rows are spilled to one partition file per value of the column split_by.
+        Each excel file is created from its partition, the memory used is bounded by the largest split_value instead of the whole dataset.
+        The files can only be split by this column and filtered by its values (to_excel(split_by=split_by), split_by_range values must be in the data)
+
+        Parameters
+        df_settings: dataframe with the settings rows of the MAIN_SHEET, see from_dataframe()
+        path: path of the csv or parquet file (.parquet requires pyarrow), its columns are matched by name with the HEADER row
+        split_by: header of the column used to partition the data
+        partition_dir: folder of the partition files. If None a temporary folder is used and removed with the object
+        chunksize: number of rows read at a time
+        identify_data_types: csv files are read as text, converts string number values into float. Parquet files keep their dtypes
+        """
+
+        df_settings = df_settings.fillna('').astype(object)
+        df_settings.index.name = 'Index'
+        df_settings = clean_df_main(df_settings)
+        headers = list(df_settings.loc['HEADER'])
+        df_settings.columns = range(df_settings.shape[1])
+        col_to_split = get_column_to_split_by(df_settings, split_by)
+
+        if str(path).lower().endswith(('.parquet', '.pq')):
+            chunks = read_parquet_chunks(path, headers, chunksize)
+        else:
+            chunks = read_csv_chunks(path, headers, chunksize)
+
+        def data_chunks():
+            for chunk in chunks:
+                ### Columns named by position as the columns of df_main
+                chunk.columns = df_settings.columns
+                chunk.index = pd.Index([''] * chunk.shape[0], name='Index')
+                if identify_data_types and 'lock_sheet_config' in df_settings.index:
+                    identify_number_columns(chunk, df_settings.loc['lock_sheet_config'])
+                yield chunk
+
+        partitions = PartitionedData(col_to_split, partition_dir).spill(data_chunks())
+
+        tab_names = {
+            'main_sheet': main_sheet,
+            'data_validation_sheet_config1': data_validation_sheet_config1,
+            'dropdown_lists_sheet_config2': dropdown_lists_sheet_config2,
+        }
+
+        template = cls(df_settings, tab_names, df_dvconfig1, df_dvconfig2, data_validation_sheet_config1=data_validation_sheet_config1,
+                dropdown_lists_sheet_config2=dropdown_lists_sheet_config2, df_picklists=df_picklists, df_condf=df_condf,
+                identify_data_types=False)
+        template.partitions = partitions
+
+        return template
+
+    @classmethod
+    def from_plan(cls, plan: Union[TemplatePlan,str], df_data, identify_data_types: Optional[bool]=False, allow_input_extra_rows: Optional[bool]=False,
+        num_rows_extra: Optional[int]=100):
+        """
+        Constructor of XlFileTemp
+        Creates an XlFileTemp object from a compiled plan (compile()) and a dataframe with the data
+        The configuration sheets are not read or validated again, the headers, formats, dropdown lists, data validation and
+        conditional formatting of the plan are used as they are
+
+        Parameters
+        plan: TemplatePlan or path of a plan saved with plan.save(path)
+        df_data: dataframe (or pyarrow Table) with the data, its columns are matched by name with the HEADER row. The columns not in the HEADER row are ignored
+        identify_data_types: Converts string number values into float (data read as text)
+        allow_input_extra_rows: bool, allow the users to fill in extra rows at the end of the data
+        num_rows_extra: number of extra rows
+        """
+
+        if isinstance(plan, str):
+            plan = TemplatePlan.load(plan)
+        if hasattr(df_data, 'to_pandas'):
+            df_data = df_data.to_pandas()
+
+        df_settings = plan.settings_dataframe()
+        headers = list(df_settings.loc['HEADER'])
+
+        missing_headers = [hd for hd in headers if hd not in df_data.columns]
+        if missing_headers:
+            raise KeyError(f'{missing_headers} not found in the columns of df_data')
+
+        ### Columns in the order of the HEADER row, named by position as the columns of df_main
+        df_data_only = df_data[headers].copy()
+        df_data_only.columns = df_settings.columns
+        df_data_only.index = pd.Index([''] * df_data_only.shape[0], name='Index')
+        if identify_data_types and 'lock_sheet_config' in df_settings.index:
+            with trace('apply_data_types'):
+                identify_number_columns(df_data_only, df_settings.loc['lock_sheet_config'])
+
+        template = cls.__new__(cls)
+        template.__init_caches()
+        template.__plan = plan
+        template.df_data_only = df_data_only
+        template.df_settings = df_settings
+        template.extra_rows = allow_input_extra_rows
+        template.__num_rows_extra = num_rows_extra
+        template.header_index_list, template.df_hd = get_headers(df_settings)
+
+        ### The configuration objects are replaced by the plan
+        template.data_validation_sheet_config1 = plan.tab_names.get('data_validation_sheet_config1')
+        template.dropdown_lists_sheet_config2 = plan.tab_names.get('dropdown_lists_sheet_config2')
+        template.dv_config1 = ConfigurationFromPlan('dv_config1')
+        template.dv_config2 = ConfigurationFromPlan('dv_config2')
+        template.cond_formatting = ConfigurationFromPlan('cond_formatting')
+        template.tab_names = dict(plan.tab_names)
+
+        return template
+
     @staticmethod
     def export_config_file() -> None:
         """
@@ -211,11 +441,17 @@ class XlFileTemp:
         The template includes data that can be pass as the parameter of the 
         constructor 'read_google_sheets_file()' to create an XlFileTemp object
         """
+        ### The large settings of the config file are only loaded when it is exported
+        from .config_file import config_file
+
         config_file()
 
     def to_excel(self, project_name: Optional[str]=None, split_by: Optional[str]=None, split_by_range: Optional[List[str]]=None, batch: Optional[int]=1, 
         sheet_password: Optional[str]=None, workbook_password: Optional[str]=None, allow_input_extra_rows: Optional[bool]=None, 
-        num_rows_extra: Optional[int]=None, protect_files: Optional[bool]=False, random_password: Optional[bool]=False, in_zip: Optional[bool]=False) -> None:
+        num_rows_extra: Optional[int]=None, protect_files: Optional[bool]=False, random_password: Optional[bool]=False, in_zip: Optional[bool]=False,
+        max_workers: Optional[int]=None, encryption_backend: Optional[str]=None, zip_compresslevel: Optional[int]=None,
+        manifest_path: Optional[str]=None, incremental: Optional[bool]=False, constant_memory: Optional[bool]=False,
+        trace_callback: Optional[Callable[[Event], None]]=None, trace_report: Optional[bool]=False) -> Optional[Dict[str, Dict[str, float]]]:
         """
         Creates the excel file
         project_name: name of the project, it will be part of the filename of the templates. If split_by is None it will be the name of the single file generated
@@ -229,7 +465,22 @@ class XlFileTemp:
         num_rows_extra: Number of extra rows in the template, if None it will use self.num_rows_extra: Optional[int]=100. 
         protect_files: False/True encrypt the files
         random_password: False/True if protect_files is True it determines if the password of the files should be random or based on a logic
-        in_zip: False/True Download folders in zip 
+        in_zip: False/True Download folders in zip. Each file is appended to the zip as soon as it is created
+        zip_compresslevel: if in_zip is True, the excel files are stored in the zip (already compressed) unless a compression level 0-9 is provided 
+        max_workers: number of worker processes used to create the split files in parallel. If None the files are created one after another in the current process
+        encryption_backend: 'native' encrypts the files in memory (requires cryptography), 'msoffice' encrypts them with msoffice-crypt. If None it uses 'native' when cryptography is installed
+        manifest_path: path of the manifest of the build (BuildManifest, JSON lines). Each finished file is recorded with the hash of its rows and of the configuration
+        With random_password=True the manifest also keeps the password of each file, it is as sensitive as the password master file
+        incremental: False/True requires manifest_path. Updates the build of the manifest: only the files whose hash changed are created (and encrypted) again,
+        in the same folders. An interrupted build is resumed, the files already finished are not created again
+        constant_memory: False/True writes the sheets row by row in xlsxwriter constant_memory mode, the memory used does not grow with the number of rows (very large files)
+        trace_callback: function called with the timing event of each stage of each file (Tracer), e.g. {'name': 'save', 'file': ..., 'start': ..., 'duration': ...}
+        trace_report: False/True writes the timing report of the run ({project_name}-Trace-{date}.json) next to the output folders: stages aggregated,
+        stages of each file and the events (Tracer.report). The events are also recorded in the tracer of an enclosing tracing() block
+
+        The split files go through the stages generate -> protect -> encrypt -> archive, each file is protected, encrypted and saved while the next one is created (FilePipeline).
+        Returns the counters of each stage (files, busy_seconds, files_per_second, blocked_seconds, queue_depth, max_queue_depth), None if split_by is None.
+        The counters include the number of rules before and after merging the identical rules ('rules', rule_counters). They are printed when the run is traced
         """
 
         today = datetime.datetime.today().strftime('%Y%m%d')
@@ -246,59 +497,51 @@ class XlFileTemp:
         if project_name is None or project_name == '':
             project_name = f'Project-{today}'
 
+        tracer = active_tracer()
+        if tracer is None and (trace_callback is not None or trace_report):
+            tracer = Tracer(trace_callback)
+
+        if self.partitions is not None:
+            self.check_partitions(split_by, split_by_value=not isinstance(split_by_range, list))
+
         if split_by is None or split_by == '':
             if not project_name.endswith('.xlsx'):
                 project_name = project_name + '.xlsx'
 
-            create_xl_file(file_path=project_name, template=self, template_name='Sheet1',  
-            sheet_password=sheet_password, workbook_password=workbook_password)
+            with tracing(tracer):
+                create_xl_file(file_path=project_name, template=self, template_name='Sheet1',  
+                sheet_password=sheet_password, workbook_password=workbook_password, constant_memory=constant_memory)
+            if trace_report:
+                tracer.save_report(f'{project_name[:-len(".xlsx")]}-Trace-{today}.json', project=project_name, date=today)
             return None
 
         project = set_project_name(project_name)
-        path_1, path_2 = create_output_folders(project.name, today, protect_files)
+        encryption_backend = get_encryption_backend(encryption_backend) if protect_files is True else None
 
-        ### Unique list of values to split 
+        ### Unique list of values to split, in the order of split_by_range or in the order they are found in the data (the file numbers do not change between runs)
         col_to_split = get_column_to_split_by(self.df_settings, split_by)
         if isinstance(split_by_range, list):
-            values_to_split = set(split_by_range)
+            values_to_split = list(dict.fromkeys(split_by_range))
         else:
             split_by_range = None
-            values_to_split = set(self.df_data_only[col_to_split])
+            values_to_split = self.split_values(col_to_split)
             
         print('Number of files: ', len(values_to_split))
 
-        password_master = []
-        pbar = tqdm(total=len(values_to_split))
-        for i, split_value in enumerate(values_to_split,1):
-            pbar.update(1)
-
-            ### Get Excelfile details (id, name, path)
-            xl_file = get_XlFile_details(split_value, project, batch, i, today, path_1)
-
-            ### Create Excel file
-            if split_by_range is None:
-                split_by_value = True
-            else:
-                split_by_value = False
-            
-            create_xl_file(split_by_value=split_by_value, file_path=xl_file.path, template=self, split_by=split_by, 
-            split_value=split_value, sheet_password=sheet_password, workbook_password=workbook_password, 
-            template_name='Sheet1')
-        
-            ### Create Password master df
-            if protect_files is True:
-                pw = create_password(project, split_value, random_password)    
-                password_master.append((xl_file.id, xl_file.name, split_value, pw))
-
-        ### Encrypt Excel files
-        if protect_files is True:
-            passwordMaster_name = password_dataframe(password_master, project, split_by, today)
-            set_password(path_1, path_2, passwordMaster_name)
+        ### Create Excel file
+        if split_by_range is None:
+            split_by_value = True
+        else:
+            split_by_value = False
 
-        if in_zip:
-            to_zip(path_1, path_2)
+        file_kwargs = dict(template=self, template_name='Sheet1', split_by_value=split_by_value, split_by=split_by, 
+                        sheet_password=sheet_password, workbook_password=workbook_password, constant_memory=constant_memory)
 
-        pbar.close()
+        return create_split_files(create_xl_file, file_kwargs, [self], split_by_value, project=project, today=today, values_to_split=values_to_split,
+                                  split_by=split_by, batch=batch, sheet_password=sheet_password, workbook_password=workbook_password,
+                                  protect_files=protect_files, random_password=random_password, in_zip=in_zip, max_workers=max_workers,
+                                  encryption_backend=encryption_backend, zip_compresslevel=zip_compresslevel, manifest_path=manifest_path,
+                                  incremental=incremental, constant_memory=constant_memory, tracer=tracer, trace_report=trace_report)
 
     def check_split_by_range(self, split_by: str, split_by_range: List[str]) -> None:
 
@@ -312,14 +555,99 @@ class XlFileTemp:
         else:
             raise TypeError(f'{split_by_range} is not a list')
 
+        split_values = set(self.split_values(col_to_split))
         for split_value in values_to_split:
-            if split_value not in self.df_data_only[col_to_split].tolist():
+            if split_value not in split_values:
                 raise ValueError(f'{split_value} not in df_data')
+
+    def split_index(self, col_to_split: int) -> Dict[Any, Sequence[int]]:
+        """
+        Returns the partition index of df_data_only by the column to split by {split_value: positional indexes of its rows}
+        The index is built once per column and reused for every split file, so each file reads only its own rows
+        The split_values keep the type of the column (numbers, dates, etc with the typed data of from_dataframe)
+        
+        col_to_split: Dataframe integer column of the column to split by
+        """
+        if col_to_split not in self.__split_index:
+            self.__split_index[col_to_split] = self.df_data_only.groupby(col_to_split, sort=False).indices
+
+        return self.__split_index[col_to_split]
     
-    def template_filtered(self, *, split_by_value: bool, split_by: Union[str,None], split_value: Union[str,None]) -> pd.DataFrame:
+    def split_values(self, col_to_split: int) -> List:
+        """
+        Returns the values of the column to split by, in the order they are found in the data
+        
+        col_to_split: Dataframe integer column of the column to split by
+        """
+        if self.partitions is not None:
+            return self.partitions.values
+
+        return list(self.split_index(col_to_split))
+
+    def split_rows(self, col_to_split: int, split_value) -> pd.DataFrame:
+        """
+        Returns the data rows of the split_value, read from its partition file if the data is partitioned
+
+        col_to_split: Dataframe integer column of the column to split by
+        split_value: value of the column to split by
+        """
+        if self.partitions is not None:
+            df_split_value = self.partitions.read(split_value)
+            return self.df_data_only if df_split_value is None else df_split_value
+
+        return self.df_data_only.iloc[self.split_index(col_to_split).get(split_value, [])]
+
+    def data_digest(self, col_to_split: int, split_value=None) -> str:
         """
-        The method returns a DataFrame df_data to create the template. If split_by_value=True, the df_data will be filtered by the provided split_value. 
-        Otherwise, it will set the split_value to the column split_by and return all records from the original df_data.
+        Returns the sha256 of the data rows of the split_value (build manifest), of all the data rows if split_value is None
+
+        col_to_split: Dataframe integer column of the column to split by
+        split_value: value of the column to split by
+        """
+        if split_value is None:
+            return rows_digest(self.df_data_only)
+        if self.partitions is not None:
+            return self.partitions.digest(split_value)
+
+        return rows_digest(self.split_rows(col_to_split, split_value))
+
+    def check_partitions(self, split_by: Union[str,None], split_by_value: bool) -> None:
+        """The partitioned data can only be filtered by the column it was partitioned by"""
+
+        if split_by is None or split_by == '' or get_column_to_split_by(self.df_settings, split_by) != self.partitions.col_to_split:
+            partition_header = self.df_settings.loc['HEADER', self.partitions.col_to_split]
+            raise ValueError(f"The data is partitioned by '{partition_header}', split_by must be '{partition_header}'")
+        if not split_by_value:
+            raise ValueError('The partitioned data is not kept in memory, it can only be filtered by split_value (split_by_value=True)')
+
+    def compile(self) -> TemplatePlan:
+        """
+        Returns the compiled configuration of the template (TemplatePlan): headers, format names, lock formats, formulas, widths, 
+        dropdown lists, data validation options and conditional formatting rules. It is compiled once.
+        The plan can be saved (plan.save(path)) and a template created from it and new data without reading the configuration sheets (from_plan)
+        """
+        if self.__plan is None:
+            self.__plan = compile_plan(self)
+
+        return self.__plan
+
+    def skeleton(self, protect_sheet: bool) -> TemplateSkeleton:
+        """
+        Returns the parts of the template shared by all the split files (headers, formats, dropdown lists, data validation, 
+        conditional formatting and column widths). The skeleton is built once from the plan (compile()) and reused for every file
+
+        protect_sheet: True if the sheet is protected (sheet_password), the format of the data depends on it
+        """
+        skeleton_key = (protect_sheet, self.extra_rows)
+        if skeleton_key not in self.__skeletons:
+            self.__skeletons[skeleton_key] = TemplateSkeleton(self.compile(), protect_sheet, self.extra_rows)
+
+        return self.__skeletons[skeleton_key]
+
+    def data_filtered(self, *, split_by_value: bool, split_by: Union[str,None], split_value: Union[str,None]) -> pd.DataFrame:
+        """
+        Returns the data rows of the template, without headers and extra rows. If split_by_value=True, the rows are filtered by the provided split_value. 
+        Otherwise, it will set the split_value to the column split_by and return all records from the original df_data_only.
 
         Parameters
         split_by: The name of the column to filter by.
@@ -327,27 +655,41 @@ class XlFileTemp:
         split_by_value: A boolean flag (True or False). If True, the method filters by the split_value provided. If False, it uses all values from the split_by column.
         """
         if any([split_by is None, split_value is None, split_by_value is None]):
-            return self.df_data
-
-        if self.extra_rows:
-            df_rows_extra = rows_extra(self.df_data_only, self.num_rows_extra)
-        else:
-            df_rows_extra = None
+            return self.df_data_only
 
         ### Filter Main sheet
         col_to_split = get_column_to_split_by(self.df_settings, split_by)
-        df_split_value = self.df_data_only.copy()
+        if self.partitions is not None:
+            self.check_partitions(split_by, split_by_value)
         if split_by_value:
-            df_split_value = df_split_value[df_split_value[col_to_split]==split_value]
-        else:
-            df_split_value[col_to_split]=split_value
+            return self.split_rows(col_to_split, split_value)
 
-        ### Include the headers on the top
-        df_split_value = pd.concat([self.df_hd, df_split_value, df_rows_extra])
+        ### df_data_only is shared, the split_value is set on a copy
+        df_split_value = self.df_data_only.copy()
+        df_split_value[col_to_split] = split_value
 
         return df_split_value
 
     def __repr__(self) -> str:
+        if isinstance(self.dv_config1, ConfigurationFromPlan):
+            ### Template created from a plan (from_plan)
+            plan = self.compile()
+            return f"""XlFileTemp(
+            hd_index={self.hd_index},
+            data_index={self.data_index},
+            extra_rows={self.extra_rows},
+            num_rows_extra={self.num_rows_extra},
+            length={self.length},
+            tab_names={self.tab_names},
+
+            plan=TemplatePlan(
+                data_validations={list(plan.data_validations)},
+                conditional_formats={list(plan.conditional_formats)},
+                mandatory_columns={list(plan.mandatory_columns)},
+                )
+        )
+        """
+
         return f"""XlFileTemp(
             hd_index={self.hd_index},
             data_index={self.data_index},
@@ -0,0 +1,94 @@
+import io
+import struct
+import zipfile
+import zlib
+from typing import Dict
+
+
+### Signatures and fixed sizes of the zip records
+LOCAL_HEADER_SIZE = 30
+CENTRAL_DIR_SIGNATURE = b'PK\x01\x02'
+CENTRAL_DIR_SIZE = 46
+END_OF_CENTRAL_DIR_SIGNATURE = b'PK\x05\x06'
+DATA_DESCRIPTOR_FLAG = 0x08
+
+
+def _rewrite_zip_members(data: bytes, replacements: Dict[str, bytes]) -> bytes:
+    output = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(data)) as zin, zipfile.ZipFile(output, 'w') as zout:
+        for item in zin.infolist():
+            content = replacements[item.filename] if item.filename in replacements else zin.read(item.filename)
+            zout.writestr(item, content, compress_type=item.compress_type)
+
+    return output.getvalue()
+
+
+def _compress(content: bytes, compress_type: int) -> bytes:
+    if compress_type == zipfile.ZIP_STORED:
+        return content
+
+    ### Same compressor as zipfile (and xlsxwriter) with the default compression level
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return compressor.compress(content) + compressor.flush()
+
+
+def replace_zip_members(data: bytes, replacements: Dict[str, bytes]) -> bytes:
+    """
+    Returns the zip archive (excel file) with the content of some of its members replaced
+    The other members are copied with their compressed data as they are, only the replaced members are compressed again.
+    The result is the same as rewriting the whole archive with zipfile, without decompressing and compressing every member
+
+    data: bytes of the zip archive
+    replacements: {member name: new content}
+    """
+
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        infos = zf.infolist()
+
+    simple_archive = all(item.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED) and not item.flag_bits & DATA_DESCRIPTOR_FLAG
+        and item.compress_size < 0xFFFFFFFF and item.file_size < 0xFFFFFFFF and item.header_offset < 0xFFFFFFFF for item in infos)
+    end_of_central_dir = data.rfind(END_OF_CENTRAL_DIR_SIGNATURE)
+    if not simple_archive or end_of_central_dir == -1 or data[-2:] != b'\x00\x00':
+        ### zip64, data descriptors or comments: the archive is rewritten with zipfile
+        return _rewrite_zip_members(data, replacements)
+
+    central_dir_size, central_dir_offset = struct.unpack_from('<II', data, end_of_central_dir + 12)
+
+    output = bytearray()
+    central_dir = bytearray()
+    position = central_dir_offset
+    for item in infos:
+        ### Central directory record of the member
+        if data[position:position + 4] != CENTRAL_DIR_SIGNATURE:
+            return _rewrite_zip_members(data, replacements)
+        name_length, extra_length, comment_length = struct.unpack_from('<HHH', data, position + 28)
+        record_size = CENTRAL_DIR_SIZE + name_length + extra_length + comment_length
+        record = bytearray(data[position:position + record_size])
+        position += record_size
+
+        ### Local header + compressed data of the member
+        start = item.header_offset
+        local_name_length, local_extra_length = struct.unpack_from('<HH', data, start + 26)
+        header_size = LOCAL_HEADER_SIZE + local_name_length + local_extra_length
+
+        struct.pack_into('<I', record, 42, len(output))
+        if item.filename in replacements:
+            content = replacements[item.filename]
+            compressed = _compress(content, item.compress_type)
+            crc = zlib.crc32(content)
+            header = bytearray(data[start:start + header_size])
+            struct.pack_into('<III', header, 14, crc, len(compressed), len(content))
+            struct.pack_into('<III', record, 16, crc, len(compressed), len(content))
+            output += header
+            output += compressed
+        else:
+            output += data[start:start + header_size + item.compress_size]
+
+        central_dir += record
+
+    end_record = bytearray(data[end_of_central_dir:])
+    struct.pack_into('<I', end_record, 16, len(output))
+    output += central_dir
+    output += end_record
+
+    return bytes(output)